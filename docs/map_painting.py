@@ -1,104 +1,31 @@
-import os, heapq, colorsys, collections, numpy as np, matplotlib.pyplot as plt, matplotlib, string
+import os, sys, colorsys, numpy as np, matplotlib.pyplot as plt, matplotlib, string
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from worldmap_io import load_map
+from map_preprocessing import build_water_mask, parse_annotations, build_cost_grid
+from map_preprocessing import multi_dijkstra as _multi_dijkstra
 
 # ---------------- Load map ----------------
 MAP_PATH = 'maps/middle_earth.worldmap'
 if not os.path.exists(MAP_PATH):
     raise FileNotFoundError("world map missing – please re‑upload.")
 
-with open(MAP_PATH, 'r', encoding='utf-8') as f:
-    lines = [ln.rstrip('\n') for ln in f]
-H = len(lines); W = max(len(ln) for ln in lines)
-grid = [list(ln.ljust(W)) for ln in lines]
-
-# ---------------- Helper: flood water incl. text ----------------
-dirs = [(1,0),(-1,0),(0,1),(0,-1)]
-def build_water_mask(grid):
-    """Return mask of cells considered ocean ( '=' or adjacent label characters )."""
-    H=len(grid); W=len(grid[0])
-    water=np.zeros((H,W),bool)
-    dq=collections.deque()
-    # seed with '=' cells at map edge (plus any connected internal '=' if want; start with all '=')
-    for r in range(H):
-        for c in range(W):
-            if grid[r][c]=='=' and not water[r,c]:
-                water[r,c]=True; dq.append((r,c))
-    # allowed chars to absorb: '=' or alphabetic/underscore/apostrophe
-    def is_water_char(ch):
-        return ch=='=' or ch.isalpha() or ch=='_' or ch=="'"
-    while dq:
-        r,c=dq.popleft()
-        for dr,dc in dirs:
-            nr,nc=r+dr,c+dc
-            if 0<=nr<H and 0<=nc<W and not water[nr,nc] and is_water_char(grid[nr][nc]):
-                water[nr,nc]=True
-                dq.append((nr,nc))
-    return water
+grid, H, W = load_map(MAP_PATH)
 
 # We will build water mask first (before modifying grid so we capture original label chars)
-original_grid=[row[:] for row in grid]
-water_mask=build_water_mask(original_grid)
+water_mask=build_water_mask(grid)
 
 # ---------------- Parse annotation seeds ----------------
-def register(name, mapping):
-    if name not in mapping:
-        mapping[name] = len(mapping)
-    return mapping[name]
-
-realm_map, sub_map = {}, {}
-realm_seeds, sub_seeds = {}, {}
-for r in range(H):
-    c=0
-    while c<W:
-        ch=grid[r][c]
-        if ch in ('[','('):
-            close=']' if ch=='[' else ')'
-            k=c+1
-            name_chars=[]
-            while k<W and grid[r][k]!=close:
-                name_chars.append(grid[r][k]); k+=1
-            if k<W:
-                name=''.join(name_chars)
-                if ch=='[':
-                    rid=register(name, realm_map); realm_seeds[(r,c)]=rid
-                else:
-                    sid=register(name, sub_map); sub_seeds[(r,c)]=sid
-                for cc in range(c,k+1): grid[r][cc]=' '
-                c=k
-        c+=1
+realm_map, sub_map, realm_seeds, sub_seeds, _, _ = parse_annotations(grid, H, W)
 
 num_realms=len(realm_map); sub_offset=num_realms
 
 # ---------------- Terrain cost ----------------
-IMPASS=1e6
-TERRAIN_COST={' ':1,'.':1, ',':2,';':2, '#':8,'&':8, '%':12, '^':100,
-              '-':10,'|':10,'+':1,'=':50}
-cost=np.empty((H,W),float)
-for r in range(H):
-    for c in range(W):
-        if water_mask[r,c]:
-            cost[r,c]=50
-        else:
-            cost[r,c]=TERRAIN_COST.get(grid[r][c],1)
+cost=build_cost_grid(grid, water_mask, H, W)
 
 # ---------------- Multi-source Dijkstra ----------------
 def multi_dijkstra(seeds, restrict=None):
-    dist=np.full((H,W),np.inf)
-    owner=np.full((H,W),-1,int)
-    pq=[]
-    for (r,c),sid in seeds.items():
-        dist[r,c]=0; owner[r,c]=sid; heapq.heappush(pq,(0,r,c,sid))
-    while pq:
-        d,r,c,sid=heapq.heappop(pq)
-        if d!=dist[r,c] or owner[r,c]!=sid: continue
-        for dr,dc in dirs:
-            nr,nc=r+dr,c+dc
-            if 0<=nr<H and 0<=nc<W:
-                if restrict is not None and not restrict[nr,nc]:
-                    continue
-                nd=d+cost[nr,nc]
-                if nd<dist[nr,nc]:
-                    dist[nr,nc]=nd; owner[nr,nc]=sid; heapq.heappush(pq,(nd,nr,nc,sid))
-    return owner
+    return _multi_dijkstra(seeds, cost, H, W, restrict=restrict)
 
 combined={**realm_seeds, **{pos: sub_offset+sid for pos,sid in sub_seeds.items()}}
 owner_all=multi_dijkstra(combined)
@@ -0,0 +1,77 @@
+"""
+Tokenizer for the worldmap annotation language (maps/map.spec.md §3).
+
+Every stage that needs to know where labels are (realm / province seeds,
+geographic features, terrain restoration under labels, the docs painter)
+reads the token table produced here instead of scanning the grid itself,
+so they all agree on label positions.
+
+Each row is matched once, left to right, against one compiled pattern:
+
+    [Name]      realm           brackets take precedence over everything and
+    (Name)      province        may contain any characters; an unmatched
+                                opening bracket is ordinary text
+    ?Name       region          natural region next to its terrain
+    !Name       poi             point of interest
+    @Name       river           river / road label
+    Name        name            bare run of label characters (a named
+                                terrain feature when it is 3+ characters long)
+
+Prefixed and bare names are runs of label characters (LABEL_CHAR: any
+Unicode letter, as in ``Anórien``, plus ``_`` and ``'``); a prefix
+character not followed by one is plain text.  is_label_char() is the same
+test for single characters (the water mask uses it).
+"""
+from __future__ import annotations
+import re
+import numpy as np
+from typing import Iterable, List, NamedTuple
+
+from worldmap_io import grid_rows
+
+REALM, PROVINCE, REGION, POI, RIVER, NAME = \
+    'realm', 'province', 'region', 'poi', 'river', 'name'
+LABEL_CHAR = r"[^\W\d]|'"               # a word character but not a digit: a letter, '_' or "'"
+MIN_BARE_NAME = 3                       # shorter bare runs are stray letters, not labels
+
+_TOKEN = re.compile(r"""
+      \[ (?P<realm>    [^\]]* ) \]
+    | \( (?P<province> [^)]*  ) \)
+    | \? (?P<region>   (?:{c})+ )
+    | !  (?P<poi>      (?:{c})+ )
+    | @  (?P<river>    (?:{c})+ )
+    |    (?P<name>     (?:{c})+ )
+""".replace('{c}', LABEL_CHAR), re.VERBOSE)
+_LABEL_CHAR = re.compile(LABEL_CHAR)
+
+def is_label_char(ch: str) -> bool:
+    """Whether `ch` can be part of a prefixed or bare name."""
+    return _LABEL_CHAR.fullmatch(ch) is not None
+
+class Token(NamedTuple):
+    row: int
+    col: int                # first tile, including any bracket / prefix
+    end: int                # one past the last tile
+    kind: str
+    text: str               # the name, without brackets / prefix
+
+    @property
+    def span(self) -> slice:
+        return slice(self.col, self.end)
+
+def tokenize_rows(rows: Iterable[str], first_row: int = 0) -> List[Token]:
+    """Tokens of each row string, in row-major order."""
+    tokens = []
+    for r, line in enumerate(rows, first_row):
+        for m in _TOKEN.finditer(line):
+            kind = m.lastgroup
+            tokens.append(Token(r, m.start(), m.end(), kind, m.group(kind)))
+    return tokens
+
+def tokenize(grid: np.ndarray) -> List[Token]:
+    """Token table for an H×W character-code grid (see worldmap_io)."""
+    return tokenize_rows(grid_rows(grid))
+
+def is_feature_name(token: Token) -> bool:
+    """Bare names long enough to name a terrain feature."""
+    return token.kind == NAME and len(token.text) >= MIN_BARE_NAME
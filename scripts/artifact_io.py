@@ -0,0 +1,935 @@
+"""
+Readers and writers for the binary artifacts consumed by the game.
+
+REG2 (middle_earth_regions.bin), little-endian:
+    'REG2'  u16 version=2  u16 W  u16 H
+    W*H × (u8 realm_id, u8 sub_id, u8 geo_id)      255 = none
+    3 name tables (realms, sub-realms, geo features):
+        u8 count, then count × (u8 byte_len, utf-8 bytes)
+
+    REG1 is the same without the geo byte and without the geo name table.
+
+REG3, written instead of REG2 when a layer has more than 255 ids or names:
+    'REG3'  u16 version=3  u16 W  u16 H
+    u8 realm_width  u8 sub_width  u8 geo_width      1 = u8, 2 = u16; then 3 zero bytes
+    3 planes (realm, sub, geo), each W*H ids        255 / 65535 = none,
+        padded with zeros to a 4-byte boundary
+    3 name tables: u16 count, then count × (u8 byte_len, utf-8 bytes)
+
+MDEP (middle_earth_mountains.bin), little-endian:
+    'MDEP'  u16 version=1  u16 W  u16 H
+    W*H × u8 depth                                  (taxicab, capped at 255)
+
+    version 2 adds two header bytes and a wider payload:
+    'MDEP'  u16 version=2  u16 W  u16 H  u8 dtype  u8 metric
+    W*H × depth     dtype 1 = u8, 2 = u16, 3 = float16
+                    metric 0 = taxicab, 1 = chessboard, 2 = euclidean
+
+PROX (middle_earth_proximity.bin), little-endian; terrain proximity
+fields, one plane per channel (proximity_preprocessing.py):
+    'PROX'  u16 version=1  u16 W  u16 H  u8 channel_count
+    u8 dtype (MDEP dtype codes)  u8 metric (MDEP metric codes)  u8 0
+    u32 plane_offset  u32 plane_stride
+    channel name table as in REG2, then zero padding up to plane_offset
+    channel_count planes of W*H values, each starting on a 64-byte boundary
+        plane_stride apart; integer types are rounded and clipped to the
+        type's range (so "none in the map" reads as the type's maximum)
+
+TILE (middle_earth_tiles.bin), little-endian, planar so every field maps
+straight onto a typed array:
+    'TILE'  u16 version=1  u16 W  u16 H  u16 plane_count=5
+    u32 plane_offset  u32 plane_stride  u32 names_offset  u32 names_size
+    zero padding up to plane_offset (64)
+    5 planes of W*H u8, each starting on a 64-byte boundary plane_stride apart:
+        terrain   index into the glyph table (unknown glyphs → 0, open land)
+        realm, sub, geo                              255 = none
+        flags     TILE_OCEAN | TILE_RIVER | TILE_ROAD | TILE_BRIDGE | TILE_DEEP_MOUNTAIN
+    at names_offset, 4 name tables as in REG2: terrain glyphs, realms,
+    sub-realms, geo features
+
+TRVL (middle_earth_travel.bin), little-endian; POI-to-POI travel costs
+over the region stage's terrain cost grid:
+    'TRVL'  u16 version=1  u16 W  u16 H  u16 count
+    u8 flags (1 = first-hop plane present), then 3 zero bytes
+    count × (u16 row, u16 col)      POI cells, in POI CSV row order
+    count × count u32 cost          [i, j] = cheapest path from POI i to POI j,
+                                    summing the cost of every cell entered
+                                    (0xFFFFFFFF = unreachable)
+    count × count u8 first hop      optional; step out of POI i on that path,
+                                    0 up, 1 left, 2 right, 3 down, 255 = none
+
+POIB (middle_earth_pois.bin), little-endian; the POI CSV as a spatially
+indexed table:
+    'POIB'  u16 version=1  u16 W  u16 H  u16 count  u16 bucket
+    u16 buckets_x  u16 buckets_y  2 zero bytes      bucket: power-of-two side in cells
+    count × 16-byte record:
+        u16 row  u16 col  i16 realm_id  i16 sub_id  i16 geo_id     -1 = none
+        u8 type (0 Realm, 1 SubRealm, 2 GeoFeature)  u8 0
+        u16 name (index into the string pool)  u16 order (POI CSV row)
+    records are sorted by Morton (Z-order) code of (row, col), so every
+    bucket's records are contiguous
+    buckets_y*buckets_x × (u16 first record, u16 record count), row-major
+    string pool: u16 count, then count × (u8 byte_len, utf-8 bytes)
+
+HPAG (middle_earth_hpa.bin), little-endian; the HPA* abstraction graph
+(hpa_preprocessing.py), edges in CSR form grouped by source node:
+    'HPAG'  u16 version=1  u16 W  u16 H  u16 cluster  u32 node_count  u32 edge_count
+    (clusters+1) × u32 first node of each cluster   clusters row-major,
+                                                    ceil(H/cluster) × ceil(W/cluster)
+    node_count × (u16 row, u16 col)                 entrance cells, by cluster
+    (node_count+1) × u32 first edge of each node
+    edge_count × (u32 target node, u32 cost)        cost of every cell entered
+
+CHNK (<artifact>.chunks), little-endian; an optional compressed wrapper
+around REG2 / REG3 / MDEP / TILE for large maps:
+    'CHNK'  u16 version=1  u16 W  u16 H  u16 chunk_w  u16 chunk_h
+    u8 codec (0 raw, 1 zlib, 2 rle)  u8 plane_count  4s source magic
+    u32 meta_offset  u32 meta_size
+    plane_count × u8 dtype (MDEP dtype codes)
+    (chunks+1) × u32 chunk offsets, chunks row-major over the map
+    each chunk: every plane's chunk_h×chunk_w window (clipped at the
+        right/bottom edge), plane after plane, compressed as one blob
+    at meta_offset: the source file minus its planes (header, name tables)
+    so unchunk_artifact() gives back the original bytes.
+    rle is (u8 run length, u8 byte) pairs over the chunk's bytes.
+
+Writers assemble each section a band of rows at a time (BAND_CELLS cells)
+and emit it with a handful of ``write`` calls, so memory-mapped inputs are
+streamed rather than copied; readers return ``np.frombuffer`` views over the
+file bytes instead of copying tile by tile.  Both bodies are row-major with a fixed
+stride, so ``patch_*_rows`` can rewrite individual rows of an existing file
+in place.  See src/core/data/RegionData.ts and MountainData.ts /
+TileData.ts / TravelData.ts / ProximityData.ts / ChunkedGrid.ts for the
+TypeScript side.
+"""
+from __future__ import annotations
+import struct
+import zlib
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+NONE_ID = 255
+HEADER = struct.Struct('<4sHHH')                      # magic, version, W, H
+REG3_HEADER = struct.Struct('<4sHHHBBBxxx')           # ... + id width per layer
+REG3_ALIGN = 4
+
+class RegionGrid(NamedTuple):
+    width: int
+    height: int
+    realm: np.ndarray           # H×W uint8 / uint16 views, none_id(dtype) = none
+    sub: np.ndarray
+    geo: np.ndarray
+    realm_names: List[str]
+    sub_names: List[str]
+    geo_names: List[str]
+
+class DepthGrid(NamedTuple):
+    width: int
+    height: int
+    depth: np.ndarray           # H×W view (uint8 / uint16 / float16)
+    metric: str = 'taxicab'
+
+class TileGrid(NamedTuple):
+    width: int
+    height: int
+    terrain: np.ndarray         # H×W uint8 views into the mapped file
+    realm: np.ndarray
+    sub: np.ndarray
+    geo: np.ndarray
+    flags: np.ndarray
+    glyphs: List[str]           # terrain index → glyph
+    realm_names: List[str]
+    sub_names: List[str]
+    geo_names: List[str]
+
+class ProximityFields(NamedTuple):
+    width: int
+    height: int
+    fields: Dict[str, np.ndarray]   # channel → H×W view (uint8 / uint16 / float16)
+    metric: str = 'taxicab'
+
+class TravelMatrix(NamedTuple):
+    width: int
+    height: int
+    rows: np.ndarray            # count POI rows / cols (uint16)
+    cols: np.ndarray
+    cost: np.ndarray            # count×count uint32 view, TRAVEL_UNREACHABLE = no path
+    first_hop: np.ndarray | None    # count×count uint8 view (TRAVEL_STEPS index, 255 = none)
+
+class PoiTable(NamedTuple):
+    width: int
+    height: int
+    bucket: int                 # bucket side in cells
+    records: np.ndarray         # count POI_RECORD view, Morton order
+    buckets: np.ndarray         # buckets_y×buckets_x×2 uint16 (first record, count)
+    names: List[str]            # string pool
+
+class HpaGraph(NamedTuple):
+    width: int
+    height: int
+    cluster: int                # cluster side in cells
+    cluster_nodes: np.ndarray   # (clusters+1) uint32: nodes of cluster k are [a[k], a[k+1])
+    rows: np.ndarray            # node_count uint16 entrance cells
+    cols: np.ndarray
+    edge_offsets: np.ndarray    # (node_count+1) uint32: edges of node u are [a[u], a[u+1])
+    targets: np.ndarray         # edge_count uint32
+    costs: np.ndarray           # edge_count uint32
+
+# MDEP v2 payload types: name → (code, on-disk dtype)
+MDEP_DTYPES = {'u8': (1, np.dtype('u1')), 'u16': (2, np.dtype('<u2')),
+               'f16': (3, np.dtype('<f2'))}
+MDEP_METRICS = ('taxicab', 'chessboard', 'euclidean')
+
+# TILE layout
+TILE_HEADER = struct.Struct('<4sHHHHIIII')
+TILE_ALIGN = 64
+TILE_PLANES = ('terrain', 'realm', 'sub', 'geo', 'flags')
+TILE_GLYPHS = (' ', '.', ',', ';', '#', '&', '%', '^', '~', '=', '-', '|', '+', '"', '@', 'o')
+TILE_OCEAN, TILE_RIVER, TILE_ROAD, TILE_BRIDGE, TILE_DEEP_MOUNTAIN = 1, 2, 4, 8, 16
+
+# PROX layout
+PROX_HEADER = struct.Struct('<4sHHHBBBxII')           # magic, version, W, H, channels,
+                                                      # dtype, metric, plane offset, stride
+
+# TRVL layout
+TRVL_HEADER = struct.Struct('<4sHHHHBxxx')            # magic, version, W, H, count, flags
+TRVL_FIRST_HOP = 1
+TRAVEL_UNREACHABLE = 0xFFFFFFFF
+TRAVEL_STEPS = ((-1, 0), (0, -1), (0, 1), (1, 0))     # first-hop codes: up, left, right, down
+
+# POIB layout
+POIB_HEADER = struct.Struct('<4sHHHHHHHxx')            # magic, version, W, H, count, bucket, bx, by
+POI_RECORD = np.dtype([('row', '<u2'), ('col', '<u2'), ('realm', '<i2'), ('sub', '<i2'),
+                       ('geo', '<i2'), ('type', 'u1'), ('pad', 'u1'), ('name', '<u2'),
+                       ('order', '<u2')])
+POI_TYPES = ('Realm', 'SubRealm', 'GeoFeature')
+POI_BUCKET = 32
+
+# HPAG layout
+HPAG_HEADER = struct.Struct('<4sHHHHII')              # magic, version, W, H, cluster, nodes, edges
+
+# Writers convert and emit at most this many cells at a time
+BAND_CELLS = 1 << 22
+
+# CHNK layout
+CHNK_HEADER = struct.Struct('<4sHHHHHBB4sII')
+CHNK_CODECS = ('raw', 'zlib', 'rle')
+CHUNK_SIZE = 64
+
+################################################################################
+# HELPERS
+################################################################################
+def none_id(dtype) -> int:
+    """The "none" id of an id plane: 255 for uint8, 65535 for uint16."""
+    return int(np.iinfo(dtype).max)
+
+def row_bands(H: int, W: int, cells: int | None = None):
+    """``(r0, r1)`` bands of whole rows holding about `cells` (BAND_CELLS) cells each."""
+    rows = max(1, (cells or BAND_CELLS) // max(W, 1))
+    for r0 in range(0, H, rows):
+        yield r0, min(r0 + rows, H)
+
+def _check_ids(ids: np.ndarray, what: str, dtype=np.uint8) -> None:
+    """Refuse ids that don't fit `dtype` (its largest value means none)."""
+    if ids.size and (ids.min() < -1 or ids.max() >= none_id(dtype)):
+        raise ValueError(f"{what} id out of range for {np.dtype(dtype).name}: "
+                         f"{int(ids.min())}..{int(ids.max())}")
+
+def _id_plane(ids: np.ndarray, what: str, dtype=np.uint8) -> np.ndarray:
+    """Map -1 → none and narrow to `dtype`, refusing ids that don't fit it."""
+    ids = np.asarray(ids)
+    _check_ids(ids, what, dtype)
+    return np.where(ids >= 0, ids, none_id(dtype)).astype(dtype)
+
+def id_dtype(ids: np.ndarray, names: Sequence[str] = ()) -> np.dtype:
+    """uint8 if every id and name index fits a byte, else uint16."""
+    ids = np.asarray(ids)
+    top = max(int(ids.max(initial=-1)), len(names) - 1)
+    if top < NONE_ID:
+        return np.dtype(np.uint8)
+    if top < none_id(np.uint16):
+        return np.dtype('<u2')
+    raise ValueError(f"{top + 1} ids don't fit a uint16 plane")
+
+def encode_name_table(names: Sequence[str], count_bytes: int = 1) -> bytes:
+    limit = 256 ** count_bytes - 1
+    if len(names) > limit:
+        raise ValueError(f"Too many names for a {8 * count_bytes}-bit table: {len(names)}")
+    parts = [len(names).to_bytes(count_bytes, 'little')]
+    for nm in names:
+        b = nm.encode('utf-8')
+        if len(b) > 255:
+            raise ValueError(f"Name too long: {nm}")
+        parts.append(bytes((len(b),)))
+        parts.append(b)
+    return b''.join(parts)
+
+def decode_name_table(buf: bytes | memoryview, offset: int,
+                      count_bytes: int = 1) -> Tuple[List[str], int]:
+    """Return ``(names, new_offset)`` for the table starting at `offset`."""
+    count = int.from_bytes(bytes(buf[offset:offset+count_bytes]), 'little')
+    offset += count_bytes
+    names = []
+    for _ in range(count):
+        n = int(buf[offset])
+        names.append(bytes(buf[offset+1:offset+1+n]).decode('utf-8'))
+        offset += 1 + n
+    return names, offset
+
+def _read_header(buf: bytes, magics: Tuple[bytes, ...]) -> Tuple[bytes, int, int, int]:
+    magic, version, W, H = HEADER.unpack_from(buf, 0)
+    if magic not in magics:
+        raise ValueError(f"Unexpected magic {magic!r}, expected one of {magics}")
+    return magic, version, W, H
+
+################################################################################
+# REG2
+################################################################################
+def write_reg2(path: str, realm: np.ndarray, sub: np.ndarray, geo: np.ndarray,
+               realm_names: Sequence[str], sub_names: Sequence[str],
+               geo_names: Sequence[str]) -> None:
+    """Write the REG2 region grid from three H×W id arrays (-1 = none)."""
+    H, W = realm.shape
+    layers = ((realm, 'realm'), (sub, 'sub-realm'), (geo, 'geo feature'))
+    for ids, what in layers:
+        _check_ids(ids, what)
+    tables = b''.join(encode_name_table(t) for t in (realm_names, sub_names, geo_names))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(b'REG2', 2, W, H))
+        for r0, r1 in row_bands(H, W):
+            body = np.empty((r1 - r0, W, 3), dtype=np.uint8)
+            for k, (ids, what) in enumerate(layers):
+                body[..., k] = _id_plane(ids[r0:r1], what)
+            f.write(body.tobytes())
+        f.write(tables)
+
+def _reg3_aligned(n: int) -> int:
+    return -(-n // REG3_ALIGN) * REG3_ALIGN
+
+def write_reg3(path: str, realm: np.ndarray, sub: np.ndarray, geo: np.ndarray,
+               realm_names: Sequence[str], sub_names: Sequence[str],
+               geo_names: Sequence[str]) -> None:
+    """Write the REG3 region grid; each layer gets the narrowest id plane that fits."""
+    H, W = realm.shape
+    layers = []
+    for ids, names, what in ((realm, realm_names, 'realm'), (sub, sub_names, 'sub-realm'),
+                             (geo, geo_names, 'geo feature')):
+        dtype = id_dtype(ids, names)
+        _check_ids(ids, what, dtype)
+        layers.append((ids, what, dtype))
+    tables = b''.join(encode_name_table(t, count_bytes=2)
+                      for t in (realm_names, sub_names, geo_names))
+    with open(path, 'wb') as f:
+        f.write(REG3_HEADER.pack(b'REG3', 3, W, H, *(dt.itemsize for _, _, dt in layers)))
+        for ids, what, dtype in layers:
+            for r0, r1 in row_bands(H, W):
+                f.write(_id_plane(ids[r0:r1], what, dtype).tobytes())
+            f.write(bytes(_reg3_aligned(W * H * dtype.itemsize) - W * H * dtype.itemsize))
+        f.write(tables)
+
+def write_regions(path: str, realm: np.ndarray, sub: np.ndarray, geo: np.ndarray,
+                  realm_names: Sequence[str], sub_names: Sequence[str],
+                  geo_names: Sequence[str]) -> None:
+    """
+    Write the region grid as REG2 when every layer fits a byte (the format
+    the game has always read), else as REG3 with uint16 planes where needed.
+    """
+    layers = ((realm, realm_names), (sub, sub_names), (geo, geo_names))
+    if all(id_dtype(ids, names) == np.uint8 for ids, names in layers):
+        write_reg2(path, realm, sub, geo, realm_names, sub_names, geo_names)
+    else:
+        write_reg3(path, realm, sub, geo, realm_names, sub_names, geo_names)
+
+def _reg3_layout(buf) -> Tuple[int, int, List[np.dtype], List[int], int]:
+    """``(W, H, plane dtypes, plane offsets, names_offset)`` of a REG3 file."""
+    magic, version, W, H, *widths = REG3_HEADER.unpack_from(buf, 0)
+    if magic != b'REG3' or version != 3:
+        raise ValueError(f"Unsupported region grid {magic!r} version {version}")
+    dtypes, offsets, offset = [], [], REG3_HEADER.size
+    for width in widths:
+        if width not in (1, 2):
+            raise ValueError(f"Unsupported REG3 id width: {width}")
+        dtypes.append(np.dtype('u1' if width == 1 else '<u2'))
+        offsets.append(offset)
+        offset += _reg3_aligned(W * H * width)
+    return W, H, dtypes, offsets, offset
+
+def _row_runs(rows: Sequence[int]) -> List[Tuple[int, int]]:
+    """Sorted row indices → half-open ``(start, stop)`` runs."""
+    runs: List[Tuple[int, int]] = []
+    for r in sorted(set(int(r) for r in rows)):
+        if runs and runs[-1][1] == r:
+            runs[-1] = (runs[-1][0], r + 1)
+        else:
+            runs.append((r, r + 1))
+    return runs
+
+def patch_reg2_rows(path: str, realm: np.ndarray, sub: np.ndarray, geo: np.ndarray,
+                    rows: Sequence[int]) -> None:
+    """
+    Overwrite `rows` of an existing REG2 / REG3 file's id planes in place.
+    The name tables are left alone, so they must not have changed; raises
+    ValueError if the file isn't a region grid of the same size or an id no
+    longer fits its plane.
+    """
+    H, W = realm.shape
+    with open(path, 'r+b') as f:
+        head = f.read(REG3_HEADER.size)
+        if head[:4] == b'REG3':
+            fw, fh, dtypes, offsets, _ = _reg3_layout(head)
+            if (fw, fh) != (W, H):
+                raise ValueError(f"{path} is {fw}×{fh}, expected {W}×{H}")
+            for r0, r1 in _row_runs(rows):
+                for ids, what, dt, offset in zip((realm, sub, geo),
+                                                 ('realm', 'sub-realm', 'geo feature'),
+                                                 dtypes, offsets):
+                    f.seek(offset + r0 * W * dt.itemsize)
+                    f.write(_id_plane(ids[r0:r1], what, dt).tobytes())
+            return
+        magic, version, fw, fh = _read_header(head, (b'REG2',))
+        if (fw, fh) != (W, H):
+            raise ValueError(f"{path} is {fw}×{fh}, expected {W}×{H}")
+        for r0, r1 in _row_runs(rows):
+            body = np.empty((r1 - r0, W, 3), dtype=np.uint8)
+            body[..., 0] = _id_plane(realm[r0:r1], 'realm')
+            body[..., 1] = _id_plane(sub[r0:r1], 'sub-realm')
+            body[..., 2] = _id_plane(geo[r0:r1], 'geo feature')
+            f.seek(HEADER.size + r0 * W * 3)
+            f.write(body.tobytes())
+
+def _file_bytes(path: str, mmap: bool):
+    """The whole file, read eagerly or memory-mapped (only touched pages load)."""
+    if mmap:
+        return np.memmap(path, dtype=np.uint8, mode='r')
+    with open(path, 'rb') as f:
+        return f.read()
+
+def read_reg2(path: str, mmap: bool = False) -> RegionGrid:
+    """
+    Read a REG1/REG2/REG3 file; id planes are zero-copy views of the file
+    bytes (uint8, or uint16 for wide REG3 layers; see :func:`none_id`).
+    """
+    buf = _file_bytes(path, mmap)
+    if bytes(buf[:4]) == b'REG3':
+        W, H, dtypes, offsets, offset = _reg3_layout(buf)
+        planes = [np.frombuffer(buf, dtype=dt, count=W*H, offset=o).reshape(H, W)
+                  for dt, o in zip(dtypes, offsets)]
+        tables = []
+        for _ in range(3):
+            table, offset = decode_name_table(buf, offset, count_bytes=2)
+            tables.append(table)
+        return RegionGrid(W, H, *planes, *tables)
+    magic, version, W, H = _read_header(buf, (b'REG1', b'REG2'))
+    per_tile = 3 if version == 2 else 2
+    offset = HEADER.size
+    body = np.frombuffer(buf, dtype=np.uint8, count=W*H*per_tile,
+                         offset=offset).reshape(H, W, per_tile)
+    offset += body.size
+    realm_names, offset = decode_name_table(buf, offset)
+    sub_names, offset = decode_name_table(buf, offset)
+    if per_tile == 3:
+        geo = body[..., 2]
+        geo_names, offset = decode_name_table(buf, offset) if offset < len(buf) else ([], offset)
+    else:
+        geo = np.full((H, W), NONE_ID, dtype=np.uint8)
+        geo_names = []
+    return RegionGrid(W, H, body[..., 0], body[..., 1], geo,
+                      realm_names, sub_names, geo_names)
+
+################################################################################
+# MDEP
+################################################################################
+def _mdep_payload(depth: np.ndarray, disk_dtype: np.dtype) -> bytes:
+    depth = np.asarray(depth)
+    if disk_dtype.kind == 'u':
+        depth = np.clip(np.rint(depth), 0, np.iinfo(disk_dtype).max)
+    return np.ascontiguousarray(depth, dtype=disk_dtype).tobytes()
+
+def write_mdep(path: str, depth: np.ndarray, dtype: str = 'u8',
+               metric: str = 'taxicab') -> None:
+    """
+    Write an H×W depth grid.
+
+    u8 taxicab depth is written as MDEP v1 (what the game has always read);
+    any other combination is written as v2.  Integer payloads are rounded and
+    clipped to the type's range; f16 keeps fractional Euclidean depths.
+    """
+    H, W = depth.shape
+    code, disk_dtype = MDEP_DTYPES[dtype]
+    with open(path, 'wb') as f:
+        if dtype == 'u8' and metric == 'taxicab':
+            f.write(HEADER.pack(b'MDEP', 1, W, H))
+        else:
+            f.write(HEADER.pack(b'MDEP', 2, W, H))
+            f.write(bytes((code, MDEP_METRICS.index(metric))))
+        for r0, r1 in row_bands(H, W):
+            f.write(_mdep_payload(depth[r0:r1], disk_dtype))
+
+def _mdep_layout(buf: bytes) -> Tuple[int, int, np.dtype, str, int]:
+    """``(W, H, disk_dtype, metric, payload_offset)`` from the file's first bytes."""
+    _, version, W, H = _read_header(buf, (b'MDEP',))
+    offset = HEADER.size
+    if version == 1:
+        disk_dtype, metric = MDEP_DTYPES['u8'][1], 'taxicab'
+    elif version == 2:
+        code, metric_code = buf[offset], buf[offset+1]
+        offset += 2
+        disk_dtype = next(dt for c, dt in MDEP_DTYPES.values() if c == code)
+        metric = MDEP_METRICS[metric_code]
+    else:
+        raise ValueError(f"Unsupported MDEP version: {version}")
+    return W, H, disk_dtype, metric, offset
+
+def patch_mdep_rows(path: str, depth: np.ndarray, rows: Sequence[int],
+                    metric: str = 'taxicab') -> None:
+    """
+    Overwrite `rows` of an existing MDEP file in place, keeping its payload
+    type.  Raises ValueError on a size or metric mismatch.
+    """
+    H, W = depth.shape
+    with open(path, 'r+b') as f:
+        fw, fh, disk_dtype, file_metric, offset = _mdep_layout(f.read(HEADER.size + 2))
+        if (fw, fh) != (W, H) or file_metric != metric:
+            raise ValueError(f"{path} is a {fw}×{fh} {file_metric} grid, "
+                             f"expected {W}×{H} {metric}")
+        for r0, r1 in _row_runs(rows):
+            f.seek(offset + r0 * W * disk_dtype.itemsize)
+            f.write(_mdep_payload(depth[r0:r1], disk_dtype))
+
+def read_mdep(path: str, mmap: bool = False) -> DepthGrid:
+    buf = _file_bytes(path, mmap)
+    W, H, disk_dtype, metric, offset = _mdep_layout(buf)
+    depth = np.frombuffer(buf, dtype=disk_dtype, count=W*H,
+                          offset=offset).reshape(H, W)
+    return DepthGrid(W, H, depth, metric)
+
+################################################################################
+# TILE
+################################################################################
+def _aligned(n: int) -> int:
+    return -(-n // TILE_ALIGN) * TILE_ALIGN
+
+def terrain_indices(grid: np.ndarray, glyphs: Sequence[str] = TILE_GLYPHS) -> np.ndarray:
+    """H×W uint8 index of every cell's glyph in `glyphs` (0 when absent)."""
+    lut = np.zeros(max(int(grid.max(initial=0)) + 1, 256), dtype=np.uint8)
+    for i, g in enumerate(glyphs):
+        lut[ord(g)] = i
+    return lut[grid]
+
+def write_tiles(path: str, terrain: np.ndarray, realm: np.ndarray, sub: np.ndarray,
+                geo: np.ndarray, flags: np.ndarray, realm_names: Sequence[str],
+                sub_names: Sequence[str], geo_names: Sequence[str],
+                glyphs: Sequence[str] = TILE_GLYPHS) -> None:
+    """Write the planar TILE grid (`terrain` already as glyph indices)."""
+    H, W = realm.shape
+    stride = _aligned(W * H)
+    plane_offset = _aligned(TILE_HEADER.size)
+    names_offset = plane_offset + len(TILE_PLANES) * stride
+    for ids, what in ((realm, 'realm'), (sub, 'sub-realm'), (geo, 'geo feature')):
+        _check_ids(ids, what)
+    planes = (lambda r0, r1: np.asarray(terrain[r0:r1], dtype=np.uint8),
+              lambda r0, r1: _id_plane(realm[r0:r1], 'realm'),
+              lambda r0, r1: _id_plane(sub[r0:r1], 'sub-realm'),
+              lambda r0, r1: _id_plane(geo[r0:r1], 'geo feature'),
+              lambda r0, r1: np.asarray(flags[r0:r1], dtype=np.uint8))
+    tables = b''.join(encode_name_table(t) for t in
+                      (list(glyphs), realm_names, sub_names, geo_names))
+    header = TILE_HEADER.pack(b'TILE', 1, W, H, len(TILE_PLANES), plane_offset,
+                              stride, names_offset, len(tables))
+    with open(path, 'wb') as f:
+        f.write(header.ljust(plane_offset, b'\0'))
+        for plane in planes:
+            for r0, r1 in row_bands(H, W):
+                f.write(plane(r0, r1).tobytes())
+            f.write(bytes(stride - W * H))
+        f.write(tables)
+
+def read_tiles(path: str) -> TileGrid:
+    """Memory-map a TILE file; planes are read-only views, nothing is copied."""
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    (magic, version, W, H, count, plane_offset, stride,
+     names_offset, names_size) = TILE_HEADER.unpack_from(data, 0)
+    if magic != b'TILE':
+        raise ValueError(f"Unexpected magic {magic!r}, expected b'TILE'")
+    if version != 1 or count != len(TILE_PLANES):
+        raise ValueError(f"Unsupported TILE version {version} with {count} planes")
+    planes = [data[plane_offset + i*stride: plane_offset + i*stride + W*H].reshape(H, W)
+              for i in range(count)]
+    names = bytes(data[names_offset:names_offset + names_size])
+    tables, offset = [], 0
+    for _ in range(4):
+        table, offset = decode_name_table(names, offset)
+        tables.append(table)
+    return TileGrid(W, H, *planes, *tables)
+
+def patch_tile_rows(path: str, terrain: np.ndarray, realm: np.ndarray, sub: np.ndarray,
+                    geo: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """
+    Rewrite in place the rows of an existing TILE file whose planes differ
+    from the given ones (`terrain` already as glyph indices) and return
+    them.  The name tables are left alone, so they must not have changed;
+    raises ValueError if the file isn't a TILE grid of the same size or an
+    id no longer fits its plane.
+    """
+    H, W = realm.shape
+    planes = (np.asarray(terrain, dtype=np.uint8), _id_plane(realm, 'realm'),
+              _id_plane(sub, 'sub-realm'), _id_plane(geo, 'geo feature'),
+              np.asarray(flags, dtype=np.uint8))
+    old = read_tiles(path)
+    if (old.width, old.height) != (W, H):
+        raise ValueError(f"{path} is {old.width}×{old.height}, expected {W}×{H}")
+    changed = np.zeros(H, dtype=bool)
+    for name, plane in zip(TILE_PLANES, planes):
+        changed |= (getattr(old, name) != plane).any(axis=1)
+    del old
+    rows = np.flatnonzero(changed)
+    with open(path, 'r+b') as f:
+        _, _, _, _, _, plane_offset, stride, _, _ = TILE_HEADER.unpack(f.read(TILE_HEADER.size))
+        for r0, r1 in _row_runs(rows):
+            for i, plane in enumerate(planes):
+                f.seek(plane_offset + i * stride + r0 * W)
+                f.write(plane[r0:r1].tobytes())
+    return rows
+
+################################################################################
+# PROX
+################################################################################
+def write_proximity(path: str, fields: Sequence[np.ndarray], channels: Sequence[str],
+                    dtype: str = 'u16', metric: str = 'taxicab') -> None:
+    """Write one H×W plane per channel (payloads converted as in MDEP)."""
+    H, W = fields[0].shape
+    code, disk_dtype = MDEP_DTYPES[dtype]
+    stride = _aligned(W * H * disk_dtype.itemsize)
+    names = encode_name_table(channels)
+    plane_offset = _aligned(PROX_HEADER.size + len(names))
+    header = PROX_HEADER.pack(b'PROX', 1, W, H, len(channels), code,
+                              MDEP_METRICS.index(metric), plane_offset, stride)
+    with open(path, 'wb') as f:
+        f.write((header + names).ljust(plane_offset, b'\0'))
+        for field in fields:
+            for r0, r1 in row_bands(H, W):
+                f.write(_mdep_payload(field[r0:r1], disk_dtype))
+            f.write(bytes(stride - W * H * disk_dtype.itemsize))
+
+def read_proximity(path: str, mmap: bool = False) -> ProximityFields:
+    buf = _file_bytes(path, mmap)
+    magic, version, W, H, count, code, metric, plane_offset, stride = \
+        PROX_HEADER.unpack_from(buf, 0)
+    if magic != b'PROX':
+        raise ValueError(f"Unexpected magic {magic!r}, expected b'PROX'")
+    if version != 1:
+        raise ValueError(f"Unsupported PROX version {version}")
+    disk_dtype = next(dt for c, dt in MDEP_DTYPES.values() if c == code)
+    channels, _ = decode_name_table(buf, PROX_HEADER.size)
+    fields = {name: np.frombuffer(buf, dtype=disk_dtype, count=W*H,
+                                  offset=plane_offset + i*stride).reshape(H, W)
+              for i, name in enumerate(channels[:count])}
+    return ProximityFields(W, H, fields, MDEP_METRICS[metric])
+
+################################################################################
+# TRVL
+################################################################################
+def write_travel(path: str, width: int, height: int, rows: Sequence[int], cols: Sequence[int],
+                 cost: np.ndarray, first_hop: np.ndarray | None = None) -> None:
+    """
+    Write a POI travel-cost matrix (`cost` as int64 with -1 or >= 2**32-1
+    for unreachable, `first_hop` as TRAVEL_STEPS codes with 255 = none).
+    """
+    count = len(rows)
+    if count > 0xFFFF:
+        raise ValueError(f"Too many POIs for a TRVL matrix: {count}")
+    cost = np.asarray(cost, dtype=np.int64)
+    cost = np.where((cost < 0) | (cost >= TRAVEL_UNREACHABLE), TRAVEL_UNREACHABLE, cost)
+    flags = TRVL_FIRST_HOP if first_hop is not None else 0
+    with open(path, 'wb') as f:
+        f.write(TRVL_HEADER.pack(b'TRVL', 1, width, height, count, flags))
+        f.write(np.stack([np.asarray(rows), np.asarray(cols)], axis=1).astype('<u2').tobytes())
+        f.write(cost.astype('<u4').tobytes())
+        if first_hop is not None:
+            f.write(np.asarray(first_hop, dtype=np.uint8).tobytes())
+
+def read_travel(path: str, mmap: bool = False) -> TravelMatrix:
+    buf = _file_bytes(path, mmap)
+    magic, version, W, H, count, flags = TRVL_HEADER.unpack_from(buf, 0)
+    if magic != b'TRVL':
+        raise ValueError(f"Unexpected magic {magic!r}, expected b'TRVL'")
+    if version != 1:
+        raise ValueError(f"Unsupported TRVL version {version}")
+    offset = TRVL_HEADER.size
+    cells = np.frombuffer(buf, dtype='<u2', count=2*count, offset=offset).reshape(count, 2)
+    offset += cells.nbytes
+    cost = np.frombuffer(buf, dtype='<u4', count=count*count, offset=offset).reshape(count, count)
+    offset += cost.nbytes
+    first_hop = None
+    if flags & TRVL_FIRST_HOP:
+        first_hop = np.frombuffer(buf, dtype=np.uint8, count=count*count,
+                                  offset=offset).reshape(count, count)
+    return TravelMatrix(W, H, cells[:, 0], cells[:, 1], cost, first_hop)
+
+################################################################################
+# POIB
+################################################################################
+def morton_codes(rows, cols) -> np.ndarray:
+    """Z-order codes of 16-bit (row, col) pairs, row bits in the odd positions."""
+    def spread(v):
+        v = np.asarray(v, dtype=np.uint32) & 0xFFFF
+        v = (v | (v << 8)) & 0x00FF00FF
+        v = (v | (v << 4)) & 0x0F0F0F0F
+        v = (v | (v << 2)) & 0x33333333
+        return (v | (v << 1)) & 0x55555555
+    return (spread(rows) << 1) | spread(cols)
+
+def write_poi_table(path: str, width: int, height: int, pois: Sequence[Sequence],
+                    bucket: int = POI_BUCKET) -> None:
+    """
+    Write a POIB table from POI CSV rows (name, row, col, realm_id, sub_id,
+    geo_id, type), header excluded, in CSV order.
+    """
+    if bucket < 1 or bucket & (bucket - 1):
+        raise ValueError(f"POI bucket size must be a power of two: {bucket}")
+    if len(pois) > 0xFFFF:
+        raise ValueError(f"Too many POIs for a POIB table: {len(pois)}")
+    names: List[str] = list(OrderedDict.fromkeys(p[0] for p in pois))
+    pool = {nm: i for i, nm in enumerate(names)}
+    records = np.zeros(len(pois), dtype=POI_RECORD)
+    for i, (name, r, c, rid, sid, gid, kind) in enumerate(pois):
+        records[i] = (r, c, rid, sid, gid, POI_TYPES.index(kind), 0, pool[name], i)
+    records = records[np.argsort(morton_codes(records['row'], records['col']), kind='stable')]
+    bx, by = -(-width // bucket), -(-height // bucket)
+    keys = (records['row'].astype(np.int64) // bucket) * bx + records['col'] // bucket
+    buckets = np.zeros((by * bx, 2), dtype='<u2')
+    used, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    buckets[used, 0], buckets[used, 1] = first, counts      # contiguous in Morton order
+    with open(path, 'wb') as f:
+        f.write(POIB_HEADER.pack(b'POIB', 1, width, height, len(pois), bucket, bx, by))
+        f.write(records.tobytes())
+        f.write(buckets.tobytes())
+        f.write(encode_name_table(names, count_bytes=2))
+
+def read_poi_table(path: str, mmap: bool = False) -> PoiTable:
+    buf = _file_bytes(path, mmap)
+    magic, version, W, H, count, bucket, bx, by = POIB_HEADER.unpack_from(buf, 0)
+    if magic != b'POIB':
+        raise ValueError(f"Unexpected magic {magic!r}, expected b'POIB'")
+    if version != 1:
+        raise ValueError(f"Unsupported POIB version {version}")
+    offset = POIB_HEADER.size
+    records = np.frombuffer(buf, dtype=POI_RECORD, count=count, offset=offset)
+    offset += records.nbytes
+    buckets = np.frombuffer(buf, dtype='<u2', count=2*bx*by, offset=offset).reshape(by, bx, 2)
+    names, _ = decode_name_table(buf, offset + buckets.nbytes, count_bytes=2)
+    return PoiTable(W, H, bucket, records, buckets, names)
+
+################################################################################
+# HPAG
+################################################################################
+def write_hpa(path: str, width: int, height: int, cluster: int, cluster_nodes: np.ndarray,
+              rows: np.ndarray, cols: np.ndarray, edge_offsets: np.ndarray,
+              targets: np.ndarray, costs: np.ndarray) -> None:
+    """Write an HPA* abstraction graph (arrays as in :class:`HpaGraph`)."""
+    with open(path, 'wb') as f:
+        f.write(HPAG_HEADER.pack(b'HPAG', 1, width, height, cluster, len(rows), len(targets)))
+        f.write(np.asarray(cluster_nodes, dtype='<u4').tobytes())
+        f.write(np.stack([np.asarray(rows), np.asarray(cols)], axis=1).astype('<u2').tobytes())
+        f.write(np.asarray(edge_offsets, dtype='<u4').tobytes())
+        f.write(np.stack([np.asarray(targets), np.asarray(costs)], axis=1).astype('<u4').tobytes())
+
+def read_hpa(path: str, mmap: bool = False) -> HpaGraph:
+    buf = _file_bytes(path, mmap)
+    magic, version, W, H, cluster, n_nodes, n_edges = HPAG_HEADER.unpack_from(buf, 0)
+    if magic != b'HPAG':
+        raise ValueError(f"Unexpected magic {magic!r}, expected b'HPAG'")
+    if version != 1:
+        raise ValueError(f"Unsupported HPAG version {version}")
+    clusters = -(-H // cluster) * -(-W // cluster)
+    offset = HPAG_HEADER.size
+    cluster_nodes = np.frombuffer(buf, dtype='<u4', count=clusters + 1, offset=offset)
+    offset += cluster_nodes.nbytes
+    cells = np.frombuffer(buf, dtype='<u2', count=2*n_nodes, offset=offset).reshape(n_nodes, 2)
+    offset += cells.nbytes
+    edge_offsets = np.frombuffer(buf, dtype='<u4', count=n_nodes + 1, offset=offset)
+    offset += edge_offsets.nbytes
+    edges = np.frombuffer(buf, dtype='<u4', count=2*n_edges, offset=offset).reshape(n_edges, 2)
+    return HpaGraph(W, H, cluster, cluster_nodes, cells[:, 0], cells[:, 1], edge_offsets,
+                    edges[:, 0], edges[:, 1])
+
+################################################################################
+# CHNK
+################################################################################
+def _rle_encode(data: bytes) -> bytes:
+    a = np.frombuffer(data, dtype=np.uint8)
+    if not a.size:
+        return b''
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    lengths = np.diff(np.r_[starts, a.size])
+    pieces = (lengths + 254) // 255            # runs longer than 255 are split
+    pairs = np.empty((int(pieces.sum()), 2), dtype=np.uint8)
+    pairs[:, 0] = 255
+    pairs[np.cumsum(pieces) - 1, 0] = lengths - 255 * (pieces - 1)
+    pairs[:, 1] = np.repeat(a[starts], pieces)
+    return pairs.tobytes()
+
+def _rle_decode(data: bytes) -> bytes:
+    pairs = np.frombuffer(data, dtype=np.uint8).reshape(-1, 2)
+    return np.repeat(pairs[:, 1], pairs[:, 0]).tobytes()
+
+_COMPRESS = {'raw': bytes, 'zlib': lambda b: zlib.compress(b, 9), 'rle': _rle_encode}
+_DECOMPRESS = {'raw': bytes, 'zlib': zlib.decompress, 'rle': _rle_decode}
+
+def _dtype_code(dtype: np.dtype) -> int:
+    for code, disk_dtype in MDEP_DTYPES.values():
+        if np.dtype(dtype) == disk_dtype:
+            return code
+    raise ValueError(f"Unsupported CHNK plane type: {dtype}")
+
+def write_chunked(path: str, planes: Sequence[np.ndarray], meta: bytes = b'',
+                  source: bytes = b'\0\0\0\0', chunk: int = CHUNK_SIZE,
+                  codec: str = 'zlib') -> None:
+    """
+    Write H×W `planes` (u8 / u16 / f16) as a CHNK container of chunk×chunk
+    tiles, each compressed on its own so readers can decode just a window.
+    """
+    H, W = planes[0].shape
+    dtypes = [np.dtype(p.dtype).newbyteorder('<') for p in planes]
+    codes = bytes(_dtype_code(dt) for dt in dtypes)
+    compress = _COMPRESS[codec]
+    blobs = []
+    for r0 in range(0, H, chunk):
+        for c0 in range(0, W, chunk):
+            blobs.append(compress(b''.join(
+                np.ascontiguousarray(p[r0:r0+chunk, c0:c0+chunk], dtype=dt).tobytes()
+                for p, dt in zip(planes, dtypes))))
+    index_offset = CHNK_HEADER.size + len(codes)
+    offsets = np.empty(len(blobs) + 1, dtype='<u4')
+    offsets[0] = index_offset + offsets.nbytes
+    offsets[1:] = offsets[0] + np.cumsum([len(b) for b in blobs])
+    header = CHNK_HEADER.pack(b'CHNK', 1, W, H, chunk, chunk, CHNK_CODECS.index(codec),
+                              len(planes), source, int(offsets[-1]), len(meta))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(codes)
+        f.write(offsets.tobytes())
+        f.writelines(blobs)
+        f.write(meta)
+
+class ChunkedGrid:
+    """
+    Random-access reader for a CHNK file.  The file is memory-mapped and
+    only the chunks a window touches are read and decompressed; the most
+    recently used `cache` chunks are kept decoded.
+    """
+
+    def __init__(self, path: str, cache: int = 64):
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        (magic, version, self.width, self.height, self.chunk_w, self.chunk_h, codec,
+         count, self.source, meta_offset, meta_size) = CHNK_HEADER.unpack_from(self._data, 0)
+        if magic != b'CHNK':
+            raise ValueError(f"Unexpected magic {magic!r}, expected b'CHNK'")
+        if version != 1:
+            raise ValueError(f"Unsupported CHNK version: {version}")
+        self.codec = CHNK_CODECS[codec]
+        codes = self._data[CHNK_HEADER.size:CHNK_HEADER.size + count]
+        self.dtypes = [next(dt for c, dt in MDEP_DTYPES.values() if c == code)
+                       for code in codes]
+        self.chunks_y = -(-self.height // self.chunk_h)
+        self.chunks_x = -(-self.width // self.chunk_w)
+        self.offsets = np.frombuffer(self._data, dtype='<u4',
+                                     count=self.chunks_y * self.chunks_x + 1,
+                                     offset=CHNK_HEADER.size + count)
+        self.meta = bytes(self._data[meta_offset:meta_offset + meta_size])
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache
+
+    def chunk(self, cy: int, cx: int) -> List[np.ndarray]:
+        """Decoded planes of chunk (cy, cx)."""
+        key = (cy, cx)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        i = cy * self.chunks_x + cx
+        raw = _DECOMPRESS[self.codec](bytes(self._data[self.offsets[i]:self.offsets[i+1]]))
+        h = min(self.chunk_h, self.height - cy * self.chunk_h)
+        w = min(self.chunk_w, self.width - cx * self.chunk_w)
+        planes, offset = [], 0
+        for dt in self.dtypes:
+            planes.append(np.frombuffer(raw, dtype=dt, count=h*w, offset=offset).reshape(h, w))
+            offset += h * w * dt.itemsize
+        self._cache[key] = planes
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return planes
+
+    def window(self, r0: int, r1: int, c0: int, c1: int) -> List[np.ndarray]:
+        """Every plane over rows [r0, r1) × cols [c0, c1), clipped to the map."""
+        r0, c0 = max(r0, 0), max(c0, 0)
+        r1, c1 = min(r1, self.height), min(c1, self.width)
+        out = [np.empty((max(r1 - r0, 0), max(c1 - c0, 0)), dtype=dt) for dt in self.dtypes]
+        for cy in range(r0 // self.chunk_h, -(-r1 // self.chunk_h)):
+            y0 = cy * self.chunk_h
+            ys = slice(max(r0 - y0, 0), min(r1 - y0, self.chunk_h))
+            for cx in range(c0 // self.chunk_w, -(-c1 // self.chunk_w)):
+                x0 = cx * self.chunk_w
+                xs = slice(max(c0 - x0, 0), min(c1 - x0, self.chunk_w))
+                for dst, src in zip(out, self.chunk(cy, cx)):
+                    dst[y0 + ys.start - r0:y0 + ys.stop - r0,
+                        x0 + xs.start - c0:x0 + xs.stop - c0] = src[ys, xs]
+        return out
+
+    def planes(self) -> List[np.ndarray]:
+        return self.window(0, self.height, 0, self.width)
+
+def _split_artifact(buf: bytes) -> Tuple[bytes, List[np.ndarray], bytes]:
+    """``(magic, planes, meta)`` of a REG2 / REG3 / MDEP / TILE file."""
+    magic = bytes(buf[:4])
+    if magic == b'REG2':
+        _, _, W, H = _read_header(buf, (b'REG2',))
+        end = HEADER.size + W * H * 3
+        body = np.frombuffer(buf, dtype=np.uint8, count=W*H*3,
+                             offset=HEADER.size).reshape(H, W, 3)
+        return magic, [body[..., k] for k in range(3)], bytes(buf[:HEADER.size] + buf[end:])
+    if magic == b'REG3':
+        W, H, dtypes, offsets, names_offset = _reg3_layout(buf)
+        planes = [np.frombuffer(buf, dtype=dt, count=W*H, offset=o).reshape(H, W)
+                  for dt, o in zip(dtypes, offsets)]
+        return magic, planes, bytes(buf[:REG3_HEADER.size] + buf[names_offset:])
+    if magic == b'MDEP':
+        W, H, disk_dtype, _, offset = _mdep_layout(buf)
+        depth = np.frombuffer(buf, dtype=disk_dtype, count=W*H, offset=offset).reshape(H, W)
+        return magic, [depth], bytes(buf[:offset])
+    if magic == b'TILE':
+        (_, _, W, H, count, plane_offset, stride,
+         names_offset, names_size) = TILE_HEADER.unpack_from(buf, 0)
+        planes = [np.frombuffer(buf, dtype=np.uint8, count=W*H,
+                                offset=plane_offset + i*stride).reshape(H, W)
+                  for i in range(count)]
+        return magic, planes, bytes(buf[:plane_offset] + buf[names_offset:])
+    raise ValueError(f"Can't chunk a {magic!r} file")
+
+def chunk_artifact(src: str, dst: str, chunk: int = CHUNK_SIZE,
+                   codec: str = 'zlib') -> None:
+    """Wrap an existing REG2 / REG3 / MDEP / TILE file in a CHNK container."""
+    with open(src, 'rb') as f:
+        buf = f.read()
+    magic, planes, meta = _split_artifact(buf)
+    write_chunked(dst, planes, meta, magic, chunk, codec)
+
+def unchunk_artifact(path: str) -> bytes:
+    """The original bytes of the artifact wrapped in a CHNK file."""
+    grid = ChunkedGrid(path)
+    planes, meta = grid.planes(), grid.meta
+    if grid.source == b'REG2':
+        body = np.stack(planes, axis=-1)
+        return meta[:HEADER.size] + body.tobytes() + meta[HEADER.size:]
+    if grid.source == b'REG3':
+        body = b''.join(p.tobytes().ljust(_reg3_aligned(p.nbytes), b'\0') for p in planes)
+        return meta[:REG3_HEADER.size] + body + meta[REG3_HEADER.size:]
+    if grid.source == b'MDEP':
+        return meta + planes[0].tobytes()
+    if grid.source == b'TILE':
+        plane_offset, stride = TILE_HEADER.unpack_from(meta, 0)[5:7]
+        body = np.zeros((len(planes), stride), dtype=np.uint8)
+        for i, p in enumerate(planes):
+            body[i, :p.size] = p.ravel()
+        return meta[:plane_offset] + body.tobytes() + meta[plane_offset:]
+    raise ValueError(f"Unknown CHNK source {grid.source!r}")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Preprocessing benchmark over synthetic worldmaps (generate_worldmap.py).
+
+For every requested size the map is generated (cached in --work-dir) and
+the pipeline is run stage by stage in a fresh process:
+
+    load            worldmap_io.load_map
+    tokenize        annotations.tokenize
+    water_mask      map_preprocessing.build_water_mask
+    annotations     map_preprocessing.parse_annotations
+    geo_features    detect_labels + build_geo_feature_grid
+    cost_grid       map_preprocessing.build_cost_grid
+    realm_floods    map_preprocessing.realm_floods
+    sub_realms      merge_realms + assign_sub_realms
+    mountains       restore_terrain_under_labels + calculate_mountain_depths_bfs
+    write           REG2 + POI CSV + MDEP
+
+Each stage is timed (best of --repeat) and, in a separate pass under
+tracemalloc, its peak allocation is recorded; the process's peak RSS is
+reported per size.  Results can be saved as a baseline JSON and later runs
+compared against it: a stage is a regression when it is more than
+--tolerance slower than the baseline and by more than --min-delta seconds.
+
+Usage: python benchmark.py [--sizes 563x177,2000x1000,...] [--seed N]
+                           [--repeat N] [--no-memory] [--work-dir DIR]
+                           [--save BASELINE.json] [--compare BASELINE.json]
+"""
+from __future__ import annotations
+import argparse, json, os, platform, resource, sys, tempfile, time, tracemalloc
+import multiprocessing as mp
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from generate_worldmap import generate_worldmap, parse_size
+
+BENCHMARK_VERSION = 1
+DEFAULT_SIZES = '563x177,2000x1000,5000x5000'
+PRESETS = {'current': '563x177', 'medium': '2000x1000', 'large': '5000x5000',
+           'huge': '10000x10000'}
+
+################################################################################
+# STAGES
+################################################################################
+def _stages(map_path: str, out_dir: str) -> List[Tuple[str, Callable[[dict], None]]]:
+    """The pipeline as (name, step) pairs; each step reads and extends `ctx`."""
+    from worldmap_io import load_map
+    from annotations import tokenize
+    from artifact_io import write_regions
+    from map_preprocessing import (build_water_mask, parse_annotations, build_cost_grid,
+                                   realm_floods, merge_realms, assign_sub_realms,
+                                   write_poi_csv)
+    from geo_features_preprocessing import detect_labels, build_geo_feature_grid
+    from mountain_depth_preprocessing import (restore_terrain_under_labels,
+                                              calculate_mountain_depths_bfs, write_depth_file)
+
+    def load(ctx):
+        ctx['grid'], ctx['H'], ctx['W'] = load_map(map_path)
+    def tokens(ctx):
+        ctx['tokens'] = tokenize(ctx['grid'])
+    def water(ctx):
+        ctx['water_mask'] = build_water_mask(ctx['grid'])
+    def annotations(ctx):
+        grid = ctx['grid'].copy()
+        (_, _, ctx['realm_seeds'], ctx['sub_seeds'], ctx['realm_names'],
+         ctx['sub_names']) = parse_annotations(grid, ctx['H'], ctx['W'], ctx['tokens'])
+        ctx['blanked'] = grid
+    def geo(ctx):
+        ctx['geo_labels'] = detect_labels(ctx['blanked'], ctx['tokens'])
+        (ctx['clean_grid'], ctx['geo_id_grid'], ctx['geo_names'], ctx['geo_seed_rows'],
+         ctx['geo_seed_cols']) = build_geo_feature_grid(ctx['blanked'], ctx['geo_labels'])
+    def cost(ctx):
+        ctx['cost'] = build_cost_grid(ctx['clean_grid'], ctx['water_mask'], ctx['H'], ctx['W'])
+    def floods(ctx):
+        (ctx['owner_all'], _, ctx['owner_realm'], _) = realm_floods(
+            ctx['realm_seeds'], ctx['sub_seeds'], len(ctx['realm_names']), ctx['cost'])
+    def subs(ctx):
+        n = len(ctx['realm_names'])
+        ctx['sub_parent'] = {sid: ctx['owner_realm'][r, c]
+                             for (r, c), sid in ctx['sub_seeds'].items()}
+        ctx['final_realm'] = merge_realms(ctx['owner_all'], ctx['owner_realm'],
+                                          ctx['sub_parent'], n)
+        ctx['final_sub'] = np.full((ctx['H'], ctx['W']), -1, int)
+        assign_sub_realms(ctx['final_realm'], ctx['sub_seeds'], ctx['sub_parent'],
+                          ctx['cost'], n, ctx['final_sub'])
+    def mountains(ctx):
+        restored = restore_terrain_under_labels(ctx['grid'], ctx['H'], ctx['W'], ctx['tokens'])
+        ctx['depth'] = calculate_mountain_depths_bfs(restored, ctx['H'], ctx['W'])
+    def write(ctx):
+        out = Path(out_dir)
+        write_regions(out / 'bench_regions.bin', ctx['final_realm'], ctx['final_sub'],
+                   ctx['geo_id_grid'], ctx['realm_names'], ctx['sub_names'], ctx['geo_names'])
+        write_poi_csv(out / 'bench_pois.csv', ctx)
+        write_depth_file(out / 'bench_mountains.bin', ctx['depth'], ctx['W'], ctx['H'])
+
+    return [('load', load), ('tokenize', tokens), ('water_mask', water),
+            ('annotations', annotations), ('geo_features', geo), ('cost_grid', cost),
+            ('realm_floods', floods), ('sub_realms', subs), ('mountains', mountains),
+            ('write', write)]
+
+def _quiet(step: Callable[[dict], None], ctx: dict) -> None:
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as sys.stdout:
+        try:
+            step(ctx)
+        finally:
+            sys.stdout = stdout
+
+def run_map(map_path: str, repeat: int = 1, memory: bool = True) -> Dict:
+    """Per-stage seconds (best of `repeat`) and peak MB for one map."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        stages = _stages(map_path, out_dir)
+        results = {name: {'seconds': float('inf')} for name, _ in stages}
+        for _ in range(repeat):
+            ctx: dict = {}
+            for name, step in stages:
+                start = time.perf_counter()
+                _quiet(step, ctx)
+                results[name]['seconds'] = min(results[name]['seconds'],
+                                               time.perf_counter() - start)
+        if memory:
+            ctx = {}
+            tracemalloc.start()
+            for name, step in stages:
+                tracemalloc.reset_peak()
+                _quiet(step, ctx)
+                results[name]['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        H, W = ctx['H'], ctx['W']
+    return {'width': W, 'height': H, 'stages': results,
+            'total_seconds': sum(r['seconds'] for r in results.values()),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def _map_for(size: Tuple[int, int], seed: int, work_dir: Path) -> Path:
+    W, H = size
+    path = work_dir / f"synthetic_{W}x{H}_s{seed}.worldmap"
+    if not path.exists():
+        generate_worldmap(str(path), W, H, seed)
+    return path
+
+################################################################################
+# BASELINES
+################################################################################
+def environment() -> Dict:
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(),
+            'cpu_count': os.cpu_count()}
+
+def compare(results: Dict, baseline: Dict, tolerance: float,
+            min_delta: float) -> List[str]:
+    """Human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for size, run in results['runs'].items():
+        base = baseline.get('runs', {}).get(size)
+        if base is None:
+            continue
+        for stage, r in run['stages'].items():
+            b = base['stages'].get(stage)
+            if b is None:
+                continue
+            delta = r['seconds'] - b['seconds']
+            if delta > min_delta and r['seconds'] > b['seconds'] * (1 + tolerance):
+                regressions.append(f"{size} {stage}: {b['seconds']:.3f}s -> "
+                                   f"{r['seconds']:.3f}s ({r['seconds'] / b['seconds']:.2f}x)")
+    return regressions
+
+def print_table(results: Dict, baseline: Dict | None = None) -> None:
+    for size, run in results['runs'].items():
+        base = (baseline or {}).get('runs', {}).get(size)
+        print(f"\n{size}  total {run['total_seconds']:.2f}s  peak RSS {run['max_rss_mb']:.0f} MB")
+        for stage, r in run['stages'].items():
+            line = f"  {stage:<13} {r['seconds']:9.3f}s"
+            if 'peak_mb' in r:
+                line += f"  {r['peak_mb']:9.1f} MB"
+            if base and stage in base['stages']:
+                line += f"  (baseline {base['stages'][stage]['seconds']:.3f}s)"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing stages.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"comma-separated WxH sizes or presets {', '.join(PRESETS)} "
+                             f"(default: {DEFAULT_SIZES})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timing runs per size (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--work-dir', default=None,
+                        help="where generated maps are cached (default: a temporary directory)")
+    parser.add_argument('--save', default=None, help="write the results as a baseline JSON")
+    parser.add_argument('--compare', default=None, help="baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown per stage before it counts as a regression")
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    sizes = [parse_size(PRESETS.get(s.strip(), s.strip())) for s in args.sizes.split(',')]
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(args.work_dir or tmp)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        results = {'version': BENCHMARK_VERSION, 'seed': args.seed,
+                   'environment': environment(), 'runs': {}}
+        ctx = mp.get_context('spawn')
+        for size in sizes:
+            map_path = _map_for(size, args.seed, work_dir)
+            # A fresh process per size keeps peak RSS and caches per size
+            with ctx.Pool(1) as pool:
+                run = pool.apply(run_map, (str(map_path), args.repeat, not args.no_memory))
+            results['runs'][f"{size[0]}x{size[1]}"] = run
+            print(f"{size[0]}x{size[1]}: {run['total_seconds']:.2f}s", flush=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
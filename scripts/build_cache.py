@@ -0,0 +1,122 @@
+"""
+Content-addressed keys for the preprocessed map artifacts.
+
+An artifact's key is a SHA-256 over everything that can change its bytes:
+
+    * the worldmap file contents
+    * the source of the entry script and every local module it imports
+      (followed transitively through scripts/)
+    * the terrain cost / feature tables, serialised canonically
+    * the artifact's format version
+
+Keys are recorded in a sidecar manifest (``build-manifest.json`` next to the
+artifacts) rather than in the binary headers, so the REG2/MDEP layouts the
+game reads stay untouched.  A checkout or ``touch`` that doesn't change any
+of these inputs keeps the key, so nothing is rebuilt.
+"""
+from __future__ import annotations
+import ast, hashlib, json, os
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+MANIFEST_NAME = 'build-manifest.json'
+
+################################################################################
+# INPUTS
+################################################################################
+def module_closure(entry: Path) -> List[Path]:
+    """`entry` plus every scripts/ module it imports, directly or indirectly."""
+    seen: Dict[str, Path] = {}
+    todo = [Path(entry).resolve()]
+    while todo:
+        path = todo.pop()
+        if path.stem in seen:
+            continue
+        seen[path.stem] = path
+        tree = ast.parse(path.read_text(encoding='utf-8'), filename=str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                local = SCRIPTS_DIR / f"{name.split('.')[0]}.py"
+                if local.exists():
+                    todo.append(local)
+    return sorted(seen.values())
+
+def cost_tables() -> dict:
+    """Every build-time constant table that feeds the artifacts."""
+    import map_preprocessing as mp
+    import geo_features_preprocessing as geo
+    import annotations
+    return {
+        'TERRAIN_COST': mp.TERRAIN_COST,
+        'TERRAIN_FEATURE_CHARS': sorted(geo.TERRAIN_FEATURE_CHARS),
+        'TRANSPARENT': sorted(geo.TRANSPARENT),
+        'LABEL_CHAR': annotations.LABEL_CHAR,
+        'RIVER_CHARS': sorted(geo.RIVER_CHARS),
+    }
+
+def artifact_key(inputs: Iterable[Path], entry: Path, format_version: str,
+                 upstream: Iterable[str] = ()) -> str:
+    """Content hash identifying one build of an artifact.
+
+    `inputs` are the data files it is built from (the worldmap); `upstream`
+    are the keys of any artifacts it consumes, so rebuilding those
+    invalidates this one too.
+    """
+    h = hashlib.sha256()
+    def feed(label: str, data: bytes) -> None:
+        h.update(label.encode('utf-8') + b'\0' + len(data).to_bytes(8, 'little'))
+        h.update(data)
+
+    feed('format', format_version.encode('utf-8'))
+    for path in inputs:
+        feed(f'input:{Path(path).name}', Path(path).read_bytes())
+    for module in module_closure(entry):
+        feed(f'module:{module.name}', module.read_bytes())
+    feed('tables', json.dumps(cost_tables(), sort_keys=True).encode('utf-8'))
+    for key in upstream:
+        feed('upstream', key.encode('ascii'))
+    return h.hexdigest()
+
+################################################################################
+# MANIFEST
+################################################################################
+def manifest_path(output_dir: Path) -> Path:
+    return Path(output_dir) / MANIFEST_NAME
+
+def load_manifest(output_dir: Path) -> Dict[str, dict]:
+    try:
+        with open(manifest_path(output_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(output_dir: Path, manifest: Dict[str, dict]) -> None:
+    path = manifest_path(output_dir)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+def stale_outputs(outputs: Iterable[Path], key: str,
+                  manifest: Dict[str, dict]) -> List[Path]:
+    """Outputs that are missing or were last built from a different key."""
+    stale = []
+    for out in outputs:
+        out = Path(out)
+        entry = manifest.get(out.name, {})
+        if not out.exists() or entry.get('key') != key:
+            stale.append(out)
+    return stale
+
+def record_outputs(outputs: Iterable[Path], key: str, format_version: str,
+                   manifest: Dict[str, dict]) -> None:
+    for out in outputs:
+        manifest[Path(out).name] = {'key': key, 'format': format_version}
@@ -0,0 +1,129 @@
+"""
+Minimal build graph for the preprocessing artifacts.
+
+Each :class:`Stage` declares the data files it reads, the artifacts it
+writes, the script whose module closure implements it, and the stages whose
+outputs it consumes.  :func:`run_graph` hashes every stage (build_cache.py),
+rebuilds only the stale ones and runs independent stages concurrently in a
+process pool, so a cold build takes about as long as the slowest stage.
+"""
+from __future__ import annotations
+import importlib, os, time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from build_cache import (artifact_key, load_manifest, save_manifest,
+                         stale_outputs, record_outputs)
+
+@dataclass
+class Stage:
+    name: str
+    target: str                         # "module:function", called as f(*inputs, *outputs)
+    entry: Path                         # script hashed (with its imports) into the key
+    inputs: List[Path]
+    outputs: List[Path]
+    format_version: str
+    deps: List[str] = field(default_factory=list)
+
+    def args(self) -> List[str]:
+        return [str(p) for p in (*self.inputs, *self.outputs)]
+
+def _run_stage(target: str, args: Sequence[str]) -> float:
+    """Worker entry point: import the target and run it; returns seconds taken."""
+    module_name, func_name = target.split(':')
+    func = getattr(importlib.import_module(module_name), func_name)
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def _ordered(stages: Sequence[Stage]) -> List[Stage]:
+    """Stages in dependency order (raises on unknown deps or cycles)."""
+    by_name = {s.name: s for s in stages}
+    done: Dict[str, bool] = {}
+    order: List[Stage] = []
+    def visit(stage: Stage, path: tuple) -> None:
+        if done.get(stage.name):
+            return
+        if stage.name in path:
+            raise ValueError(f"Build graph cycle: {' -> '.join(path + (stage.name,))}")
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage {dep!r}")
+            visit(by_name[dep], path + (stage.name,))
+        done[stage.name] = True
+        order.append(stage)
+    for stage in stages:
+        visit(stage, ())
+    return order
+
+def stage_keys(stages: Sequence[Stage]) -> Dict[str, str]:
+    """``{stage name: artifact key}`` for already ordered `stages`."""
+    # Keys are computed in dependency order so upstream keys feed downstream
+    keys: Dict[str, str] = {}
+    for stage in stages:
+        keys[stage.name] = artifact_key(stage.inputs, stage.entry, stage.format_version,
+                                        upstream=[keys[d] for d in stage.deps])
+    return keys
+
+def mark_built(stages: Sequence[Stage], name: str, outputs: Sequence[Path],
+               output_dir: Path) -> List[Path]:
+    """
+    Record those of `outputs` that belong to stage `name` as up to date in
+    the manifest, for tools that bring them up to date outside run_graph
+    (with the same bytes the stage would write).  Returns the ones recorded.
+    """
+    stages = _ordered(stages)
+    stage = next(s for s in stages if s.name == name)
+    own = {Path(p).resolve() for p in stage.outputs}
+    recorded = [Path(p) for p in outputs if Path(p).resolve() in own]
+    if recorded:
+        manifest = load_manifest(output_dir)
+        record_outputs(recorded, stage_keys(stages)[name], stage.format_version, manifest)
+        save_manifest(output_dir, manifest)
+    return recorded
+
+def run_graph(stages: Sequence[Stage], output_dir: Path, force: bool = False,
+              jobs: int | None = None) -> List[str]:
+    """Rebuild stale stages; returns the names of the stages that ran."""
+    stages = _ordered(stages)
+    manifest = load_manifest(output_dir)
+    keys = stage_keys(stages)
+
+    pending = {}
+    for stage in stages:
+        stale = stale_outputs(stage.outputs, keys[stage.name], manifest)
+        if force or stale or any(d in pending for d in stage.deps):
+            pending[stage.name] = stage
+            for out in stale:
+                reason = "doesn't exist" if not out.exists() else "has changed inputs"
+                print(f"Output {out} {reason} - regeneration needed")
+    if not pending:
+        return []
+
+    def finished(stage: Stage, seconds: float) -> None:
+        print(f"[{stage.name}] done in {seconds:.2f}s")
+        record_outputs(stage.outputs, keys[stage.name], stage.format_version, manifest)
+        save_manifest(output_dir, manifest)
+
+    ran: List[str] = []
+    if len(pending) == 1:
+        (stage,) = pending.values()
+        finished(stage, _run_stage(stage.target, stage.args()))
+        return [stage.name]
+
+    workers = jobs or min(len(pending), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if not any(d in pending or d in running.values() for d in stage.deps):
+                    del pending[name]
+                    running[pool.submit(_run_stage, stage.target, stage.args())] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                finished(next(s for s in stages if s.name == name), future.result())
+                ran.append(name)
+    return ran
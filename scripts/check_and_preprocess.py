@@ -1,91 +1,88 @@
 #!/usr/bin/env python3
 """
-Check if map preprocessing needs to be run based on file timestamps.
-Automatically regenerates binary grid and POI CSV when the source map is newer.
+Check if map preprocessing needs to be run based on content hashes.
+Rebuilds the stale artifacts (region grid, POI CSV and table, mountain
+depth) when the source map, the preprocessing code or its cost tables
+change (see build_cache.py and build_graph.py); preprocess.py builds them
+all from a single load of the map.
+
+Artifacts the game doesn't load are only built when asked for with
+``--with`` (``tiles`` for the planar tile grid, ``travel`` for the POI
+travel matrix, ``hpa`` for the HPA* graph, ``prox`` for the proximity
+fields); they are written by the map stage from the layers it already
+has in memory.  ``tiles`` fails on maps with more than 255 realms,
+sub-realms or geo features, whose ids don't fit the TILE planes.
+
+Usage: python check_and_preprocess.py [--force] [-j N] [--with NAME[,NAME...]]
 """
-import os
+import argparse
 import sys
-import subprocess
 from pathlib import Path
 
-def needs_regeneration(source_path, output_paths):
-    """Check if source is newer than any of the outputs."""
-    if not os.path.exists(source_path):
-        print(f"Error: Source file {source_path} not found")
-        return False
-    
-    source_mtime = os.path.getmtime(source_path)
-    
-    for output_path in output_paths:
-        if not os.path.exists(output_path):
-            print(f"Output {output_path} doesn't exist - regeneration needed")
-            return True
-        
-        output_mtime = os.path.getmtime(output_path)
-        if source_mtime > output_mtime:
-            print(f"Source {source_path} is newer than {output_path} - regeneration needed")
-            return True
-    
-    return False
+from build_graph import Stage, run_graph
+
+# Opt-in map stage outputs (--with): name -> file under maps/
+EXTRAS = {'tiles': "middle_earth_tiles.bin",
+          'travel': "middle_earth_travel.bin",
+          'hpa': "middle_earth_hpa.bin",
+          'prox': "middle_earth_proximity.bin"}
+
+def map_stages(project_root, extras=()):
+    """Every preprocessed artifact and what it is built from.
+
+    preprocess.py loads the map once and writes the grids and POI files,
+    plus any `extras` (keys of EXTRAS) from the same layers.  Extras don't
+    change the map stage's key, so dropping them again doesn't rebuild the
+    rest.
+    """
+    maps = project_root / "maps"
+    scripts = project_root / "scripts"
+    map_file = maps / "middle_earth.worldmap"
+    return [
+        Stage(name="map",
+              target="preprocess:build_all",
+              entry=scripts / "preprocess.py",
+              inputs=[map_file],
+              outputs=[maps / "middle_earth_regions.bin", maps / "middle_earth_pois.csv",
+                       maps / "middle_earth_mountains.bin", maps / "middle_earth_pois.bin",
+                       *(maps / EXTRAS[name] for name in extras)],
+              format_version="REG2+POI-CSV+MDEP+POIB/1"),
+    ]
 
 def main():
+    parser = argparse.ArgumentParser(description="Rebuild stale map artifacts.")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild every artifact regardless of the manifest")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: one per stale stage)")
+    parser.add_argument('--with', dest='extras', default='', metavar='NAME[,NAME...]',
+                        help=f"also build these artifacts the game doesn't load "
+                             f"({','.join(EXTRAS)})")
+    args = parser.parse_args()
+    extras = [e.strip() for e in args.extras.split(',') if e.strip()]
+    unknown = set(extras) - set(EXTRAS)
+    if unknown:
+        parser.error(f"unknown artifact(s): {', '.join(sorted(unknown))}")
+
     # Define paths relative to project root
-    project_root = Path(__file__).parent.parent
-    
+    project_root = Path(__file__).resolve().parent.parent
     map_file = project_root / "maps" / "middle_earth.worldmap"
-    binary_output = project_root / "maps" / "middle_earth_regions.bin"
-    poi_output = project_root / "maps" / "middle_earth_pois.csv"
-    preprocessing_script = project_root / "scripts" / "map_preprocessing.py"
-    
-    # Check if any preprocessing module has changed
-    preprocessing_modules = [
-        project_root / "scripts" / "map_preprocessing.py",
-        project_root / "scripts" / "geo_features_preprocessing.py",
-        project_root / "scripts" / "mountain_depth_preprocessing.py"
-    ]
-    
-    # Get the newest modification time among all preprocessing modules
-    newest_module_time = 0
-    for module in preprocessing_modules:
-        if module.exists():
-            newest_module_time = max(newest_module_time, module.stat().st_mtime)
-    
-    # Check if regeneration is needed
-    outputs = [binary_output, poi_output]
-    needs_regen = needs_regeneration(map_file, outputs)
-    
-    # Also check if any preprocessing module is newer than outputs
-    if not needs_regen:
-        for output in outputs:
-            if output.exists() and newest_module_time > output.stat().st_mtime:
-                print(f"Preprocessing module changed - regeneration needed")
-                needs_regen = True
-                break
-    
-    if needs_regen:
-        print("Running map preprocessing...")
-        cmd = [
-            sys.executable,
-            str(preprocessing_script),
-            str(map_file),
-            str(binary_output),
-            str(poi_output)
-        ]
-        
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                print("Preprocessing completed successfully")
-                print(result.stdout)
-            else:
-                print("Preprocessing failed!")
-                print(result.stderr)
-                sys.exit(1)
-        except Exception as e:
-            print(f"Error running preprocessing: {e}")
-            sys.exit(1)
+    if not map_file.exists():
+        print(f"Error: Source file {map_file} not found")
+        return
+
+    try:
+        ran = run_graph(map_stages(project_root, extras), map_file.parent,
+                        force=args.force, jobs=args.jobs)
+    except Exception as e:
+        print("Preprocessing failed!")
+        print(f"Error running preprocessing: {e}")
+        sys.exit(1)
+
+    if ran:
+        print(f"Preprocessing completed successfully: {', '.join(ran)}")
     else:
         print("Map data is up to date - no regeneration needed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
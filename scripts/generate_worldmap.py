@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of synthetic worldmaps (maps/map.spec.md) for
+scaling tests and benchmarks.
+
+The same ``(width, height, seed)`` always gives the same bytes.  A map has
+
+    * terrain from two value-noise fields (elevation, moisture): deep water
+      '=' below sea level, hills '~' and mountains '^' on the high ground,
+      forest '&', marsh '%' and fields '"' by moisture, open land elsewhere;
+    * rivers ('-' east-west, '|' north-south) that wander from the high
+      ground until they reach the sea, and roads ('.') between random land
+      tiles with a bridge '+' wherever they cross a river;
+    * annotations: [Realm] and (Province) seeds, !Poi, @River labels, ?Region
+      labels and bare feature names written inside forest / mountain / hill
+      / marsh patches, and bare sea names embedded in the ocean.
+
+Feature density per tile matches the Middle-earth map, so larger maps have
+proportionally more of everything, except that realms, provinces and
+feature names stop at `max_names` each (the default keeps the regions in
+REG2; raise it to exercise the wide REG3 grid).
+
+Terrain is generated in row bands and the map is kept as one uint8 grid,
+so a 10k×10k map needs ~100 MB plus a few band-sized float arrays.
+
+Usage: python generate_worldmap.py <output_map> [--size WxH] [--seed N]
+                                   [--max-names N]
+"""
+from __future__ import annotations
+import argparse
+import numpy as np
+from typing import Iterator, List, Set, Tuple
+
+SEA, MOUNTAIN, HILL, FOREST, MARSH, FIELD, OPEN = b'=^~&%" '
+RIVER_EW, RIVER_NS, ROAD, BRIDGE = b'-|.+'
+
+SEA_LEVEL = 0.46
+HILL_LEVEL = 0.64
+MOUNTAIN_LEVEL = 0.70
+BAND_ROWS = 512
+
+# Features per tile, measured on middle_earth.worldmap (563×177)
+DENSITY = {'realm': 9, 'province': 33, 'poi': 60, 'river_label': 12,
+           'region': 20, 'feature': 30, 'sea': 4, 'river': 25, 'road': 10}
+REFERENCE_TILES = 563 * 177
+
+SYLLABLES = ('an', 'dor', 'gon', 'mir', 'ell', 'thar', 'ion', 'ost', 'rim', 'bel',
+             'las', 'hal', 'nor', 'eth', 'ur', 'val', 'mor', 'dun', 'fal', 'ris',
+             'ken', 'tal', 'ber', 'gal', 'lor', 'ith', 'ard', 'en', 'wen', 'ad')
+SUFFIXES = {MOUNTAIN: ('_Mountains', '_Peaks', ''), HILL: ('_Hills', '_Downs', ''),
+            FOREST: ('_Wood', '_Forest', ''), MARSH: ('_Fens', '_Marshes', ''),
+            SEA: ('_Sea', '_Bay', '')}
+
+################################################################################
+# TERRAIN
+################################################################################
+def _value_noise(rng: np.random.Generator, H: int, W: int,
+                 cell: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Bilinear value noise with lattice spacing `cell`, as (r0, band) pairs."""
+    coarse = rng.random((H // cell + 2, W // cell + 2), dtype=np.float32)
+    x = np.arange(W, dtype=np.float32) / cell
+    j = x.astype(np.intp)
+    s = x - j
+    cols = coarse[:, j] * (1 - s) + coarse[:, j + 1] * s        # (h, W)
+    for r0 in range(0, H, BAND_ROWS):
+        y = np.arange(r0, min(r0 + BAND_ROWS, H), dtype=np.float32) / cell
+        i = y.astype(np.intp)
+        t = (y - i)[:, None]
+        yield r0, cols[i] * (1 - t) + cols[i + 1] * t
+
+def _fractal(rng: np.random.Generator, H: int, W: int,
+             cells: Tuple[int, ...], weights: Tuple[float, ...]) -> Iterator[np.ndarray]:
+    """Weighted sum of value-noise octaves, band by band."""
+    octaves = [_value_noise(rng, H, W, c) for c in cells]
+    for bands in zip(*octaves):
+        yield sum(w * band for w, (_, band) in zip(weights, bands))
+
+def generate_terrain(W: int, H: int, rng: np.random.Generator) -> np.ndarray:
+    """H×W uint8 grid of terrain glyphs (no rivers, roads or labels yet)."""
+    grid = np.empty((H, W), dtype=np.uint8)
+    elevation = _fractal(rng, H, W, (96, 24, 6), (0.6, 0.3, 0.1))
+    moisture = _fractal(rng, H, W, (48, 12), (0.7, 0.3))
+    for r0, (e, m) in zip(range(0, H, BAND_ROWS), zip(elevation, moisture)):
+        band = np.full(e.shape, OPEN, dtype=np.uint8)
+        band[m > 0.60] = FOREST
+        band[(m < 0.30) & (e > 0.56)] = FIELD
+        band[(m < 0.24) & (e < 0.52)] = MARSH
+        band[e > HILL_LEVEL] = HILL
+        band[e > MOUNTAIN_LEVEL] = MOUNTAIN
+        band[e < SEA_LEVEL] = SEA
+        grid[r0:r0 + len(band)] = band
+    return grid
+
+def _walk(rng: np.random.Generator, start: Tuple[int, int], main: Tuple[int, int],
+          length: int, wander: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """A 4-connected walk mostly along `main`; returns rows, cols, horizontal."""
+    side = (main[1], main[0])
+    pick = rng.random(length) < wander
+    sign = np.where(rng.random(length) < 0.5, -1, 1)
+    dr = np.where(pick, side[0] * sign, main[0])
+    dc = np.where(pick, side[1] * sign, main[1])
+    rows = start[0] + np.cumsum(dr)
+    cols = start[1] + np.cumsum(dc)
+    return rows, cols, dc != 0
+
+def _clip_walk(grid: np.ndarray, rows, cols, horizontal, stop_at_sea: bool):
+    H, W = grid.shape
+    inside = (rows >= 0) & (rows < H) & (cols >= 0) & (cols < W)
+    n = int(np.argmin(inside)) if not inside.all() else len(rows)
+    rows, cols, horizontal = rows[:n], cols[:n], horizontal[:n]
+    if stop_at_sea:
+        sea = grid[rows, cols] == SEA
+        if sea.any():
+            n = int(np.argmax(sea))
+            rows, cols, horizontal = rows[:n], cols[:n], horizontal[:n]
+    return rows, cols, horizontal
+
+def _random_cells(rng: np.random.Generator, grid: np.ndarray, allowed: bytes,
+                  count: int, tries: int = 40) -> List[Tuple[int, int]]:
+    """Up to `count` random cells whose terrain is in `allowed`."""
+    H, W = grid.shape
+    rows = rng.integers(0, H, count * tries)
+    cols = rng.integers(0, W, count * tries)
+    lut = np.zeros(256, dtype=bool)
+    lut[np.frombuffer(allowed, dtype=np.uint8)] = True
+    ok = lut[grid[rows, cols]]
+    return list(zip(rows[ok][:count].tolist(), cols[ok][:count].tolist()))
+
+def add_rivers(grid: np.ndarray, rng: np.random.Generator, count: int) -> None:
+    H, W = grid.shape
+    for r, c in _random_cells(rng, grid, bytes((HILL, MOUNTAIN)), count):
+        main = [(0, 1), (0, -1), (1, 0), (-1, 0)][rng.integers(4)]
+        rows, cols, horizontal = _clip_walk(
+            grid, *_walk(rng, (r, c), main, int(rng.integers(40, 400)), 0.35), True)
+        grid[rows, cols] = np.where(horizontal, RIVER_EW, RIVER_NS)
+
+def add_roads(grid: np.ndarray, rng: np.random.Generator, count: int) -> None:
+    for r, c in _random_cells(rng, grid, bytes((OPEN, FIELD, FOREST)), count):
+        main = [(0, 1), (0, -1), (1, 0), (-1, 0)][rng.integers(4)]
+        rows, cols, _ = _clip_walk(
+            grid, *_walk(rng, (r, c), main, int(rng.integers(30, 300)), 0.25), True)
+        cells = grid[rows, cols]
+        grid[rows, cols] = np.where((cells == RIVER_EW) | (cells == RIVER_NS), BRIDGE, ROAD)
+
+################################################################################
+# LABELS
+################################################################################
+class _Names:
+    """Unique pronounceable names (ASCII letters and '_', 3+ characters)."""
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.used: Set[str] = set()
+
+    def __call__(self, suffixes: Tuple[str, ...] = ('',)) -> str:
+        while True:
+            n = int(self.rng.integers(2, 4))
+            stem = ''.join(SYLLABLES[i] for i in self.rng.integers(0, len(SYLLABLES), n))
+            name = stem.capitalize() + suffixes[int(self.rng.integers(len(suffixes)))]
+            if name not in self.used:
+                self.used.add(name)
+                return name
+
+def _place(grid: np.ndarray, rng: np.random.Generator, text: str, inside: bytes,
+           tries: int = 64) -> bool:
+    """
+    Write `text` at a random spot whose tiles, plus one on either side, are
+    all in `inside`, so the label sits within a single patch.
+    """
+    H, W = grid.shape
+    n = len(text)
+    if n + 2 > W:
+        return False
+    lut = np.zeros(256, dtype=bool)
+    lut[np.frombuffer(inside, dtype=np.uint8)] = True
+    rows = rng.integers(0, H, tries)
+    cols = rng.integers(1, W - n, tries)
+    fits = lut[grid[rows[:, None], cols[:, None] + np.arange(-1, n + 1)]].all(axis=1)
+    if not fits.any():
+        return False
+    i = int(np.argmax(fits))
+    grid[rows[i], cols[i]:cols[i] + n] = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    return True
+
+def add_labels(grid: np.ndarray, rng: np.random.Generator, counts: dict) -> None:
+    names = _Names(rng)
+    land = bytes((OPEN, FIELD, FOREST, HILL))
+    for kind, template, inside in (('realm', '[{}]', land), ('province', '({})', land),
+                                   ('poi', '!{}', land)):
+        for _ in range(counts[kind]):
+            _place(grid, rng, template.format(names()), inside)
+    for _ in range(counts['river_label']):
+        _place(grid, rng, '@' + names(('_River', '_Water')), bytes((RIVER_EW,)))
+    feature_terrain = (MOUNTAIN, HILL, FOREST, MARSH)
+    for i in range(counts['feature']):
+        t = feature_terrain[i % len(feature_terrain)]
+        _place(grid, rng, names(SUFFIXES[t]), bytes((t,)))
+    for i in range(counts['region']):
+        t = feature_terrain[i % len(feature_terrain)]
+        _place(grid, rng, '?' + names(SUFFIXES[t]), bytes((t,)))
+    for _ in range(counts['sea']):
+        _place(grid, rng, names(SUFFIXES[SEA]), bytes((SEA,)))
+
+def label_counts(W: int, H: int, max_names: int = 250) -> dict:
+    """How many of each feature a W×H map gets (Middle-earth density)."""
+    scale = W * H / REFERENCE_TILES
+    counts = {k: max(1, int(round(v * scale))) for k, v in DENSITY.items()}
+    counts['realm'] = min(counts['realm'], max_names)
+    counts['province'] = min(counts['province'], max_names)
+    # Geo names come from ?Region labels, bare feature names and sea names
+    geo = counts['region'] + counts['feature'] + counts['sea']
+    if geo > max_names:
+        for k in ('region', 'feature', 'sea'):
+            counts[k] = max(1, counts[k] * max_names // geo)
+    return counts
+
+################################################################################
+# MAP
+################################################################################
+def generate_grid(W: int, H: int, seed: int = 0, max_names: int = 250) -> np.ndarray:
+    """H×W uint8 glyph grid of a synthetic worldmap."""
+    rng = np.random.default_rng(seed)
+    grid = generate_terrain(W, H, rng)
+    counts = label_counts(W, H, max_names)
+    add_rivers(grid, rng, counts['river'])
+    add_roads(grid, rng, counts['road'])
+    add_labels(grid, rng, counts)
+    return grid
+
+def write_grid(path: str, grid: np.ndarray) -> None:
+    H, W = grid.shape
+    out = np.empty((H, W + 1), dtype=np.uint8)
+    out[:, :W] = grid
+    out[:, W] = ord('\n')
+    with open(path, 'wb') as f:
+        f.write(out.tobytes())
+
+def generate_worldmap(path: str, W: int, H: int, seed: int = 0,
+                      max_names: int = 250) -> None:
+    write_grid(path, generate_grid(W, H, seed, max_names))
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """'WxH' → (W, H)."""
+    w, h = text.lower().split('x')
+    return int(w), int(h)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic worldmap.")
+    parser.add_argument('output_map')
+    parser.add_argument('--size', type=parse_size, default=(563, 177), metavar='WxH',
+                        help="map size (default: 563x177, like middle_earth.worldmap)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-names', type=int, default=250,
+                        help="cap on realms, provinces and geo feature names (default: 250)")
+    args = parser.parse_args()
+    W, H = args.size
+    generate_worldmap(args.output_map, W, H, args.seed, args.max_names)
+    print(f"Wrote {W}×{H} map to {args.output_map}")
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,10 @@ Geographic features are natural landmarks that get labels:
 Geographic labels are differentiated from POI labels (which use '!' prefix) 
 and river labels (which use '@' prefix).
 
+The input is the H×W character-code grid produced by worldmap_io.load_map.
+
 It returns:
-    clean_grid      – a **deep-copied** version of the input with every
+    clean_grid      – a copy of the input grid with every
                       geographic label removed / terrain restored
     geo_id_grid     – H×W numpy.int16 array holding a feature-id for every
                       cell (-1 for "no feature")
@@ -18,107 +20,107 @@ It returns:
     seed_cols       – list[int]  col of the label that named the feature
 """
 from __future__ import annotations
-import collections, math, numpy as np, heapq
+import collections, math, numpy as np
 from typing import List, Tuple, Dict, Any, Iterable
 
+from worldmap_io import decode_cells, char_mask, SPACE
+from annotations import Token, tokenize, is_feature_name, REGION
+from grid_ops import components_touching
+from shortest_paths import multi_source_owner
+from distance_transform import distance_transform
+
 ################################################################################
 # CONSTANTS & HELPERS
 ################################################################################
 DIRS = [(1,0),(-1,0),(0,1),(0,-1)]
 TERRAIN_FEATURE_CHARS = {'^', '~', '&', '%', '=', '"'}      # mountains, hills, forest, marsh, deep water, fields
 TRANSPARENT = {'.', '-', '|', '+'}                     # roads / rivers ignored for connectivity
-LABEL_CHARS   = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_'")
 RIVER_CHARS = {'-', '|'}  # River tiles that deep water should not flood into
 
-def _is_label_char(ch: str) -> bool:
-    return ch in LABEL_CHARS
-
 def _in_bounds(r:int,c:int,H:int,W:int)->bool:
     return 0 <= r < H and 0 <= c < W
 
 ################################################################################
 # LABEL DETECTION
 ################################################################################
-def _detect_labels(grid: List[List[str]]) -> List[Dict[str,Any]]:
-    """Scan grid for embedded or '?'-prefixed geographic labels."""
-    H, W = len(grid), len(grid[0]) if grid else 0
+def detect_labels(grid: np.ndarray, tokens: List[Token] | None = None,
+                  windowed: bool = False) -> List[Dict[str,Any]]:
+    """
+    Embedded or '?'-prefixed geographic labels among the annotation tokens
+    (tokenize(grid) unless given).  POI ('!') and river ('@') labels are
+    not geographic and are skipped.
+
+    With `windowed`, '?' labels search a window around themselves instead
+    of indexing the whole map (for memory-mapped grids larger than RAM).
+    """
+    if tokens is None:
+        tokens = tokenize(grid)
     labels = []
-    r = 0
-    while r < H:
-        c = 0
-        while c < W:
-            ch = grid[r][c]
-            # ---------- POI labels ("!Name") - skip entirely ----------
-            if ch == '!' and c+1 < W and _is_label_char(grid[r][c+1]):
-                c += 1
-                # Skip the entire POI label
-                while c < W and _is_label_char(grid[r][c]):
-                    c += 1
-                continue
-            # ---------- adjacent ("?Name") ----------
-            if ch == '?' and c+1 < W and _is_label_char(grid[r][c+1]):
-                start_c = c
-                c += 1
-                chars = []
-                while c < W and _is_label_char(grid[r][c]):
-                    chars.append(grid[r][c]); c += 1
-                label = ''.join(chars)
-                if label:
-                    terrain, comp_r, comp_c = _nearest_feature_terrain(grid, r, start_c)
-                    if terrain:
-                        labels.append({
-                            'text': label,
-                            'row': r, 'col': start_c,
-                            'terrain': terrain,
-                            'type': 'adjacent',
-                            'component_seed': (comp_r, comp_c)
-                        })
-                continue
-            # ---------- River labels (@Name) - skip entirely ----------
-            if ch == '@' and c+1 < W and _is_label_char(grid[r][c+1]):
-                c += 1
-                # Skip the entire river label
-                while c < W and _is_label_char(grid[r][c]):
-                    c += 1
-                continue
-            # ---------- embedded ("Mirkwood" in forest) ----------
-            if _is_label_char(ch):
-                start_c = c
-                chars = []
-                while c < W and _is_label_char(grid[r][c]):
-                    chars.append(grid[r][c]); c += 1
-                if len(chars) >= 3:                           # 3+ chars = label candidate
-                    label = ''.join(chars)
-                    terrain = _infer_embedded_terrain(grid, r, start_c, len(chars))
-                    if terrain in TERRAIN_FEATURE_CHARS:
-                        labels.append({
-                            'text': label,
-                            'row': r, 'col': start_c,
-                            'terrain': terrain,
-                            'type': 'embedded'
-                        })
-                continue
-            c += 1
-        r += 1
+    feature_dist = None                 # nearest-feature index, built on the first '?'
+    for tok in tokens:
+        # ---------- adjacent ("?Name") ----------
+        if tok.kind == REGION:
+            if windowed:
+                terrain, comp_r, comp_c = _windowed_nearest_feature(grid, tok.row, tok.col)
+            else:
+                if feature_dist is None:
+                    feature_dist = nearest_feature_index(grid)
+                terrain, comp_r, comp_c = _nearest_feature_terrain(
+                    grid, tok.row, tok.col, feature_dist=feature_dist)
+            if terrain:
+                labels.append({
+                    'text': tok.text,
+                    'row': tok.row, 'col': tok.col,
+                    'terrain': terrain,
+                    'type': 'adjacent',
+                    'component_seed': (comp_r, comp_c)
+                })
+        # ---------- embedded ("Mirkwood" in forest) ----------
+        elif is_feature_name(tok):
+            terrain = _infer_embedded_terrain(grid, tok.row, tok.col, len(tok.text))
+            if terrain in TERRAIN_FEATURE_CHARS:
+                labels.append({
+                    'text': tok.text,
+                    'row': tok.row, 'col': tok.col,
+                    'terrain': terrain,
+                    'type': 'embedded'
+                })
     return labels
 
-def _infer_embedded_terrain(grid: List[List[str]], r:int, c0:int, length:int) -> str|None:
+def _infer_embedded_terrain(grid: np.ndarray, r:int, c0:int, length:int) -> str|None:
     """Return the majority terrain surrounding an embedded label."""
-    H = len(grid)
-    counts = collections.Counter()
-    for dc in range(-1, length+1):
-        for dr in (-1,0,1):
-            nr, nc = r+dr, c0+dc
-            if 0 <= nr < H and 0 <= nc < len(grid[nr]):
-                ch = grid[nr][nc]
-                if ch in TERRAIN_FEATURE_CHARS:
-                    counts[ch] += 1
+    # Column-major walk of the 3-row window keeps Counter's tie order stable
+    window = grid[max(r-1, 0):r+2, max(c0-1, 0):c0+length+1]
+    counts = collections.Counter(ch for ch in decode_cells(window.T)
+                                 if ch in TERRAIN_FEATURE_CHARS)
     if not counts:      # label in open space – treat as invalid
         return None
     return counts.most_common(1)[0][0]
 
-def _nearest_feature_terrain(grid: List[List[str]], r:int, c:int,
-                             max_radius:int|None=None
+def nearest_feature_index(grid: np.ndarray) -> np.ndarray:
+    """
+    Chebyshev distance from every tile to the nearest TERRAIN_FEATURE_CHARS
+    tile (0 on feature tiles, inf everywhere if the map has none); built
+    once per map for _nearest_feature_terrain.
+    """
+    return distance_transform(char_mask(grid, TERRAIN_FEATURE_CHARS), 'chessboard')
+
+def _ring_features(feature_dist: np.ndarray, r: int, c: int, d: int) -> List[Tuple[int,int]]:
+    """Feature tiles exactly `d` Chebyshev steps from (r, c)."""
+    H, W = feature_dist.shape
+    r0, r1 = max(r-d, 0), min(r+d, H-1)
+    c0, c1 = max(c-d, 0), min(c+d, W-1)
+    found = []
+    for rr in {r-d, r+d} & {r0, r1}:                     # top / bottom edges
+        found += [(rr, c0+k) for k in np.flatnonzero(feature_dist[rr, c0:c1+1] == 0)]
+    for cc in {c-d, c+d} & {c0, c1}:                     # left / right edges, corners excluded
+        lo, hi = max(r-d+1, 0), min(r+d-1, H-1)
+        found += [(lo+k, cc) for k in np.flatnonzero(feature_dist[lo:hi+1, cc] == 0)]
+    return found
+
+def _nearest_feature_terrain(grid: np.ndarray, r:int, c:int,
+                             max_radius:int|None=None,
+                             feature_dist:np.ndarray|None=None
                              ) -> Tuple[str | None, int | None, int | None]:
     """
     For a '?Name' adjacent label find the NEAREST (fewest steps) terrain feature,
@@ -127,8 +129,25 @@ def _nearest_feature_terrain(grid: List[List[str]], r:int, c:int,
 
     The search expands in 8-connected space (so "nearest" uses Chebyshev
     distance rather than purely orthogonal Manhattan distance).
+
+    With `feature_dist` (nearest_feature_index(grid)) the distance d to the
+    nearest feature is known up front: a lone feature on that ring is the
+    answer; several tie and are resolved by the BFS below, stopped at d so
+    it discovers them in the same order as the unbounded search.
     """
-    H, W = len(grid), len(grid[0])
+    if feature_dist is not None and feature_dist[r, c] > 0:
+        if np.isinf(feature_dist[r, c]):
+            return None, None, None
+        d = int(feature_dist[r, c])
+        if max_radius is not None and d > max_radius + 1:
+            return None, None, None
+        ring = _ring_features(feature_dist, r, c, d)
+        if len(ring) == 1:
+            (fr, fc), = ring
+            return chr(grid[fr, fc]), int(fr), int(fc)
+        max_radius = d - 1
+
+    H, W = grid.shape
     # 8-direction offsets ----------------------------------------------------
     DIRS8 = [(-1,-1), (-1,0), (-1,1),
              ( 0,-1),          ( 0,1),
@@ -145,16 +164,43 @@ def _nearest_feature_terrain(grid: List[List[str]], r:int, c:int,
             if not _in_bounds(nr, nc, H, W) or (nr, nc) in seen:
                 continue
             seen.add((nr, nc))
-            ch = grid[nr][nc]
+            ch = chr(grid[nr, nc])
             if ch in TERRAIN_FEATURE_CHARS:
                 return ch, nr, nc
             q.append((nr, nc, dist + 1))
     return None, None, None
 
+def _windowed_nearest_feature(grid: np.ndarray, r: int, c: int, radius: int = 32
+                              ) -> Tuple[str | None, int | None, int | None]:
+    """
+    _nearest_feature_terrain() over a window of `radius` around (r, c),
+    doubled until the nearest feature found is no further than the window
+    edge (or the window is the whole map), so the answer is the same as the
+    whole-map search.
+    """
+    H, W = grid.shape
+    while True:
+        r0, r1 = max(r-radius, 0), min(r+radius+1, H)
+        c0, c1 = max(c-radius, 0), min(c+radius+1, W)
+        window = np.asarray(grid[r0:r1, c0:c1])
+        whole = (r0, r1, c0, c1) == (0, H, 0, W)
+        feature_dist = nearest_feature_index(window)
+        d = feature_dist[r-r0, c-c0]
+        # Everything within d+1 (the BFS ring) must lie inside the window
+        margin = min(r-r0 if r0 else H, r1-1-r if r1 < H else H,
+                     c-c0 if c0 else W, c1-1-c if c1 < W else W)
+        if whole or 0 < d and d + 1 <= margin:
+            terrain, fr, fc = _nearest_feature_terrain(window, r-r0, c-c0,
+                                                       feature_dist=feature_dist)
+            if terrain is None:
+                return None, None, None
+            return terrain, fr + r0, fc + c0
+        radius *= 2
+
 ################################################################################
 # GRID CLEAN-UP (LABEL REMOVAL, TERRAIN RESTORATION)
 ################################################################################
-def _restore_terrain(clean_grid: List[List[str]], labels: List[Dict[str,Any]]) -> None:
+def _restore_terrain(clean_grid: np.ndarray, labels: List[Dict[str,Any]]) -> None:
     """
     Mutate `clean_grid`:
       * embedded labels get overwritten by their inferred terrain
@@ -163,17 +209,23 @@ def _restore_terrain(clean_grid: List[List[str]], labels: List[Dict[str,Any]]) -
     for lbl in labels:
         r, c = lbl['row'], lbl['col']
         if lbl['type'] == 'embedded':
-            terrain = lbl['terrain']
-            for i in range(len(lbl['text'])):
-                clean_grid[r][c+i] = terrain
+            clean_grid[r, c:c+len(lbl['text'])] = ord(lbl['terrain'])
         else:                                           # adjacent '?Name'
-            for i in range(len(lbl['text'])+1):         # inc "?"
-                clean_grid[r][c+i] = ' '                # blank to open ground
+            clean_grid[r, c:c+len(lbl['text'])+1] = SPACE   # inc "?", blank to open ground
 
 ################################################################################
 # MULTI-SOURCE DIJKSTRA FOR GEOGRAPHIC FEATURES
 ################################################################################
-def _multi_source_dijkstra(grid: List[List[str]], seeds: List[Tuple[int,int,int]], 
+def _expandable(grid: np.ndarray, terrain_char: str) -> Tuple[np.ndarray, np.ndarray]:
+    """``(is_terrain, expandable)`` masks for flooding one terrain class."""
+    is_terrain = grid == ord(terrain_char)
+    expandable = is_terrain | char_mask(grid, TRANSPARENT)
+    # For deep water, don't expand into rivers
+    if terrain_char == '=':
+        expandable &= ~char_mask(grid, RIVER_CHARS)
+    return is_terrain, expandable
+
+def _multi_source_dijkstra(grid: np.ndarray, seeds: List[Tuple[int,int,int]], 
                           terrain_char: str) -> np.ndarray:
     """
     Run multi-source Dijkstra to assign each terrain tile to nearest labeled feature.
@@ -185,94 +237,57 @@ def _multi_source_dijkstra(grid: List[List[str]], seeds: List[Tuple[int,int,int]
         
     Returns:
         owner_grid: H×W array where each cell contains feature_id or -1
+
+    The flood only ever enters same-terrain tiles (cost 1) and transparent
+    tiles (cost 2), so it runs on the bucket-queue engine over the bounding
+    box of the expandable components next to the seeds.
     """
-    H, W = len(grid), len(grid[0]) if grid else 0
-    dist = np.full((H, W), np.inf)
+    H, W = grid.shape
     owner = np.full((H, W), -1, dtype=np.int16)
-    pq = []
-    
-    # Initialize seeds
+    if not seeds:
+        return owner
+    is_terrain, expandable = _expandable(grid, terrain_char)
+
+    # Components a seed can flood into: its own, or one next to it
+    near = np.zeros((H, W), dtype=bool)
+    for r, c, _ in seeds:
+        near[max(r-1, 0):r+2, c] = True
+        near[r, max(c-1, 0):c+2] = True
+    reach = components_touching(expandable, near)
+    for r, c, _ in seeds:
+        reach[r, c] = True
+    rows = np.flatnonzero(reach.any(axis=1))
+    cols = np.flatnonzero(reach.any(axis=0))
+    r0, r1, c0, c1 = rows[0], rows[-1]+1, cols[0], cols[-1]+1
+    window = (slice(r0, r1), slice(c0, c1))
+
+    # A tile holding several seeds floods with the first (lowest) feature id
+    # but keeps the last one itself, as the heap-based version always did:
+    # list seeds in reverse so the engine's last-wins placement keeps the first.
+    local = [((r-r0, c-c0), fid) for r, c, fid in reversed(seeds)]
+    cost = np.where(is_terrain[window], 1, 2)
+    sub_owner, _ = multi_source_owner(cost, local, restrict=expandable[window])
     for r, c, fid in seeds:
-        dist[r, c] = 0
-        owner[r, c] = fid
-        heapq.heappush(pq, (0, r, c, fid))
-    
-    # Special handling for deep water - don't cross rivers
-    def can_expand_to(from_r, from_c, to_r, to_c):
-        if not _in_bounds(to_r, to_c, H, W):
-            return False
-        to_ch = grid[to_r][to_c]
-        
-        # For deep water, don't expand into rivers
-        if terrain_char == '=' and to_ch in RIVER_CHARS:
-            return False
-            
-        # Otherwise, can expand to same terrain or transparent tiles
-        return to_ch == terrain_char or to_ch in TRANSPARENT
-    
-    # Dijkstra expansion
-    while pq:
-        d, r, c, fid = heapq.heappop(pq)
-        
-        # Skip if we've found a better path
-        if d > dist[r, c]:
-            continue
-            
-        # Try all 4 directions
-        for dr, dc in DIRS:
-            nr, nc = r + dr, c + dc
-            
-            if not can_expand_to(r, c, nr, nc):
-                continue
-                
-            # Cost is 1 for same terrain, higher for transparent tiles
-            cost = 1 if grid[nr][nc] == terrain_char else 2
-            new_dist = d + cost
-            
-            if new_dist < dist[nr, nc]:
-                dist[nr, nc] = new_dist
-                owner[nr, nc] = fid
-                heapq.heappush(pq, (new_dist, nr, nc, fid))
-    
+        sub_owner[r-r0, c-c0] = fid
+    owner[window] = sub_owner
+
     # Only return ownership for actual terrain tiles, not transparent ones
-    result = np.full((H, W), -1, dtype=np.int16)
-    for r in range(H):
-        for c in range(W):
-            if grid[r][c] == terrain_char and owner[r, c] >= 0:
-                result[r, c] = owner[r, c]
-    
-    return result
+    return np.where(is_terrain, owner, np.int16(-1))
+
+def _flood_class(args: Tuple[np.ndarray, List[Tuple[int,int,int]], str]) -> np.ndarray:
+    """Process-pool entry point for one terrain class."""
+    return _multi_source_dijkstra(*args)
 
 ################################################################################
 # MAIN PUBLIC DRIVER
 ################################################################################
-def build_geo_feature_grid(grid: List[List[str]]):
+def feature_seeds(labels: List[Dict[str,Any]]):
     """
-    Entrypoint used by map_preprocessing.py
-
-    Args
-    ----
-    grid : List[List[str]]
-        The grid *after* realm/sub-realm annotations have been stripped,
-        but *before* any terrain modifications for geo features.
-
-    Returns
-    -------
-    clean_grid     – grid with geographic labels removed / terrain restored
-    geo_id_grid    – numpy array int16, value -1 means 'no named feature'
-    feature_names  – list[str] length == max geo-id+1
-    seed_rows      – list[int] – one per feature, row where its label was found
-    seed_cols      – list[int] – one per feature, col where its label was found
+    Number the features class by class, in label order.  Returns
+    ``(feature_names, seed_rows, seed_cols, class_seeds)`` where
+    `class_seeds` lists ``(terrain_char, [(row, col, feature_id), ...])``
+    for every class that has labels.
     """
-    # 1. Detect labels on a fresh deep copy so original grid isn't mutated early
-    labels = _detect_labels(grid)
-    clean_grid = [row[:] for row in grid]               # deep copy by row
-    _restore_terrain(clean_grid, labels)
-
-    # 2. Organize labels by terrain type
-    H, W = len(clean_grid), len(clean_grid[0]) if clean_grid else 0
-    geo_id_grid = np.full((H,W), -1, dtype=np.int16)
-
     feature_names : List[str] = []
     seed_rows     : List[int] = []
     seed_cols     : List[int] = []
@@ -287,8 +302,9 @@ def build_geo_feature_grid(grid: List[List[str]]):
             terrain_to_labels[terrain] = []
         terrain_to_labels[terrain].append(lbl)
     
-    # 3. Process each terrain type with multi-source Dijkstra
+    # Assign feature ids (class by class, in label order) and seeds
     next_feature_id = 0
+    class_seeds : List[Tuple[str, List[Tuple[int,int,int]]]] = []
     
     for terrain_char in TERRAIN_FEATURE_CHARS:
         if terrain_char not in terrain_to_labels:
@@ -317,14 +333,106 @@ def build_geo_feature_grid(grid: List[List[str]]):
             
             seeds.append((seed_r, seed_c, fid))
         
-        # Run multi-source Dijkstra for this terrain type
         if seeds:
-            terrain_owner = _multi_source_dijkstra(clean_grid, seeds, terrain_char)
-            
-            # Merge into main geo_id_grid
-            for r in range(H):
-                for c in range(W):
-                    if terrain_owner[r, c] >= 0:
-                        geo_id_grid[r, c] = terrain_owner[r, c]
+            class_seeds.append((terrain_char, seeds))
+    return feature_names, seed_rows, seed_cols, class_seeds
+
+def build_geo_feature_grid(grid: np.ndarray,
+                           labels: List[Dict[str,Any]] | None = None,
+                           pool=None):
+    """
+    Entrypoint used by map_preprocessing.py
+
+    Args
+    ----
+    grid : np.ndarray
+        H×W character-code grid *after* realm/sub-realm annotations have been stripped,
+        but *before* any terrain modifications for geo features.
+    labels : list, optional
+        detect_labels(grid), if the caller already has it
+    pool : shortest_paths.FloodPool, optional
+        flood the terrain classes on its worker processes
 
-    return clean_grid, geo_id_grid, feature_names, seed_rows, seed_cols
\ No newline at end of file
+    Returns
+    -------
+    clean_grid     – grid with geographic labels removed / terrain restored
+    geo_id_grid    – numpy array int16, value -1 means 'no named feature'
+    feature_names  – list[str] length == max geo-id+1
+    seed_rows      – list[int] – one per feature, row where its label was found
+    seed_cols      – list[int] – one per feature, col where its label was found
+    """
+    # 1. Detect labels, then restore terrain on a copy so the input isn't mutated
+    if labels is None:
+        labels = detect_labels(grid)
+    clean_grid = grid.copy()
+    _restore_terrain(clean_grid, labels)
+
+    # 2-3. Feature ids and flood seeds per terrain class
+    H, W = clean_grid.shape
+    geo_id_grid = np.full((H,W), -1, dtype=np.int16)
+    feature_names, seed_rows, seed_cols, class_seeds = feature_seeds(labels)
+
+    # 4. Flood each class (classes never share a tile, so results merge by mask)
+    tasks = [(clean_grid, seeds, terrain_char) for terrain_char, seeds in class_seeds]
+    if pool is not None and len(tasks) > 1:
+        owners = pool.map(_flood_class, tasks)
+    else:
+        owners = [_flood_class(task) for task in tasks]
+    for terrain_owner in owners:
+        assigned = terrain_owner >= 0
+        geo_id_grid[assigned] = terrain_owner[assigned]
+
+    return clean_grid, geo_id_grid, feature_names, seed_rows, seed_cols
+
+def update_geo_feature_grid(old_clean: np.ndarray, new_clean: np.ndarray,
+                            geo_id_grid: np.ndarray, feature_terrain: List[str],
+                            seed_rows: List[int], seed_cols: List[int]) -> np.ndarray:
+    """
+    Repair a build_geo_feature_grid() result after terrain edits, assuming
+    the labels (and so the feature table) are unchanged.
+
+    A class's flood never leaves the connected component of expandable cells
+    it starts in, so only the components (before or after the edit) that
+    contain an edited tile are re-flooded, each cropped to its bounding box
+    with just the seeds that can reach it.  Edits to roads/rivers touch
+    every class; any other edit only the classes it changes to or from.
+    """
+    changed = old_clean != new_clean
+    geo_id_grid = geo_id_grid.copy()
+    if not changed.any():
+        return geo_id_grid
+    geo_id_grid[changed] = -1
+    touched = set(decode_cells(np.unique(old_clean[changed]))) | \
+              set(decode_cells(np.unique(new_clean[changed])))
+    classes = set(feature_terrain)
+    if not touched & TRANSPARENT:
+        classes &= touched
+
+    H, W = new_clean.shape
+    for terrain_char in sorted(classes):
+        is_terrain, expandable = _expandable(new_clean, terrain_char)
+        region = components_touching(expandable, changed) | \
+                 components_touching(_expandable(old_clean, terrain_char)[1], changed)
+        rows = np.flatnonzero(region.any(axis=1))
+        if not rows.size:
+            continue
+        cols = np.flatnonzero(region.any(axis=0))
+        r0, r1 = max(rows[0]-1, 0), min(rows[-1]+2, H)
+        c0, c1 = max(cols[0]-1, 0), min(cols[-1]+2, W)
+        window = (slice(r0, r1), slice(c0, c1))
+
+        # Seeds on or next to the region (the seed cell itself need not be expandable)
+        near = region[window].copy()
+        near[1:] |= region[window][:-1]; near[:-1] |= region[window][1:]
+        near[:, 1:] |= region[window][:, :-1]; near[:, :-1] |= region[window][:, 1:]
+        seeds = [(r-r0, c-c0, fid)
+                 for fid, (r, c) in enumerate(zip(seed_rows, seed_cols))
+                 if feature_terrain[fid] == terrain_char
+                 and r0 <= r < r1 and c0 <= c < c1 and near[r-r0, c-c0]]
+        if seeds:
+            owner = _multi_source_dijkstra(new_clean[window], seeds, terrain_char)
+        else:
+            owner = np.full((r1-r0, c1-c0), -1, dtype=np.int16)
+        write = region[window] & is_terrain[window]
+        geo_id_grid[window][write] = owner[write]
+    return geo_id_grid
@@ -0,0 +1,136 @@
+"""
+Vectorised grid primitives shared by the preprocessing stages.
+
+Everything here works on whole NumPy arrays; there are no per-cell Python
+loops, so cost scales with array operations rather than interpreter steps.
+"""
+from __future__ import annotations
+import numpy as np
+from typing import Tuple
+
+################################################################################
+# CONNECTED COMPONENTS (4-connected)
+################################################################################
+def label_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Label the 4-connected components of a boolean H×W mask.
+
+    Cells are first grouped into horizontal runs; runs touching vertically
+    are then merged with a union-find built from array hooks + pointer
+    jumping.  Returns ``(labels, n)`` where ``labels`` is int64 with -1
+    outside the mask and component ids ``0..n-1`` numbered in row-major
+    order of each component's first cell.
+    """
+    H, W = mask.shape
+    labels = np.full((H, W), -1, dtype=np.int64)
+    if not mask.any():
+        return labels, 0
+
+    # 1. Horizontal runs --------------------------------------------------
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    run_id = np.cumsum(starts.ravel()).reshape(H, W) - 1
+    n_runs = int(run_id[-1, -1]) + 1
+
+    # 2. Vertical run adjacencies ----------------------------------------
+    touch = mask[:-1] & mask[1:]
+    a = run_id[:-1][touch]
+    b = run_id[1:][touch]
+    if a.size:
+        pairs = np.unique(a * n_runs + b)
+        a, b = pairs // n_runs, pairs % n_runs
+
+    # 3. Union-find: hook larger root under smaller, then compress --------
+    parent = np.arange(n_runs, dtype=np.int64)
+    while a.size:
+        ra, rb = parent[a], parent[b]
+        lo, hi = np.minimum(ra, rb), np.maximum(ra, rb)
+        open_ = lo != hi
+        if not open_.any():
+            break
+        np.minimum.at(parent, hi[open_], lo[open_])
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+    # Roots are the smallest run id of each component → row-major numbering
+    roots, comp = np.unique(parent, return_inverse=True)
+    labels[mask] = comp[run_id[mask]]
+    return labels, len(roots)
+
+def components_touching(mask: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+    """Union of the 4-connected components of `mask` that contain a `seeds` cell."""
+    labels, n = label_components(mask)
+    hit = np.zeros(n + 1, dtype=bool)               # slot n absorbs label -1
+    hit[labels[seeds & mask]] = True
+    hit[n] = False
+    return hit[labels]
+
+def tiled_components_touching(mask, seeds, out: np.ndarray, tile: int = 256) -> np.ndarray:
+    """
+    :func:`components_touching` for grids too large for memory: `mask` and
+    `seeds` may be memory-mapped (or anything that slices like an array) and
+    the result is written into `out`, one tile plus a one-cell halo at a
+    time.  A tile's components are grown from its own seeds and the halo
+    cells already reached; tiles whose edge gains cells put the neighbour on
+    that side back on the work list until nothing changes.
+    """
+    H, W = mask.shape
+    tiles_y, tiles_x = -(-H // tile), -(-W // tile)
+    work = set()
+    for r0 in range(0, H, tile):
+        out[r0:r0+tile] = False
+        band = np.asarray(seeds[r0:r0+tile])
+        work.update((r0 // tile) * tiles_x + tx for tx in range(tiles_x)
+                    if band[:, tx*tile:(tx+1)*tile].any())
+    while work:
+        t = work.pop()
+        ty, tx = divmod(t, tiles_x)
+        r0, c0 = ty * tile, tx * tile
+        r1, c1 = min(r0 + tile, H), min(c0 + tile, W)
+        R0, C0 = max(r0 - 1, 0), max(c0 - 1, 0)
+        R1, C1 = min(r1 + 1, H), min(c1 + 1, W)
+        inner = (slice(r0 - R0, r1 - R0), slice(c0 - C0, c1 - C0))
+
+        # Halo cells take part only once a neighbour has reached them
+        reached = np.array(out[R0:R1, C0:C1])
+        local_mask = reached.copy()
+        local_mask[inner] = np.asarray(mask[r0:r1, c0:c1])
+        local_seeds = reached.copy()
+        local_seeds[inner] |= np.asarray(seeds[r0:r1, c0:c1])
+        grown = components_touching(local_mask, local_seeds)[inner]
+        grown |= reached[inner]
+        gained = grown & ~reached[inner]
+        if not gained.any():
+            continue
+        out[r0:r1, c0:c1] = grown
+        for edge, ny, nx in ((gained[0], ty - 1, tx), (gained[-1], ty + 1, tx),
+                             (gained[:, 0], ty, tx - 1), (gained[:, -1], ty, tx + 1)):
+            if 0 <= ny < tiles_y and 0 <= nx < tiles_x and edge.any():
+                work.add(ny * tiles_x + nx)
+    return out
+
+################################################################################
+# BOUNDING BOXES
+################################################################################
+def label_bounding_boxes(labels: np.ndarray, n: int) -> np.ndarray:
+    """
+    Bounding box of every label ``0..n-1`` in an H×W int array (-1 = none).
+
+    Returns an ``n×4`` int64 array of ``(r0, r1, c0, c1)`` half-open bounds;
+    labels that never occur get the empty box ``(H, 0, W, 0)``.
+    """
+    H, W = labels.shape
+    flat = labels.ravel()
+    where = np.flatnonzero((flat >= 0) & (flat < n))
+    ids = flat[where]
+    rows, cols = where // W, where % W
+    boxes = np.empty((n, 4), dtype=np.int64)
+    boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3] = H, 0, W, 0
+    np.minimum.at(boxes[:, 0], ids, rows)
+    np.maximum.at(boxes[:, 1], ids, rows + 1)
+    np.minimum.at(boxes[:, 2], ids, cols)
+    np.maximum.at(boxes[:, 3], ids, cols + 1)
+    return boxes
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+HPA* abstraction graph (HPAG, see artifact_io.py) over the region stage's
+terrain cost grid, so long routes can be planned at runtime without
+searching the whole map.
+
+The grid is cut into cluster×cluster blocks.  Along every border between
+two neighbouring clusters the crossing cost (the cells on both sides) is
+split into runs of equal cost, and every run cheaper than the runs beside
+it is an entrance: one transition at the middle of a short run, one at
+each end of a run of ENTRANCE_SPLIT cells or more (Botea et al.'s rule,
+with "walkable" replaced by "locally cheapest" since every tile can be
+crossed at some cost).  Both cells of a transition are graph nodes joined
+by an inter-cluster edge; the nodes of one cluster are joined pairwise by
+intra-cluster edges costing the cheapest path that stays inside the
+cluster (bucket-queue engine, shortest_paths.py).  As in the floods, a
+path costs the terrain cost of every cell it enters.
+
+hpa_path() is the reference query: start and goal are linked to the
+nodes of their clusters by a local search, then the abstract graph is
+searched with A*.  The cost it returns is that of a real path, so it is
+never below the true cheapest cost; grid_astar() is plain 4-connected A*
+over the cost grid, and ``--benchmark N`` compares the two on N random
+pairs.
+
+Usage: python hpa_preprocessing.py <input_map> <output_hpa> [--cluster N]
+                                   [--benchmark PAIRS] [--seed N]
+                                   [--profile REPORT.json]
+"""
+from __future__ import annotations
+import argparse, heapq, time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from worldmap_io import load_map
+from artifact_io import HpaGraph, write_hpa
+from shortest_paths import multi_source_owner, integer_costs, INF
+from profiling import stage, enable as enable_profiling
+from map_preprocessing import region_layers
+
+HPA_CLUSTER = 16
+ENTRANCE_SPLIT = 6                      # runs this long get a transition at each end
+
+Cell = Tuple[int, int]
+
+def cluster_counts(H: int, W: int, cluster: int) -> Tuple[int, int]:
+    """Clusters per column and per row: ``(ny, nx)``."""
+    return -(-H // cluster), -(-W // cluster)
+
+def _entrance_offsets(crossing: np.ndarray) -> List[int]:
+    """Offsets along one border where transitions are placed."""
+    starts = np.flatnonzero(np.r_[True, crossing[1:] != crossing[:-1]])
+    ends = np.r_[starts[1:], len(crossing)]
+    values = crossing[starts]
+    offsets = []
+    for k, (a, b) in enumerate(zip(starts.tolist(), ends.tolist())):
+        if (k > 0 and values[k - 1] < values[k]) or \
+           (k + 1 < len(starts) and values[k + 1] < values[k]):
+            continue
+        offsets.extend((a, b - 1) if b - a >= ENTRANCE_SPLIT else ((a + b - 1) // 2,))
+    return offsets
+
+def transitions(cost: np.ndarray, cluster: int) -> List[Tuple[Cell, Cell]]:
+    """``((r, c), (r', c'))`` cell pairs straddling cluster borders."""
+    H, W = cost.shape
+    pairs = []
+    for c in range(cluster, W, cluster):                    # vertical borders
+        for r0 in range(0, H, cluster):
+            r1 = min(r0 + cluster, H)
+            crossing = cost[r0:r1, c - 1] + cost[r0:r1, c]
+            pairs.extend(((r0 + o, c - 1), (r0 + o, c)) for o in _entrance_offsets(crossing))
+    for r in range(cluster, H, cluster):                    # horizontal borders
+        for c0 in range(0, W, cluster):
+            c1 = min(c0 + cluster, W)
+            crossing = cost[r - 1, c0:c1] + cost[r, c0:c1]
+            pairs.extend(((r - 1, c0 + o), (r, c0 + o)) for o in _entrance_offsets(crossing))
+    return pairs
+
+def _cluster_dist(cost: np.ndarray, cluster: int, r: int, c: int
+                  ) -> Tuple[np.ndarray, int, int]:
+    """Costs from (r, c) to every cell of its cluster, and the cluster's origin."""
+    r0, c0 = r - r % cluster, c - c % cluster
+    _, dist = multi_source_owner(cost[r0:r0 + cluster, c0:c0 + cluster], {(r - r0, c - c0): 0})
+    return dist, r0, c0
+
+def build_abstraction(cost: np.ndarray, cluster: int = HPA_CLUSTER) -> HpaGraph:
+    """Cluster, place entrances and cost every edge of the abstraction graph."""
+    cost = integer_costs(cost)
+    H, W = cost.shape
+    ny, nx = cluster_counts(H, W, cluster)
+    pairs = transitions(cost, cluster)
+
+    def cluster_of(cell: Cell) -> int:
+        return (cell[0] // cluster) * nx + cell[1] // cluster
+
+    cells = sorted({cell for pair in pairs for cell in pair}, key=lambda rc: (cluster_of(rc), rc))
+    index = {cell: i for i, cell in enumerate(cells)}
+    cluster_nodes = np.searchsorted([cluster_of(cell) for cell in cells],
+                                    np.arange(ny * nx + 1), side='left')
+    edges: List[Dict[int, int]] = [{} for _ in cells]
+    for a, b in pairs:
+        edges[index[a]][index[b]] = int(cost[b])
+        edges[index[b]][index[a]] = int(cost[a])
+    for k in range(ny * nx):
+        lo, hi = int(cluster_nodes[k]), int(cluster_nodes[k + 1])
+        for u in range(lo, hi):
+            dist, r0, c0 = _cluster_dist(cost, cluster, *cells[u])
+            for v in range(lo, hi):
+                d = int(dist[cells[v][0] - r0, cells[v][1] - c0])
+                if v != u and d < INF:
+                    edges[u][v] = d
+
+    counts = np.array([len(e) for e in edges], dtype=np.int64)
+    edge_offsets = np.r_[0, np.cumsum(counts)]
+    flat = [item for e in edges for item in sorted(e.items())]
+    targets = np.array([t for t, _ in flat], dtype=np.uint32)
+    costs = np.array([d for _, d in flat], dtype=np.uint32)
+    rows = np.array([r for r, _ in cells], dtype=np.uint16)
+    cols = np.array([c for _, c in cells], dtype=np.uint16)
+    return HpaGraph(W, H, cluster, cluster_nodes.astype(np.uint32), rows, cols,
+                    edge_offsets.astype(np.uint32), targets, costs)
+
+################################################################################
+# QUERIES
+################################################################################
+def hpa_path(graph: HpaGraph, cost: np.ndarray, start: Cell, goal: Cell
+             ) -> Tuple[Optional[int], List[Cell]]:
+    """
+    ``(cost, waypoints)`` of the route from `start` to `goal` ((row, col))
+    through `graph`: start, the entrance cells it crosses, goal.
+    ``(None, [])`` when there is no route.
+    """
+    cost = integer_costs(cost)
+    K = graph.cluster
+    _, nx = cluster_counts(graph.height, graph.width, K)
+    rows, cols = graph.rows.tolist(), graph.cols.tolist()
+    offsets, targets, costs = graph.edge_offsets, graph.targets, graph.costs
+    floor = int(cost.min())
+    goal_node = len(rows)                   # virtual node standing for `goal`
+
+    def h(u: int) -> int:
+        return floor * (abs(rows[u] - goal[0]) + abs(cols[u] - goal[1]))
+
+    def cluster_nodes(cell: Cell) -> range:
+        k = (cell[0] // K) * nx + cell[1] // K
+        return range(int(graph.cluster_nodes[k]), int(graph.cluster_nodes[k + 1]))
+
+    # Paths grown from the goal, reversed: entering costs shift by one cell
+    from_goal, gr0, gc0 = _cluster_dist(cost, K, *goal)
+    def into_goal(d: int, cell: Cell) -> int:
+        return d - int(cost[cell]) + int(cost[goal])
+
+    best: Dict[int, int] = {}
+    parent: Dict[int, int] = {}
+    heap = []
+    d = int(from_goal[start[0] - gr0, start[1] - gc0]) \
+        if (start[0] // K, start[1] // K) == (goal[0] // K, goal[1] // K) else INF
+    if d < INF:                             # same cluster: the local path is a candidate
+        best[goal_node] = into_goal(d, start)
+        parent[goal_node] = -1
+        heap.append((best[goal_node], goal_node))
+    to_start, sr0, sc0 = _cluster_dist(cost, K, *start)
+    for u in cluster_nodes(start):
+        d = int(to_start[rows[u] - sr0, cols[u] - sc0])
+        if d < INF and d < best.get(u, INF):
+            best[u], parent[u] = d, -1
+            heapq.heappush(heap, (d + h(u), u))
+    goal_links = {u: into_goal(int(from_goal[rows[u] - gr0, cols[u] - gc0]), (rows[u], cols[u]))
+                  for u in cluster_nodes(goal)
+                  if from_goal[rows[u] - gr0, cols[u] - gc0] < INF}
+    heapq.heapify(heap)
+
+    while heap:
+        f, u = heapq.heappop(heap)
+        if u == goal_node:
+            waypoints = [goal]
+            u = parent[u]
+            while u >= 0:
+                waypoints.append((rows[u], cols[u]))
+                u = parent[u]
+            waypoints.append(start)
+            return best[goal_node], waypoints[::-1]
+        g = best[u]
+        if f > g + h(u):
+            continue                        # stale entry
+        links = [(int(v), int(c)) for v, c in zip(targets[offsets[u]:offsets[u + 1]],
+                                                   costs[offsets[u]:offsets[u + 1]])]
+        if u in goal_links:
+            links.append((goal_node, goal_links[u]))
+        for v, c in links:
+            nd = g + c
+            if nd < best.get(v, INF):
+                best[v], parent[v] = nd, u
+                heapq.heappush(heap, (nd + (h(v) if v != goal_node else 0), v))
+    return None, []
+
+def grid_astar(cost: np.ndarray, start: Cell, goal: Cell) -> Optional[int]:
+    """Cheapest cost from `start` to `goal` by 4-connected A* over `cost`."""
+    cost = integer_costs(cost)
+    H, W = cost.shape
+    floor = int(cost.min())
+    flat = cost.ravel().tolist()
+    gr, gc = goal
+    src, dst = start[0] * W + start[1], gr * W + gc
+    best = {src: 0}
+    heap = [(floor * (abs(start[0] - gr) + abs(start[1] - gc)), src)]
+    while heap:
+        f, u = heapq.heappop(heap)
+        if u == dst:
+            return best[u]
+        g = best[u]
+        r, c = divmod(u, W)
+        if f > g + floor * (abs(r - gr) + abs(c - gc)):
+            continue
+        for v, ok in ((u - W, r > 0), (u - 1, c > 0), (u + 1, c < W - 1), (u + W, r < H - 1)):
+            if ok:
+                nd = g + flat[v]
+                if nd < best.get(v, INF):
+                    best[v] = nd
+                    vr, vc = divmod(v, W)
+                    heapq.heappush(heap, (nd + floor * (abs(vr - gr) + abs(vc - gc)), v))
+    return None
+
+def benchmark_queries(graph: HpaGraph, cost: np.ndarray, pairs: int, seed: int = 0) -> dict:
+    """Time hpa_path() against grid_astar() on `pairs` random start/goal pairs."""
+    cost = integer_costs(cost)
+    H, W = cost.shape
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, [H, W], size=(pairs, 2, 2)).tolist()
+    astar_s = hpa_s = 0.0
+    excess = []
+    for start, goal in picks:
+        t0 = time.perf_counter()
+        exact = grid_astar(cost, tuple(start), tuple(goal))
+        t1 = time.perf_counter()
+        approx, _ = hpa_path(graph, cost, tuple(start), tuple(goal))
+        t2 = time.perf_counter()
+        astar_s += t1 - t0
+        hpa_s += t2 - t1
+        if exact:
+            excess.append(approx / exact - 1)
+    return {'pairs': pairs, 'astar_s': astar_s, 'hpa_s': hpa_s,
+            'speedup': astar_s / hpa_s if hpa_s else float('inf'),
+            'mean_excess': float(np.mean(excess)) if excess else 0.0,
+            'max_excess': float(np.max(excess)) if excess else 0.0}
+
+################################################################################
+# BUILD
+################################################################################
+def write_hpa_file(path, layers: dict, cluster: int = HPA_CLUSTER) -> HpaGraph:
+    """Write the HPAG graph for a region_layers() result and return it."""
+    graph = build_abstraction(layers['cost'], cluster)
+    write_hpa(path, *graph)
+    return graph
+
+def build_hpa_file(input_map, output_file, cluster=HPA_CLUSTER, benchmark=0, seed=0):
+    """Load `input_map`, build the region layers and write the HPAG file."""
+    with stage("1 load"):
+        grid, H, W = load_map(input_map)
+    layers = region_layers(grid, H, W)
+    with stage("hpa_graph"):
+        graph = write_hpa_file(output_file, layers, cluster)
+    print(f"HPA* graph    : {output_file} ({len(graph.rows)} nodes, "
+          f"{len(graph.targets)} edges, {cluster}×{cluster} clusters)")
+    if benchmark:
+        r = benchmark_queries(graph, layers['cost'], benchmark, seed)
+        print(f"Grid A*       : {r['astar_s'] * 1000 / r['pairs']:.2f} ms/query")
+        print(f"HPA*          : {r['hpa_s'] * 1000 / r['pairs']:.2f} ms/query "
+              f"({r['speedup']:.1f}× faster)")
+        print(f"Path cost     : +{r['mean_excess']:.2%} mean, +{r['max_excess']:.2%} max "
+              f"over optimal ({r['pairs']} pairs)")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the HPA* abstraction graph over the terrain cost grid.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_hpa')
+    parser.add_argument('--cluster', type=int, default=HPA_CLUSTER, metavar='N',
+                        help=f"cluster side in cells (default: {HPA_CLUSTER})")
+    parser.add_argument('--benchmark', type=int, default=0, metavar='PAIRS',
+                        help="also time queries against grid A* on PAIRS random pairs")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed for the benchmark pairs (default: 0)")
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings (see profiling.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile)
+    build_hpa_file(args.input_map, args.output_hpa, cluster=args.cluster,
+                   benchmark=args.benchmark, seed=args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Incremental rebuild of the region grid, POI CSV and mountain depth file
+(and optionally the POI table and tile grid) after local edits to the
+worldmap.
+
+A full build (preprocess.py) keeps nothing but its outputs.  This script also saves the intermediate layers
+(raw and cleaned grid, cost grid, both realm floods with their distances,
+the geo-feature table, the mountain distance transform) to a state file
+next to the outputs.  On the next run it diffs the new map against that
+state and
+
+    * falls back to a full rebuild when anything non-local changed: a realm
+      or sub-realm annotation, a geo label (or the terrain it resolves to),
+      the map size, or a large share of the tiles;
+    * otherwise repairs the realm floods only where the edited costs can
+      propagate (shortest_paths.repair_owner), re-runs the sub-realm pass of
+      the realms whose area, costs or seeds changed, re-floods the geo
+      components that contain an edited tile, and patches the mountain
+      distance transform in a window around the edit;
+    * rewrites only the REG2 / MDEP / TILE rows that changed (and the POI
+      CSV and table if the POI list did).
+
+The patched outputs are byte-identical to a full rebuild.  When they are
+the maps/ files check_and_preprocess.py builds, the CLI also records them
+as up to date in its build manifest, so the next check-map doesn't redo
+the work.
+
+Usage: python incremental_preprocessing.py <input_map> <output_grid> <output_poi>
+                                           <output_mountains> [--poi-table PATH]
+                                           [--tiles PATH] [--state PATH] [--full]
+"""
+import argparse, io, csv, json, os
+import numpy as np
+from pathlib import Path
+
+from worldmap_io import load_map
+from annotations import tokenize
+from artifact_io import patch_reg2_rows, patch_mdep_rows, patch_tile_rows, terrain_indices
+from shortest_paths import repair_owner
+from distance_transform import distance_transform, patch_distance_transform
+from preprocess import build_artifacts, tile_flags
+from build_graph import mark_built
+from check_and_preprocess import map_stages, EXTRAS
+from map_preprocessing import (build_water_mask, parse_annotations,
+                               build_cost_grid, merge_realms, assign_sub_realms,
+                               poi_rows, write_poi_bin)
+from geo_features_preprocessing import (detect_labels, update_geo_feature_grid,
+                                        _restore_terrain)
+from mountain_depth_preprocessing import restore_terrain_under_labels
+
+STATE_VERSION = 1
+FULL_REBUILD_FRACTION = 0.25        # edits touching more of the map than this rebuild fully
+
+def default_state_path(output_grid_path):
+    return Path(output_grid_path).with_suffix('.state.npz')
+
+def state_file(path):
+    """`path` as np.savez writes it: with '.npz' appended unless already there."""
+    path = Path(path)
+    return path if path.suffix == '.npz' else path.with_name(path.name + '.npz')
+
+################################################################################
+# STATE
+################################################################################
+def annotation_signature(realm_seeds, sub_seeds, realm_names, sub_names, geo_labels):
+    """Everything non-local the layers depend on, as a canonical string."""
+    return json.dumps({
+        'realms': [[r, c, rid] for (r, c), rid in realm_seeds.items()],
+        'subs': [[r, c, sid] for (r, c), sid in sub_seeds.items()],
+        'realm_names': realm_names,
+        'sub_names': sub_names,
+        'geo': [[l['text'], l['row'], l['col'], l['terrain'], l['type'],
+                 list(l.get('component_seed', ()))] for l in geo_labels],
+    })
+
+def mountain_depth(dist, mountain):
+    return np.where(mountain & np.isfinite(dist), dist, 0)
+
+def save_state(path, grid, layers, mountain, mountain_dist):
+    L = layers
+    clean = L['clean_grid']
+    np.savez(state_file(path),
+             version=STATE_VERSION,
+             signature=annotation_signature(L['realm_seeds'], L['sub_seeds'],
+                                            L['realm_names'], L['sub_names'],
+                                            L['geo_labels']),
+             geo_names=json.dumps(L['geo_names']),
+             grid=grid, clean_grid=clean, cost=L['cost'],
+             owner_all=L['owner_all'], dist_all=L['dist_all'],
+             owner_realm=L['owner_realm'], dist_realm=L['dist_realm'],
+             final_realm=L['final_realm'], final_sub=L['final_sub'],
+             geo_id_grid=L['geo_id_grid'],
+             geo_seed_rows=np.array(L['geo_seed_rows'], dtype=np.int64),
+             geo_seed_cols=np.array(L['geo_seed_cols'], dtype=np.int64),
+             geo_terrain=np.array([clean[r, c] for r, c in
+                                   zip(L['geo_seed_rows'], L['geo_seed_cols'])],
+                                  dtype=clean.dtype),
+             mountain=mountain, mountain_dist=mountain_dist)
+
+def load_state(path):
+    """The saved state as a dict, or None if missing / from another version."""
+    try:
+        with np.load(state_file(path)) as f:
+            state = {k: f[k] for k in f.files}
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    if int(state.get('version', -1)) != STATE_VERSION:
+        return None
+    return state
+
+################################################################################
+# BUILDS
+################################################################################
+def full_build(map_path, output_grid_path, output_poi_path, output_mountain_path,
+               state_path, output_poib_path=None, output_tiles_path=None):
+    layers = build_artifacts(map_path, output_grid_path, output_poi_path,
+                             output_mountain_path, output_tiles_path,
+                             poib_path=output_poib_path)
+    mountain = layers['restored'] == ord('^')
+    save_state(state_path, layers['grid'], layers, mountain, distance_transform(~mountain))
+
+def _poi_text(layers):
+    buf = io.StringIO(newline='')
+    csv.writer(buf).writerows(poi_rows(
+        layers['realm_seeds'], layers['sub_seeds'], layers['sub_parent'],
+        layers['realm_names'], layers['sub_names'], layers['geo_names'],
+        layers['geo_seed_rows'], layers['geo_seed_cols']))
+    return buf.getvalue()
+
+def _write_if_changed(path, text):
+    try:
+        with open(path, newline='') as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, 'w', newline='') as f:
+        f.write(text)
+    return True
+
+def _changed_rows(*pairs):
+    rows = np.zeros(len(pairs[0][0]), dtype=bool)
+    for old, new in pairs:
+        rows |= (old != new).any(axis=1)
+    return np.flatnonzero(rows)
+
+def _restored_mountains(grid, mountain, changed_rows):
+    """
+    Re-run label restoration on the rows that changed (±1: a label's
+    terrain is inferred from the rows above and below it) and return the
+    updated mountain mask.
+    """
+    H, W = grid.shape
+    mountain = mountain.copy()
+    band_rows = np.unique(np.clip(np.concatenate(
+        [changed_rows - 1, changed_rows, changed_rows + 1]), 0, H - 1))
+    # Split into runs of consecutive rows and restore each with one row of context
+    breaks = np.flatnonzero(np.diff(band_rows) > 1) + 1
+    for run in np.split(band_rows, breaks):
+        r0, r1 = int(run[0]), int(run[-1]) + 1
+        c0, c1 = max(r0 - 1, 0), min(r1 + 1, H)
+        restored = restore_terrain_under_labels(grid[c0:c1], c1 - c0, W)
+        mountain[r0:r1] = restored[r0 - c0:r1 - c0] == ord('^')
+    return mountain
+
+def update_outputs(map_path, output_grid_path, output_poi_path, output_mountain_path,
+                   state_path=None, force_full=False, output_poib_path=None,
+                   output_tiles_path=None):
+    """
+    Bring the outputs (the POI table and tile grid only if given) up to date
+    with `map_path`; returns a short description of what was done.
+    """
+    state_path = state_path or default_state_path(output_grid_path)
+    outputs = (output_grid_path, output_poi_path, output_mountain_path)
+
+    def rebuild(reason):
+        full_build(map_path, *outputs, state_path, output_poib_path, output_tiles_path)
+        return f"full rebuild ({reason})"
+
+    state = None if force_full else load_state(state_path)
+    if state is None:
+        return rebuild("no previous state" if not force_full else "forced")
+    if not all(os.path.exists(p) for p in (*outputs, output_poib_path, output_tiles_path)
+               if p):
+        return rebuild("missing output")
+
+    grid, H, W = load_map(map_path)
+    old_grid = state['grid']
+    if old_grid.shape != grid.shape:
+        return rebuild("map size changed")
+    edited = old_grid != grid
+    if not edited.any():
+        return "up to date"
+    if np.count_nonzero(edited) > FULL_REBUILD_FRACTION * edited.size:
+        return rebuild("large edit")
+
+    # ---- annotations: any change here is non-local ------------------------
+    work = grid.copy()
+    tokens = tokenize(work)
+    water_mask = build_water_mask(work)
+    _, _, realm_seeds, sub_seeds, realm_names, sub_names = \
+        parse_annotations(work, H, W, tokens)
+    geo_labels = detect_labels(work, tokens)
+    signature = annotation_signature(realm_seeds, sub_seeds, realm_names, sub_names,
+                                     geo_labels)
+    if signature != str(state['signature']):
+        return rebuild("annotations changed")
+    clean_grid = work.copy()
+    _restore_terrain(clean_grid, geo_labels)
+    cost = build_cost_grid(clean_grid, water_mask, H, W)
+    if clean_grid.dtype != state['clean_grid'].dtype:
+        return rebuild("character set changed")
+
+    # ---- realm floods: repair where the cost edit propagates ----------------
+    num_realms = len(realm_names)
+    owner_all, dist_all = repair_owner(state['cost'], cost,
+                                       state['owner_all'], state['dist_all'])
+    owner_realm, dist_realm = repair_owner(state['cost'], cost,
+                                           state['owner_realm'], state['dist_realm'])
+    sub_parent = {sid: owner_realm[r,c] for (r,c),sid in sub_seeds.items()}
+    old_parent = {sid: state['owner_realm'][r,c] for (r,c),sid in sub_seeds.items()}
+    final_realm = merge_realms(owner_all, owner_realm, sub_parent, num_realms)
+
+    # ---- sub-realms: redo realms whose area, costs or seeds changed ---------
+    old_realm = state['final_realm']
+    moved = old_realm != final_realm
+    recost = state['cost'] != cost
+    redo = set(np.unique(old_realm[moved | recost]).tolist()) | \
+           set(np.unique(final_realm[moved | recost]).tolist())
+    for sid in sub_parent:
+        if sub_parent[sid] != old_parent[sid]:
+            redo |= {int(sub_parent[sid]), int(old_parent[sid])}
+    redo.discard(-1)
+    final_sub = state['final_sub'].copy()
+    final_sub[np.isin(old_realm, list(redo)) | np.isin(final_realm, list(redo))] = -1
+    assign_sub_realms(final_realm, sub_seeds, sub_parent, cost, num_realms,
+                      final_sub, realms=sorted(redo))
+
+    # ---- geo features: re-flood the edited components ----------------------
+    geo_seed_rows = state['geo_seed_rows'].tolist()
+    geo_seed_cols = state['geo_seed_cols'].tolist()
+    feature_terrain = [chr(t) for t in state['geo_terrain'].tolist()]
+    geo_id_grid = update_geo_feature_grid(state['clean_grid'], clean_grid,
+                                          state['geo_id_grid'], feature_terrain,
+                                          geo_seed_rows, geo_seed_cols)
+
+    # ---- mountains: restore edited rows, patch the distance transform ------
+    mountain = _restored_mountains(grid, state['mountain'],
+                                   np.flatnonzero(edited.any(axis=1)))
+    mountain_dist = patch_distance_transform(state['mountain_dist'], ~mountain,
+                                             mountain != state['mountain'])
+
+    # ---- patch outputs -----------------------------------------------------
+    layers = dict(water_mask=water_mask, realm_seeds=realm_seeds, sub_seeds=sub_seeds,
+                  realm_names=realm_names, sub_names=sub_names, geo_labels=geo_labels,
+                  clean_grid=clean_grid, geo_id_grid=geo_id_grid,
+                  geo_names=json.loads(str(state['geo_names'])),
+                  geo_seed_rows=geo_seed_rows, geo_seed_cols=geo_seed_cols, cost=cost,
+                  owner_all=owner_all, dist_all=dist_all, owner_realm=owner_realm,
+                  dist_realm=dist_realm, sub_parent=sub_parent,
+                  final_realm=final_realm, final_sub=final_sub)
+    region_rows = _changed_rows((old_realm, final_realm),
+                                (state['final_sub'], final_sub),
+                                (state['geo_id_grid'], geo_id_grid))
+    old_depth = mountain_depth(state['mountain_dist'], state['mountain'])
+    depth = mountain_depth(mountain_dist, mountain)
+    depth_rows = _changed_rows((old_depth, depth))
+    try:
+        patch_reg2_rows(output_grid_path, final_realm, final_sub, geo_id_grid, region_rows)
+        patch_mdep_rows(output_mountain_path, depth, depth_rows)
+        if output_tiles_path:
+            # Ocean and restored terrain can change away from the edit; diff the file
+            restored = restore_terrain_under_labels(grid, H, W, tokens)
+            tile_rows = patch_tile_rows(output_tiles_path, terrain_indices(restored),
+                                        final_realm, final_sub, geo_id_grid,
+                                        tile_flags(restored, water_mask, depth))
+    except ValueError:
+        return rebuild("outputs in an unexpected format")
+    poi_changed = _write_if_changed(output_poi_path, _poi_text(layers))
+    if poi_changed and output_poib_path:
+        write_poi_bin(output_poib_path, layers)
+    save_state(state_path, grid, layers, mountain, mountain_dist)
+
+    return (f"patched {np.count_nonzero(edited)} edited tiles: "
+            f"{len(region_rows)} region rows, {len(depth_rows)} depth rows"
+            f"{f', {len(tile_rows)} tile rows' if output_tiles_path else ''}"
+            f"{', POI list' if poi_changed else ''}")
+
+def refresh_manifest(map_path, outputs):
+    """
+    Record `outputs` as up to date in check_and_preprocess.py's build
+    manifest if they are its map stage's outputs for `map_path`; returns
+    the ones recorded.
+    """
+    stages = map_stages(Path(__file__).resolve().parent.parent, tuple(EXTRAS))
+    map_stage = next(s for s in stages if s.name == "map")
+    if [Path(p).resolve() for p in map_stage.inputs] != [Path(map_path).resolve()]:
+        return []
+    return mark_built(stages, "map", outputs, Path(map_stage.outputs[0]).parent)
+
+################################################################################
+# CLI
+################################################################################
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the map artifacts incrementally after worldmap edits.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_grid')
+    parser.add_argument('output_poi')
+    parser.add_argument('output_mountains')
+    parser.add_argument('--poi-table', default=None, metavar='PATH',
+                        help="also keep this POIB table up to date")
+    parser.add_argument('--tiles', default=None, metavar='PATH',
+                        help="also keep this TILE grid up to date")
+    parser.add_argument('--state', default=None,
+                        help="state file, .npz appended if missing (default: <output_grid>.state.npz)")
+    parser.add_argument('--full', action='store_true',
+                        help="ignore any saved state and rebuild everything")
+    args = parser.parse_args()
+    print(update_outputs(args.input_map, args.output_grid, args.output_poi,
+                         args.output_mountains, state_path=args.state,
+                         force_full=args.full, output_poib_path=args.poi_table,
+                         output_tiles_path=args.tiles))
+    outputs = [args.output_grid, args.output_poi, args.output_mountains,
+               args.poi_table, args.tiles]
+    if refresh_manifest(args.input_map, [p for p in outputs if p]):
+        print("Build manifest updated")
+
+if __name__ == "__main__":
+    main()
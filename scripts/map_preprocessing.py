@@ -1,46 +1,37 @@
 #!/usr/bin/env python3
-import os, sys, heapq, collections, struct, csv, numpy as np
+import argparse, csv, numpy as np
+
+from worldmap_io import load_map, char_class_mask, SPACE
+from annotations import tokenize, is_label_char, REALM, PROVINCE
+from grid_ops import components_touching, label_bounding_boxes
+from shortest_paths import multi_source_owner
+from artifact_io import write_regions, write_poi_table
+from profiling import stage, enable as enable_profiling
 
 # --------------------------------------------------------------------------- #
 #  Imports for new geographic feature support
 # --------------------------------------------------------------------------- #
-from geo_features_preprocessing import build_geo_feature_grid
-
-# ---------------- Load map -------------------------------------------------- #
-def load_map(map_path):
-    if not os.path.exists(map_path):
-        raise FileNotFoundError(f"Map file not found: {map_path}")
-    with open(map_path, 'r', encoding='utf-8') as f:
-        lines = [ln.rstrip('\n') for ln in f]
-    H = len(lines)
-    W = max(len(ln) for ln in lines) if lines else 0
-    grid = [list(ln.ljust(W)) for ln in lines]
-    return grid, H, W
+from geo_features_preprocessing import build_geo_feature_grid, detect_labels
 
 # ---------------- Helper: flood water incl. text --------------------------- #
-dirs = [(1,0),(-1,0),(0,1),(0,-1)]
 def build_water_mask(grid):
-    """Return mask of cells considered ocean ( '=' or adjacent label characters )."""
-    H=len(grid); W=len(grid[0])
-    water=np.zeros((H,W),bool)
-    dq=collections.deque()
-    for r in range(H):
-        for c in range(W):
-            if grid[r][c]=='=' and not water[r,c]:
-                water[r,c]=True; dq.append((r,c))
-    def is_water_char(ch):
-        return ch=='=' or ch.isalpha() or ch=='_' or ch=="'"
-    while dq:
-        r,c=dq.popleft()
-        for dr,dc in dirs:
-            nr,nc=r+dr,c+dc
-            if 0<=nr<H and 0<=nc<W and not water[nr,nc] and is_water_char(grid[nr][nc]):
-                water[nr,nc]=True
-                dq.append((nr,nc))
-    return water
+    """Return mask of cells considered ocean ( '=' or adjacent label characters ).
+
+    Equivalent to flooding out from every '=' through 4-connected water
+    characters: the mask is every water-char component that holds a '='.
+    """
+    return components_touching(char_class_mask(grid, is_water_char), grid==ord('='))
+
+def is_water_char(ch):
+    return ch=='=' or is_label_char(ch)
 
 # ---------------- Parse annotation seeds ----------------------------------- #
-def parse_annotations(grid, H, W):
+def parse_annotations(grid, H, W, tokens=None):
+    """Realm / province seeds from the bracket tokens (annotations.py).
+
+    `tokens` is tokenize(grid) if the caller already has it.  The bracket
+    text is blanked in `grid`.
+    """
     def register(name, mapping, order_list):
         if name not in mapping:
             mapping[name] = len(mapping)
@@ -51,181 +42,248 @@ def parse_annotations(grid, H, W):
     realm_names, sub_names = [], []
     realm_seeds, sub_seeds = {}, {}
 
-    for r in range(H):
-        c=0
-        while c<W:
-            ch=grid[r][c]
-            if ch in ('[','('):
-                close=']' if ch=='[' else ')'
-                k=c+1
-                name_chars=[]
-                while k<W and grid[r][k]!=close:
-                    name_chars.append(grid[r][k]); k+=1
-                if k<W:
-                    name=''.join(name_chars)
-                    if ch=='[':
-                        rid=register(name, realm_map, realm_names)
-                        realm_seeds[(r,c)] = rid
-                    else:
-                        sid=register(name, sub_map, sub_names)
-                        sub_seeds[(r,c)] = sid
-                    # blank annotation text
-                    for cc in range(c,k+1): grid[r][cc]=' '
-                    c=k
-            c+=1
+    for tok in (tokenize(grid) if tokens is None else tokens):
+        if tok.kind == REALM:
+            rid=register(tok.text, realm_map, realm_names)
+            realm_seeds[(tok.row,tok.col)] = rid
+        elif tok.kind == PROVINCE:
+            sid=register(tok.text, sub_map, sub_names)
+            sub_seeds[(tok.row,tok.col)] = sid
+        else:
+            continue
+        # blank annotation text
+        grid[tok.row, tok.span]=SPACE
     return realm_map, sub_map, realm_seeds, sub_seeds, realm_names, sub_names
 
 # ---------------- Terrain cost --------------------------------------------- #
 TERRAIN_COST={' ':1,'.':1, ',':2,';':2, '#':8,'&':8, '%':12, '^':100,
               '-':10,'|':10,'+':1,'=':50}
 def build_cost_grid(grid, water_mask, H, W):
-    cost=np.empty((H,W),float)
-    for r in range(H):
-        for c in range(W):
-            if water_mask[r,c]:
-                cost[r,c]=50
-            else:
-                cost[r,c]=TERRAIN_COST.get(grid[r][c],1)
+    lut=np.ones(max(int(grid.max(initial=0))+1, 256), float)
+    for ch,v in TERRAIN_COST.items():
+        lut[ord(ch)]=v
+    cost=lut[grid]
+    cost[water_mask]=50
     return cost
 
 # ---------------- Multi-source Dijkstra ------------------------------------ #
 def multi_dijkstra(seeds, cost, H, W, restrict=None):
-    dist=np.full((H,W),np.inf)
-    owner=np.full((H,W),-1,int)
-    pq=[]
-    for (r,c),sid in seeds.items():
-        dist[r,c]=0; owner[r,c]=sid; heapq.heappush(pq,(0,r,c,sid))
-    while pq:
-        d,r,c,sid=heapq.heappop(pq)
-        if d!=dist[r,c] or owner[r,c]!=sid: continue
-        for dr,dc in dirs:
-            nr,nc=r+dr,c+dc
-            if 0<=nr<H and 0<=nc<W:
-                if restrict is not None and not restrict[nr,nc]:
-                    continue
-                nd=d+cost[nr,nc]
-                if nd<dist[nr,nc]:
-                    dist[nr,nc]=nd; owner[nr,nc]=sid; heapq.heappush(pq,(nd,nr,nc,sid))
+    """Owner grid of the cheapest seed for every cell (bucket-queue engine)."""
+    owner, _ = multi_source_owner(cost, seeds, restrict=restrict)
     return owner
 
+def flood(cost, seeds, restrict=None, pool=None):
+    """``(owner, dist)`` from the serial engine, or split across a FloodPool."""
+    if pool is not None:
+        return pool.flood(cost, seeds, restrict)
+    return multi_source_owner(cost, seeds, restrict=restrict)
+
+def _sub_realm_flood(task):
+    """Owner grid of one realm's sub-realm flood (a FloodPool.map task)."""
+    local, cost, mask = task
+    return multi_dijkstra(local, cost, *cost.shape, restrict=mask)
+
+# ---------------- Hierarchical realm / sub-realm partition ----------------- #
+def realm_floods(realm_seeds, sub_seeds, num_realms, cost, pool=None):
+    """Step 6: ``(owner_all, dist_all, owner_realm, dist_realm)``.
+
+    `owner_all` floods realms and sub-realms together (sub ids offset by
+    `num_realms`); `owner_realm` floods realms alone.
+    """
+    sub_offset = num_realms
+    combined = {**realm_seeds, **{pos: sub_offset+sid for pos,sid in sub_seeds.items()}}
+    owner_all, dist_all = flood(cost, combined, pool=pool)
+    owner_realm, dist_realm = flood(cost, realm_seeds, pool=pool)
+    return owner_all, dist_all, owner_realm, dist_realm
+
+def merge_realms(owner_all, owner_realm, sub_parent, num_realms):
+    """Step 8: realm grid where cells dominated by a sub-realm inherit its parent."""
+    parent_of = np.full(max(sub_parent, default=-1)+1, -1, int)
+    for sid, parent in sub_parent.items():
+        parent_of[sid] = parent
+    final_realm = owner_realm.copy()
+    dominated = owner_all >= num_realms
+    parent = parent_of[owner_all[dominated] - num_realms]
+    final_realm[dominated] = np.where(parent >= 0, parent, owner_realm[dominated])
+    return final_realm
+
+def assign_sub_realms(final_realm, sub_seeds, sub_parent, cost, num_realms,
+                      final_sub, realms=None, pool=None):
+    """Step 9: fill `final_sub` in place for `realms` (default: all of them).
+
+    Each realm's restricted flood is cropped to the bounding box of that
+    realm and its seeds, since it can never leave it.  The floods are
+    independent, so with a FloodPool they run side by side on its workers.
+    """
+    boxes = label_bounding_boxes(final_realm, num_realms)
+    windows, tasks = [], []
+    for rid in (range(num_realms) if realms is None else realms):
+        seeds = {pos:sid for pos,sid in sub_seeds.items() if sub_parent[sid]==rid}
+        if not seeds:
+            continue
+        r0, r1, c0, c1 = boxes[rid]
+        for r, c in seeds:
+            r0, r1, c0, c1 = min(r0, r), max(r1, r+1), min(c0, c), max(c1, c+1)
+        window = (slice(r0, r1), slice(c0, c1))
+        mask = final_realm[window] == rid
+        local = {(r-r0, c-c0): sid for (r,c),sid in seeds.items()}
+        windows.append((window, mask))
+        tasks.append((local, cost[window], mask))
+    owners = map(_sub_realm_flood, tasks) if pool is None else pool.map(_sub_realm_flood, tasks)
+    for (window, mask), sub_owner in zip(windows, owners):
+        final_sub[window][mask] = sub_owner[mask]
+
+def partition_regions(realm_seeds, sub_seeds, num_realms, cost, H, W):
+    """Return ``(final_realm, final_sub, sub_parent)`` ownership grids."""
+    owner_all, _, owner_realm, _ = realm_floods(realm_seeds, sub_seeds, num_realms, cost)
+    sub_parent = {sid: owner_realm[r,c] for (r,c),sid in sub_seeds.items()}
+    final_realm = merge_realms(owner_all, owner_realm, sub_parent, num_realms)
+    final_sub = np.full((H,W), -1, int)
+    assign_sub_realms(final_realm, sub_seeds, sub_parent, cost, num_realms, final_sub)
+    return final_realm, final_sub, sub_parent
+
 # ---------------- Main processing ------------------------------------------ #
-def process_map(map_path, output_grid_path, output_poi_path):
-    # 1) Load map
-    grid, H, W = load_map(map_path)
+def region_layers(grid, H, W, tokens=None, pool=None):
+    """Steps 2-9 of process_map on a loaded grid (left untouched).
+
+    `tokens` is tokenize(grid) if the caller already has it.  With a
+    FloodPool (shortest_paths) the floods run on its workers (same result).
+    Returns a dict
+    of every intermediate layer, so callers that emit other artifacts or
+    patch these later (preprocess.py, incremental_preprocessing.py) can
+    reuse them.
+    """
+    grid = grid.copy()
+    if tokens is None:
+        with stage("tokenize"):
+            tokens = tokenize(grid)
 
     # 2) Water mask **before** we mutate anything
-    original_grid = [row[:] for row in grid]
-    water_mask = build_water_mask(original_grid)
+    with stage("2 water_mask"):
+        water_mask = build_water_mask(grid)
 
     # 3) Realm / sub-realm parsing  (this blanks annotations in `grid`)
-    realm_map, sub_map, realm_seeds, sub_seeds, realm_names, sub_names = \
-        parse_annotations(grid, H, W)
+    with stage("3 annotations"):
+        realm_map, sub_map, realm_seeds, sub_seeds, realm_names, sub_names = \
+            parse_annotations(grid, H, W, tokens)
 
     # 4) Geographic feature detection – returns grid with geo labels removed
-    clean_grid, geo_id_grid, geo_names, geo_seed_rows, geo_seed_cols = \
-        build_geo_feature_grid(grid)
-
-    # Swap in the cleaned grid for all subsequent processing
-    grid = clean_grid
+    with stage("4 geo_features"):
+        geo_labels = detect_labels(grid, tokens)
+        clean_grid, geo_id_grid, geo_names, geo_seed_rows, geo_seed_cols = \
+            build_geo_feature_grid(grid, geo_labels, pool=pool)
 
     # 5) Build movement cost grid (uses cleaned terrain)
-    cost = build_cost_grid(grid, water_mask, H, W)
+    with stage("5 cost_grid"):
+        cost = build_cost_grid(clean_grid, water_mask, H, W)
 
     # 6) Dijkstra passes for region ownership
     num_realms = len(realm_names)
-    sub_offset  = num_realms
-    combined = {**realm_seeds, **{pos: sub_offset+sid for pos,sid in sub_seeds.items()}}
-    owner_all   = multi_dijkstra(combined, cost, H, W)
-    owner_realm = multi_dijkstra(realm_seeds, cost, H, W)
+    with stage("6 realm_floods"):
+        owner_all, dist_all, owner_realm, dist_realm = \
+            realm_floods(realm_seeds, sub_seeds, num_realms, cost, pool)
 
     # 7) Determine which realm each sub-realm lives in
-    sub_parent = {sid: owner_realm[r,c] for (r,c),sid in sub_seeds.items()}
+    with stage("7 sub_parents"):
+        sub_parent = {sid: owner_realm[r,c] for (r,c),sid in sub_seeds.items()}
 
     # 8) Final realm grid (inherit parent realm for cells dominated by a sub-realm)
-    final_realm = owner_realm.copy()
-    for r in range(H):
-        for c in range(W):
-            gid = owner_all[r,c]
-            if gid >= sub_offset:
-                parent = sub_parent.get(gid - sub_offset, -1)
-                if parent >= 0:
-                    final_realm[r,c] = parent
+    with stage("8 merge_realms"):
+        final_realm = merge_realms(owner_all, owner_realm, sub_parent, num_realms)
 
     # 9) Sub-realm assignment within realms
-    final_sub = np.full((H,W), -1, int)
-    for rid in range(num_realms):
-        mask = final_realm == rid
-        seeds = {pos:sid for pos,sid in sub_seeds.items() if sub_parent[sid]==rid}
-        if seeds:
-            sub_owner = multi_dijkstra(seeds, cost, H, W, restrict=mask)
-            final_sub[mask] = sub_owner[mask]
+    with stage("9 sub_realms"):
+        final_sub = np.full((H,W), -1, int)
+        assign_sub_realms(final_realm, sub_seeds, sub_parent, cost, num_realms, final_sub,
+                          pool=pool)
+
+    return dict(tokens=tokens, water_mask=water_mask, realm_seeds=realm_seeds, sub_seeds=sub_seeds,
+                realm_names=realm_names, sub_names=sub_names, geo_labels=geo_labels,
+                clean_grid=clean_grid, geo_id_grid=geo_id_grid, geo_names=geo_names,
+                geo_seed_rows=geo_seed_rows, geo_seed_cols=geo_seed_cols, cost=cost,
+                owner_all=owner_all, dist_all=dist_all, owner_realm=owner_realm,
+                dist_realm=dist_realm, sub_parent=sub_parent,
+                final_realm=final_realm, final_sub=final_sub)
+
+def poi_rows(realm_seeds, sub_seeds, sub_parent, realm_names, sub_names,
+             geo_names, geo_seed_rows, geo_seed_cols):
+    """Rows of the POI CSV (realms, sub-realms, geo features), header first."""
+    yield ['name', 'row', 'col', 'realm_id', 'sub_id', 'geo_id', 'type']
+
+    # Realm seeds
+    for (r,c), rid in realm_seeds.items():
+        yield [realm_names[rid], r, c, rid, -1, -1, 'Realm']
+
+    # Sub-realm seeds
+    for (r,c), sid in sub_seeds.items():
+        parent_rid = sub_parent[sid]
+        yield [sub_names[sid], r, c, parent_rid, sid, -1, 'SubRealm']
+
+    # Geographic feature seeds
+    for fid, (r,c) in enumerate(zip(geo_seed_rows, geo_seed_cols)):
+        yield [geo_names[fid], r, c, -1, -1, fid, 'GeoFeature']
+
+def write_poi_csv(path, layers):
+    """Write the POI CSV for a region_layers() result."""
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(poi_rows(
+            layers['realm_seeds'], layers['sub_seeds'], layers['sub_parent'],
+            layers['realm_names'], layers['sub_names'], layers['geo_names'],
+            layers['geo_seed_rows'], layers['geo_seed_cols']))
+
+def write_poi_bin(path, layers):
+    """Write the same POIs as a POIB table (Morton-sorted, bucket-indexed)."""
+    H, W = layers['final_realm'].shape
+    write_poi_table(path, W, H, list(poi_rows(
+        layers['realm_seeds'], layers['sub_seeds'], layers['sub_parent'],
+        layers['realm_names'], layers['sub_names'], layers['geo_names'],
+        layers['geo_seed_rows'], layers['geo_seed_cols']))[1:])
+
+def process_map(map_path, output_grid_path, output_poi_path):
+    # 1) Load map
+    with stage("1 load"):
+        grid, H, W = load_map(map_path)
+
+    # 2-9) Water, annotations, geo features, costs, realm / sub-realm ownership
+    layers = region_layers(grid, H, W)
 
     # --------------------------------------------------------------------- #
     # 10) Write REG2 binary grid
     # --------------------------------------------------------------------- #
-    with open(output_grid_path, 'wb') as f:
-        # Header
-        f.write(b'REG2')                       # Magic
-        f.write(struct.pack('HHH', 2, W, H))   # Version 2, W, H
-
-        # Per-tile bytes: realm_id, sub_id, geo_id
-        flat_realm = final_realm.ravel()
-        flat_sub   = final_sub.ravel()
-        flat_geo   = geo_id_grid.ravel()
-        for rid, sid, gid in zip(flat_realm, flat_sub, flat_geo):
-            f.write(struct.pack('BBB',
-                                rid if rid >= 0 else 255,
-                                sid if sid >= 0 else 255,
-                                gid if gid >= 0 else 255))
-
-        # ----- name tables: realms, sub-realms, geo features -----
-        def _write_table(names:list[str]):
-            f.write(struct.pack('B', len(names)))
-            for nm in names:
-                b = nm.encode('utf-8')
-                if len(b) > 255:
-                    raise ValueError(f"Name too long: {nm}")
-                f.write(struct.pack('B', len(b)))
-                f.write(b)
-
-        _write_table(realm_names)
-        _write_table(sub_names)
-        _write_table(geo_names)
+    with stage("10 write_regions"):
+        write_regions(output_grid_path, layers['final_realm'], layers['final_sub'],
+                   layers['geo_id_grid'], layers['realm_names'], layers['sub_names'],
+                   layers['geo_names'])
 
     # --------------------------------------------------------------------- #
     # 11) Write POI CSV (realms, sub-realms, geo features)
     # --------------------------------------------------------------------- #
-    with open(output_poi_path, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['name', 'row', 'col', 'realm_id', 'sub_id',
-                         'geo_id', 'type'])
-
-        # Realm seeds
-        for (r,c), rid in realm_seeds.items():
-            writer.writerow([realm_names[rid], r, c, rid, -1, -1, 'Realm'])
-
-        # Sub-realm seeds
-        for (r,c), sid in sub_seeds.items():
-            parent_rid = sub_parent[sid]
-            writer.writerow([sub_names[sid], r, c, parent_rid, sid, -1, 'SubRealm'])
-
-        # Geographic feature seeds
-        for fid, (r,c) in enumerate(zip(geo_seed_rows, geo_seed_cols)):
-            writer.writerow([geo_names[fid], r, c, -1, -1, fid, 'GeoFeature'])
+    with stage("11 write_poi"):
+        write_poi_csv(output_poi_path, layers)
 
     # --------------------------------------------------------------------- #
     # 12) Done
     # --------------------------------------------------------------------- #
     print(f"Processed {W}×{H} map")
-    print(f"Realms        : {len(realm_names)}")
-    print(f"Sub-realms    : {len(sub_names)}")
-    print(f"Geo-features  : {len(geo_names)}")
+    print(f"Realms        : {len(layers['realm_names'])}")
+    print(f"Sub-realms    : {len(layers['sub_names'])}")
+    print(f"Geo-features  : {len(layers['geo_names'])}")
     print(f"Binary grid   : {output_grid_path}")
     print(f"POI csv       : {output_poi_path}")
 
 # ---------------- CLI wrapper ---------------------------------------------- #
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the region grid and POI table from the worldmap.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_grid')
+    parser.add_argument('output_poi')
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings (see profiling.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile)
+    process_map(args.input_map, args.output_grid, args.output_poi)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python map_preprocessing.py <input_map> <output_grid> <output_poi>")
-        sys.exit(1)
-    process_map(sys.argv[1], sys.argv[2], sys.argv[3])
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Point and batch lookups over the built map artifacts, for tools that need
+"which realm / sub-realm / geo feature / mountain depth is at (r, c)"
+without rerunning the preprocessing or parsing the files themselves.
+
+Artifacts are memory-mapped, so opening one costs a header read and only
+the pages a query touches are loaded.  REG1/REG2/REG3, MDEP v1/v2 and TILE
+files are accepted, as are CHNK-wrapped REG2/REG3/MDEP/TILE copies (the
+format is taken from the magic, not the file name); for CHNK files only the
+chunks that contain queried cells are decompressed.  REG3 grids may hold uint16 id planes.
+
+Batch lookups (regions_at, depths_at, ...) take equally shaped row / col
+arrays and are a single fancy-indexing gather per plane.  Ids come back as
+int32 with -1 for "none" and for cells outside the map.
+
+    q = MapQuery(regions='maps/middle_earth_regions.bin',
+                 depth='maps/middle_earth_mountains.bin')
+    q.region_at(120, 300)           # RegionInfo(realm_id=3, ..., realm='Gondor', ...)
+    realm, sub, geo = q.regions_at(rows, cols)
+    q.names('realm', realm)         # object array of names (None for -1)
+
+Usage: python map_query.py <artifact> [<artifact> ...] --at ROW COL [--at ROW COL ...]
+"""
+from __future__ import annotations
+import argparse
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from artifact_io import (NONE_ID, HEADER, REG3_HEADER, TILE_HEADER, TILE_PLANES,
+                         ChunkedGrid, decode_name_table, none_id, read_reg2, read_mdep,
+                         read_tiles)
+
+KINDS = ('realm', 'sub', 'geo')
+
+class RegionInfo(NamedTuple):
+    realm_id: int               # -1 = none
+    sub_id: int
+    geo_id: int
+    realm: Optional[str]        # None when the id is -1
+    sub: Optional[str]
+    geo: Optional[str]
+
+################################################################################
+# PLANE SOURCES
+################################################################################
+class _Planes:
+    """Named H×W planes of one artifact, either mapped arrays or CHNK chunks."""
+
+    def __init__(self, width: int, height: int, arrays: Dict[str, np.ndarray] = None,
+                 chunked: ChunkedGrid = None, order: Sequence[str] = ()):
+        self.width, self.height = width, height
+        self.arrays = arrays or {}
+        self.chunked = chunked
+        self.order = {name: i for i, name in enumerate(order)}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays or name in self.order
+
+    def take(self, names: Sequence[str], rows: np.ndarray, cols: np.ndarray) -> List[np.ndarray]:
+        """Values of each plane in `names` at in-bounds (rows, cols)."""
+        if all(name in self.arrays for name in names):
+            return [self.arrays[name][rows, cols] for name in names]
+        grid = self.chunked
+        planes = [self.order[name] for name in names]
+        out = [np.empty(rows.shape, dtype=grid.dtypes[p]) for p in planes]
+        if not rows.size:
+            return out
+        # One pass over the touched chunks, decoding each once for all planes
+        cy, cx = rows // grid.chunk_h, cols // grid.chunk_w
+        cid = cy * grid.chunks_x + cx
+        order = np.argsort(cid, kind='stable')
+        starts = np.flatnonzero(np.r_[True, cid[order][1:] != cid[order][:-1]])
+        for group in np.split(order, starts[1:]):
+            y, x = int(cy[group[0]]), int(cx[group[0]])
+            chunk = grid.chunk(y, x)
+            r, c = rows[group] - y * grid.chunk_h, cols[group] - x * grid.chunk_w
+            for dst, p in zip(out, planes):
+                dst[group] = chunk[p][r, c]
+        return out
+
+def _names_after(buf, offset: int, count: int, count_bytes: int = 1) -> List[List[str]]:
+    tables = []
+    for _ in range(count):
+        if offset >= len(buf):
+            tables.append([])
+            continue
+        table, offset = decode_name_table(buf, offset, count_bytes)
+        tables.append(table)
+    return tables
+
+def open_artifact(path: str) -> Tuple[str, _Planes, Dict[str, List[str]]]:
+    """``(source magic, planes, {kind: names})`` for any supported artifact."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic in (b'REG1', b'REG2', b'REG3'):
+        g = read_reg2(path, mmap=True)
+        planes = _Planes(g.width, g.height, {'realm': g.realm, 'sub': g.sub, 'geo': g.geo})
+        return magic.decode('ascii'), planes, {'realm': g.realm_names, 'sub': g.sub_names, 'geo': g.geo_names}
+    if magic == b'MDEP':
+        g = read_mdep(path, mmap=True)
+        return 'MDEP', _Planes(g.width, g.height, {'depth': g.depth}), {}
+    if magic == b'TILE':
+        g = read_tiles(path)
+        planes = _Planes(g.width, g.height, {name: getattr(g, name) for name in TILE_PLANES})
+        return 'TILE', planes, {'realm': g.realm_names, 'sub': g.sub_names,
+                                'geo': g.geo_names, 'terrain': g.glyphs}
+    if magic == b'CHNK':
+        g = ChunkedGrid(path)
+        source, meta = g.source.decode('ascii'), g.meta
+        if source == 'REG2':
+            order, tables = KINDS, _names_after(meta, HEADER.size, 3)
+            names = dict(zip(KINDS, tables))
+        elif source == 'REG3':
+            order = KINDS
+            names = dict(zip(KINDS, _names_after(meta, REG3_HEADER.size, 3, count_bytes=2)))
+        elif source == 'MDEP':
+            order, names = ('depth',), {}
+        elif source == 'TILE':
+            plane_offset = TILE_HEADER.unpack_from(meta, 0)[5]
+            order = TILE_PLANES
+            names = dict(zip(('terrain',) + KINDS, _names_after(meta, plane_offset, 4)))
+        else:
+            raise ValueError(f"{path}: unknown CHNK source {source!r}")
+        return source, _Planes(g.width, g.height, chunked=g, order=order), names
+    raise ValueError(f"{path}: unrecognised artifact magic {magic!r}")
+
+################################################################################
+# QUERIES
+################################################################################
+class MapQuery:
+    """
+    Lookups over a region artifact (REG2, REG3 or TILE), a depth artifact (MDEP)
+    and/or a TILE grid; any may be a CHNK-wrapped copy.  Region queries use
+    `regions` if given, else the tile grid.
+    """
+
+    def __init__(self, regions: str = None, depth: str = None, tiles: str = None):
+        self._regions = self._depth = self._tiles = None
+        self._names: Dict[str, List[str]] = {}
+        for path in (tiles, regions, depth):
+            if path is None:
+                continue
+            source, planes, names = open_artifact(path)
+            if source == 'MDEP':
+                self._depth = planes
+            else:
+                if source == 'TILE':
+                    self._tiles = planes
+                if path == regions or self._regions is None:
+                    self._regions = planes
+                self._names.update(names)
+        if self._regions is None and self._depth is None:
+            raise ValueError("MapQuery needs at least one artifact")
+        any_planes = self._regions or self._depth
+        self.width, self.height = any_planes.width, any_planes.height
+
+    # -- batched ---------------------------------------------------------------
+    def _lookup(self, planes: Optional[_Planes], names: Sequence[str], rows, cols,
+                fill, ids: bool = False) -> List[np.ndarray]:
+        if planes is None or not all(name in planes for name in names):
+            raise ValueError(f"No loaded artifact has {'/'.join(names)} planes")
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.intp),
+                                         np.asarray(cols, dtype=np.intp))
+        inside = (rows >= 0) & (rows < planes.height) & (cols >= 0) & (cols < planes.width)
+        out = []
+        for values in planes.take(names, rows[inside], cols[inside]):
+            if ids:
+                none = values == none_id(values.dtype)
+                values = values.astype(np.int32)
+                values[none] = -1
+            full = np.full(rows.shape, fill,
+                           dtype=np.result_type(values.dtype, np.min_scalar_type(fill)))
+            full[inside] = values
+            out.append(full)
+        return out
+
+    def regions_at(self, rows, cols) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(realm, sub, geo)`` id arrays shaped like `rows` / `cols`."""
+        return tuple(self._lookup(self._regions, KINDS, rows, cols, -1, ids=True))
+
+    def depths_at(self, rows, cols) -> np.ndarray:
+        """Mountain depth at each cell (0 off-mountain and outside the map)."""
+        return self._lookup(self._depth, ('depth',), rows, cols, 0)[0]
+
+    def flags_at(self, rows, cols) -> np.ndarray:
+        """TILE flag bits at each cell (0 outside the map)."""
+        return self._lookup(self._tiles, ('flags',), rows, cols, 0)[0]
+
+    def terrain_at(self, rows, cols) -> np.ndarray:
+        """Terrain glyphs at each cell ('' outside the map) as a str array."""
+        index = self._lookup(self._tiles, ('terrain',), rows, cols, NONE_ID)[0]
+        glyphs = np.array(self._names['terrain'] + [''] * (NONE_ID + 1 - len(self._names['terrain'])))
+        return glyphs[index]
+
+    def names(self, kind: str, ids) -> np.ndarray:
+        """Object array of `kind` names for `ids` (None for -1)."""
+        table = np.array(list(self._names.get(kind, [])) + [None], dtype=object)
+        ids = np.asarray(ids)
+        return table[np.where((ids >= 0) & (ids < len(table) - 1), ids, -1)]
+
+    # -- scalar ----------------------------------------------------------------
+    def region_at(self, r: int, c: int) -> Optional[RegionInfo]:
+        """Ids and names at (r, c); None outside the map."""
+        if not (0 <= r < self.height and 0 <= c < self.width):
+            return None
+        ids = [int(a) for a in self.regions_at(r, c)]
+        return RegionInfo(*ids, *(self.name(kind, i) for kind, i in zip(KINDS, ids)))
+
+    def depth_at(self, r: int, c: int):
+        return self.depths_at(r, c).item()
+
+    def name(self, kind: str, id: int) -> Optional[str]:
+        table = self._names.get(kind, [])
+        return table[id] if 0 <= id < len(table) else None
+
+    def id_of(self, kind: str, name: str) -> int:
+        """Id of a realm / sub / geo name, -1 if there is none."""
+        table = self._names.get(kind, [])
+        return table.index(name) if name in table else -1
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up map artifacts at tile coordinates.")
+    parser.add_argument('artifacts', nargs='+',
+                        help="REG2 / REG3 / MDEP / TILE files or CHNK copies of them")
+    parser.add_argument('--at', nargs=2, type=int, action='append', required=True,
+                        metavar=('ROW', 'COL'))
+    args = parser.parse_args()
+
+    kinds = {}
+    for path in args.artifacts:
+        source = open_artifact(path)[0]
+        kinds['depth' if source == 'MDEP' else 'tiles' if source == 'TILE' else 'regions'] = path
+    q = MapQuery(**kinds)
+    for r, c in args.at:
+        parts = [f"({r}, {c})"]
+        if q._regions is not None:
+            parts.append(str(q.region_at(r, c)))
+        if q._depth is not None:
+            parts.append(f"depth={q.depth_at(r, c)}")
+        print('  '.join(parts))
+
+if __name__ == "__main__":
+    main()
@@ -2,83 +2,43 @@
 """
 Calculate mountain depth for each tile in the worldmap.
 Mountain depth = minimum distance from a mountain tile to the nearest non-mountain tile.
+
+Mountain depth is one channel of calculate_proximity_fields(), which
+computes depth into / distance to every terrain class in
+PROXIMITY_CHANNELS in one pass (see proximity_preprocessing.py).
 """
-import os, sys, numpy as np, struct
-from collections import deque
+import argparse, numpy as np
 
-def load_map(map_path):
-    """Load the ASCII map file."""
-    if not os.path.exists(map_path):
-        raise FileNotFoundError(f"Map file not found: {map_path}")
-    
-    with open(map_path, 'r', encoding='utf-8') as f:
-        lines = [ln.rstrip('\n') for ln in f]
-    H = len(lines)
-    W = max(len(ln) for ln in lines) if lines else 0
-    grid = [list(ln.ljust(W)) for ln in lines]
-    return grid, H, W
+from worldmap_io import load_map, parse_map, decode_cells
+from annotations import tokenize, is_feature_name, NAME, RIVER, MIN_BARE_NAME
+from distance_transform import distance_transform, METRICS
+from artifact_io import write_mdep, MDEP_DTYPES
+from profiling import stage, enable as enable_profiling
 
-def restore_terrain_under_labels(grid, H, W):
+def restore_terrain_under_labels(grid, H, W, tokens=None, out=None):
     """
     Restore terrain under annotation labels.
-    Annotations are [Name], (Name), !Name, ?Name, or bare names in terrain.
+    Annotations are [Name], (Name), !Name, ?Name, or bare names in terrain
+    (the token table from annotations.py; `tokens` if the caller has it).
     We need to infer what terrain should be under the text.
+    `out`, if given, already holds a copy of `grid` and is restored in place.
+
+    >>> grid, H, W = parse_map('^^Anórien^^^\\n'.encode('utf-8'))
+    >>> decode_cells(restore_terrain_under_labels(grid, H, W)[0])
+    '^^^^^^^^^^^^'
     """
-    restored_grid = [row[:] for row in grid]
-    
-    # Process each row looking for annotations
-    for r in range(H):
-        c = 0
-        while c < W:
-            ch = grid[r][c]
-            
-            # Check for bracketed annotations [Name] or (Name)
-            if ch in '[(':
-                close = ']' if ch == '[' else ')'
-                start_c = c
-                c += 1
-                # Find the closing bracket
-                while c < W and grid[r][c] != close:
-                    c += 1
-                if c < W:
-                    c += 1  # Include closing bracket
-                    
-                # Now infer terrain for this region
-                terrain = infer_terrain_for_region(grid, H, W, r, start_c, c)
-                for i in range(start_c, c):
-                    restored_grid[r][i] = terrain
+    restored_grid = grid.copy() if out is None else out
+    for tok in (tokenize(grid) if tokens is None else tokens):
+        start_c = tok.col
+        if tok.kind == RIVER:
+            # '@' itself stands for the ground under it; only the name is text
+            if len(tok.text) < MIN_BARE_NAME:
                 continue
-            
-            # Check for ! or ? prefixed names
-            elif ch in '!?':
-                start_c = c
-                c += 1
-                # Read the name
-                while c < W and grid[r][c] not in ' .,-|=^&%~+@[]()!?':
-                    c += 1
-                    
-                # Infer terrain
-                terrain = infer_terrain_for_region(grid, H, W, r, start_c, c)
-                for i in range(start_c, c):
-                    restored_grid[r][i] = terrain
-                continue
-            
-            # Check for bare text labels (like Blue_Mts)
-            elif ch.isalpha() or ch == '_':
-                start_c = c
-                # Read the whole label
-                while c < W and (grid[r][c].isalpha() or grid[r][c] in '_\''):
-                    c += 1
-                    
-                # Only process if it's a substantial label (3+ chars)
-                if c - start_c >= 3:
-                    terrain = infer_terrain_for_region(grid, H, W, r, start_c, c)
-                    for i in range(start_c, c):
-                        restored_grid[r][i] = terrain
-                continue
-                
-            c += 1
-    
+            start_c += 1
+        elif tok.kind == NAME and not is_feature_name(tok):
+            continue                    # stray letters, left as they are
+        terrain = infer_terrain_for_region(grid, H, W, tok.row, start_c, tok.end)
+        restored_grid[tok.row, start_c:tok.end] = ord(terrain)
     return restored_grid
 
 def infer_terrain_for_region(grid, H, W, row, start_col, end_col):
@@ -94,7 +54,7 @@ def infer_terrain_for_region(grid, H, W, row, start_col, end_col):
             for c in [start_col + dc, end_col + dc - 1]:
                 r = row + dr
                 if 0 <= r < H and 0 <= c < W:
-                    ch = grid[r][c]
+                    ch = chr(grid[r, c])
                     # Only count actual terrain characters
                     if ch in '^&%.,-|=~+ ' and not (ch.isalpha() or ch in '_\'[]()!?'):
                         terrain_counts[ch] = terrain_counts.get(ch, 0) + 1
@@ -108,7 +68,7 @@ def infer_terrain_for_region(grid, H, W, row, start_col, end_col):
         return max(terrain_counts.items(), key=lambda x: x[1])[0]
     
     # Default fallback based on common patterns
-    label_text = ''.join(grid[row][start_col:end_col]).lower()
+    label_text = decode_cells(grid[row, start_col:end_col]).lower()
     if 'mt' in label_text or 'mountain' in label_text or 'peak' in label_text:
         return '^'
     elif 'forest' in label_text or 'wood' in label_text:
@@ -123,56 +83,62 @@ def infer_terrain_for_region(grid, H, W, row, start_col, end_col):
     # Default to clear terrain
     return ' '
 
+# Terrain classes of the proximity fields: name → (glyphs, inside).  Inside
+# channels are the depth into the class (0 outside it), the others the
+# distance to the nearest cell of the class (inf if the map has none).
+PROXIMITY_CHANNELS = {
+    'mountain': ('^', True),
+    'forest':   ('&#', True),
+    'water':    ('=', False),
+    'river':    ('-|', False),
+    'road':     ('.+', False),
+    'crossing': ('+', False),
+}
+
+def calculate_proximity_fields(grid, H, W, channels=tuple(PROXIMITY_CHANNELS),
+                               metric='taxicab'):
+    """
+    C×H×W float64 fields, one per name in `channels`, from a single lookup
+    of the byte grid and one stacked distance transform.
+    """
+    if len(channels) > 32:
+        raise ValueError(f"At most 32 proximity channels, got {len(channels)}")
+    lut = np.zeros(max(int(grid.max(initial=0)) + 1, 256), dtype=np.uint32)
+    inside = np.zeros(len(channels), dtype=bool)
+    for k, name in enumerate(channels):
+        glyphs, inside[k] = PROXIMITY_CHANNELS[name]
+        for g in glyphs:
+            lut[ord(g)] |= 1 << k
+    bits = np.arange(len(channels), dtype=np.uint32)[:, None, None]
+    member = (lut[grid][None] >> bits) & 1 == 1             # C×H×W class masks
+    fields = distance_transform(member ^ inside[:, None, None], metric)
+    # Inside channels: 0 outside the class, and 0 when there is no way out
+    fields[inside] = np.where(member[inside] & ~np.isinf(fields[inside]),
+                              fields[inside], 0)
+    return fields
+
+def calculate_mountain_depths(grid, H, W, metric='taxicab'):
+    """
+    Distance from each mountain tile to the nearest non-mountain tile
+    (float64, 0 for non-mountain tiles).
+
+    metric: 'taxicab' (4-connected steps, the MDEP v1 definition),
+            'chessboard' (8-connected steps) or 'euclidean'.
+    """
+    return calculate_proximity_fields(grid, H, W, ('mountain',), metric)[0]
+
 def calculate_mountain_depths_bfs(grid, H, W):
     """
-    Calculate distance from each mountain tile to nearest non-mountain using BFS.
+    Calculate distance from each mountain tile to nearest non-mountain
+    (4-connected steps, capped at 255 for uint8).
     This gives us the "depth" of how far inside a mountain range each tile is.
     """
-    # Initialize depth grid
-    depth_grid = np.zeros((H, W), dtype=np.uint8)
-    
-    # Queue for BFS: (row, col, distance)
-    queue = deque()
-    visited = set()
-    
-    # Find all non-mountain tiles and add them as starting points
-    for r in range(H):
-        for c in range(W):
-            if grid[r][c] != '^':
-                queue.append((r, c, 0))
-                visited.add((r, c))
-    
-    # BFS to calculate distances
-    directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-    
-    while queue:
-        r, c, dist = queue.popleft()
-        
-        for dr, dc in directions:
-            nr, nc = r + dr, c + dc
-            
-            if 0 <= nr < H and 0 <= nc < W and (nr, nc) not in visited:
-                visited.add((nr, nc))
-                new_dist = dist + 1
-                
-                # If this is a mountain tile, record its depth
-                if grid[nr][nc] == '^':
-                    depth_grid[nr, nc] = min(new_dist, 255)  # Cap at 255 for uint8
-                    queue.append((nr, nc, new_dist))
-    
-    return depth_grid
+    depth = calculate_mountain_depths(grid, H, W)
+    return np.minimum(depth, 255).astype(np.uint8)
 
-def write_depth_file(output_path, depth_grid, W, H):
+def write_depth_file(output_path, depth_grid, W, H, dtype='u8', metric='taxicab'):
     """Write the mountain depth data to a binary file."""
-    with open(output_path, 'wb') as f:
-        # Header
-        f.write(b'MDEP')  # Magic number for Mountain Depth
-        f.write(struct.pack('HHH', 1, W, H))  # Version, Width, Height
-        
-        # Write depth data
-        for r in range(H):
-            for c in range(W):
-                f.write(struct.pack('B', depth_grid[r, c]))
+    write_mdep(output_path, depth_grid, dtype=dtype, metric=metric)
     
     print(f"Mountain depth data written to: {output_path}")
     print(f"Map size: {W}x{H}")
@@ -183,28 +149,43 @@ def write_depth_file(output_path, depth_grid, W, H):
         max_depth = np.max(depth_grid)
         deep_mountains = np.count_nonzero(depth_grid >= 4)
         print(f"Mountain tiles: {mountain_tiles}")
-        print(f"Maximum depth: {max_depth}")
+        print(f"Maximum depth: {max_depth:g}")
         print(f"Deep mountain tiles (4+ spaces): {deep_mountains} ({deep_mountains/mountain_tiles*100:.1f}%)")
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python mountain_depth_preprocessing.py <input_map> <output_depth_file>")
-        sys.exit(1)
-    
-    input_map = sys.argv[1]
-    output_file = sys.argv[2]
-    
+def build_depth_file(input_map, output_file, metric='taxicab', dtype='u8'):
+    """Load `input_map`, compute mountain depth and write the MDEP file."""
     # Load map
-    grid, H, W = load_map(input_map)
+    with stage("1 load"):
+        grid, H, W = load_map(input_map)
     
     # Restore terrain under labels
-    restored_grid = restore_terrain_under_labels(grid, H, W)
+    with stage("mountain_restore"):
+        restored_grid = restore_terrain_under_labels(grid, H, W)
     
     # Calculate depths using restored grid
-    depth_grid = calculate_mountain_depths_bfs(restored_grid, H, W)
+    with stage("mountain_depth"):
+        depth_grid = calculate_mountain_depths(restored_grid, H, W, metric=metric)
     
     # Write output
-    write_depth_file(output_file, depth_grid, W, H)
+    with stage("write_mdep"):
+        write_depth_file(output_file, depth_grid, W, H, dtype=dtype, metric=metric)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calculate mountain depth for each tile in the worldmap.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_depth_file')
+    parser.add_argument('--metric', choices=METRICS, default='taxicab',
+                        help="distance metric (default: taxicab, as in MDEP v1)")
+    parser.add_argument('--dtype', choices=sorted(MDEP_DTYPES), default='u8',
+                        help="stored depth type; u16/f16 lift the 255 cap (MDEP v2)")
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings (see profiling.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile)
+    build_depth_file(args.input_map, args.output_depth_file,
+                     metric=args.metric, dtype=args.dtype)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
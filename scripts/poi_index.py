@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Spatial POI lookups over the POIB table (see artifact_io.py), for tools
+that need "which POIs are in this viewport" or "what is the nearest POI
+to (r, c)" without parsing the POI CSV and scanning every entry.
+
+The table is memory-mapped.  Records are Morton-sorted and indexed by a
+uniform grid of bucket×bucket cells, so a viewport query reads only the
+buckets it overlaps and a nearest-POI query walks rings of buckets
+outwards from the query cell, stopping once no unvisited bucket can hold
+anything closer.  Distances are Euclidean over (row, col), as in
+RegionData.getNearbyPOIs.
+
+    pois = PoiIndex('maps/middle_earth_pois.bin')
+    pois.in_view(100, 250, 140, 330)    # [PoiInfo(name='Gondor', row=..., ...), ...]
+    pois.nearest(120, 300, kind='GeoFeature')
+
+``--benchmark POIS.csv`` times loading and querying the table against
+reading the CSV and scanning it linearly, and checks both agree.
+
+Usage: python poi_index.py <pois.bin> [--view R0 C0 R1 C1] [--near ROW COL]
+                           [--kind TYPE] [--benchmark POIS.csv]
+                           [--queries N] [--seed N]
+"""
+from __future__ import annotations
+import argparse, csv, math, time
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from artifact_io import read_poi_table, POI_TYPES
+
+class PoiInfo(NamedTuple):
+    name: str
+    row: int
+    col: int
+    realm_id: int               # -1 = none
+    sub_id: int
+    geo_id: int
+    type: str                   # 'Realm', 'SubRealm' or 'GeoFeature'
+
+class PoiIndex:
+    """Bucketed queries over one POIB table."""
+
+    def __init__(self, path: str):
+        table = read_poi_table(path, mmap=True)
+        self.width, self.height, self.bucket = table.width, table.height, table.bucket
+        self.records, self.buckets, self.names = table.records, table.buckets, table.names
+        # Queries touch a handful of records each; plain lists beat numpy calls
+        self._rows = table.records['row'].tolist()
+        self._cols = table.records['col'].tolist()
+        self._types = table.records['type'].tolist()
+        self._order = table.records['order'].tolist()
+        self._spans = [[(int(first), int(first) + int(count)) for first, count in row]
+                       for row in table.buckets]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def poi(self, i: int) -> PoiInfo:
+        """Record `i` (Morton order) as a PoiInfo."""
+        r = self.records[i]
+        return PoiInfo(self.names[r['name']], int(r['row']), int(r['col']), int(r['realm']),
+                       int(r['sub']), int(r['geo']), POI_TYPES[r['type']])
+
+    def all(self) -> List[PoiInfo]:
+        """Every POI, in POI CSV order."""
+        return [self.poi(i) for i in np.argsort(self.records['order'])]
+
+    def in_view(self, r0: int, c0: int, r1: int, c1: int) -> List[PoiInfo]:
+        """POIs with r0 <= row < r1 and c0 <= col < c1, in POI CSV order."""
+        B = self.bucket
+        by_n, bx_n = self.buckets.shape[:2]
+        rows, cols = self._rows, self._cols
+        hits = []
+        for by in range(max(r0, 0) // B, min(-(-r1 // B), by_n)):
+            for first, end in self._spans[by][max(c0, 0) // B:min(-(-c1 // B), bx_n)]:
+                hits.extend(i for i in range(first, end)
+                            if r0 <= rows[i] < r1 and c0 <= cols[i] < c1)
+        hits.sort(key=self._order.__getitem__)
+        return [self.poi(i) for i in hits]
+
+    def _rings(self, by: int, bx: int) -> Iterator[List[tuple]]:
+        """Buckets at Chebyshev bucket distance 0, 1, 2, ... from (by, bx)."""
+        by_n, bx_n = self.buckets.shape[:2]
+        for k in range(max(by_n, bx_n)):
+            ring = [(y, x) for y in range(by - k, by + k + 1) for x in range(bx - k, bx + k + 1)
+                    if max(abs(y - by), abs(x - bx)) == k and 0 <= y < by_n and 0 <= x < bx_n]
+            yield ring
+
+    def nearest(self, row: int, col: int, kind: Optional[str] = None) -> Optional[PoiInfo]:
+        """Closest POI to (row, col), optionally of one type; ties go to the
+        earliest in POI CSV order.  None if there is none."""
+        B = self.bucket
+        want = None if kind is None else POI_TYPES.index(kind)
+        best, best_d = None, math.inf
+        by, bx = min(max(row, 0) // B, self.buckets.shape[0] - 1), \
+                 min(max(col, 0) // B, self.buckets.shape[1] - 1)
+        rows, cols, types, order = self._rows, self._cols, self._types, self._order
+        for k, ring in enumerate(self._rings(by, bx)):
+            # Ring k is at least k-1 whole buckets away from (row, col)
+            if best is not None and best_d <= (k - 1) * B:
+                break
+            for y, x in ring:
+                first, end = self._spans[y][x]
+                for i in range(first, end):
+                    if want is not None and types[i] != want:
+                        continue
+                    d = math.hypot(rows[i] - row, cols[i] - col)
+                    if d < best_d or (d == best_d and order[i] < order[best]):
+                        best, best_d = i, d
+        return None if best is None else self.poi(best)
+
+################################################################################
+# CSV BASELINE
+################################################################################
+def read_poi_csv(path: str) -> List[PoiInfo]:
+    """Every POI of a POI CSV, in file order."""
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))[1:]
+    return [PoiInfo(name, int(r), int(c), int(rid), int(sid), int(gid), kind)
+            for name, r, c, rid, sid, gid, kind in rows]
+
+def scan_view(pois: List[PoiInfo], r0: int, c0: int, r1: int, c1: int) -> List[PoiInfo]:
+    return [p for p in pois if r0 <= p.row < r1 and c0 <= p.col < c1]
+
+def scan_nearest(pois: List[PoiInfo], row: int, col: int,
+                 kind: Optional[str] = None) -> Optional[PoiInfo]:
+    best, best_d = None, math.inf
+    for p in pois:
+        d = math.hypot(p.row - row, p.col - col)
+        if (kind is None or p.type == kind) and d < best_d:
+            best, best_d = p, d
+    return best
+
+def benchmark(table_path: str, csv_path: str, queries: int = 1000, seed: int = 0) -> dict:
+    """
+    Seconds spent loading and answering `queries` random viewport and
+    nearest-POI queries, CSV scan vs. POIB buckets.  Raises if they disagree.
+    """
+    t0 = time.perf_counter()
+    pois = read_poi_csv(csv_path)
+    t1 = time.perf_counter()
+    index = PoiIndex(table_path)
+    t2 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    H, W = index.height, index.width
+    views = [(int(r), int(c), int(r) + 40, int(c) + 120)
+             for r, c in rng.integers(0, [H, W], size=(queries, 2))]
+    points = [(int(r), int(c)) for r, c in rng.integers(0, [H, W], size=(queries, 2))]
+    result = {'pois': len(pois), 'queries': queries,
+              'csv_load_s': t1 - t0, 'poib_load_s': t2 - t1}
+    for name, view, near in (('csv', lambda v: scan_view(pois, *v), lambda p: scan_nearest(pois, *p)),
+                             ('poib', lambda v: index.in_view(*v), lambda p: index.nearest(*p))):
+        t0 = time.perf_counter()
+        result[f'{name}_views'] = [view(v) for v in views]
+        t1 = time.perf_counter()
+        result[f'{name}_nearest'] = [near(p) for p in points]
+        t2 = time.perf_counter()
+        result[f'{name}_view_s'], result[f'{name}_nearest_s'] = t1 - t0, t2 - t1
+    if result.pop('csv_views') != result.pop('poib_views') or \
+       result.pop('csv_nearest') != result.pop('poib_nearest'):
+        raise AssertionError("POIB queries disagree with the CSV scan")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a POIB table.")
+    parser.add_argument('table')
+    parser.add_argument('--view', type=int, nargs=4, metavar=('R0', 'C0', 'R1', 'C1'),
+                        help="list the POIs in rows [R0, R1) × cols [C0, C1)")
+    parser.add_argument('--near', type=int, nargs=2, metavar=('ROW', 'COL'),
+                        help="print the POI nearest to (ROW, COL)")
+    parser.add_argument('--kind', choices=POI_TYPES, default=None,
+                        help="with --near, only consider this POI type")
+    parser.add_argument('--benchmark', default=None, metavar='POIS.csv',
+                        help="time the table against scanning this POI CSV")
+    parser.add_argument('--queries', type=int, default=1000,
+                        help="benchmark queries of each kind (default: 1000)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed for the benchmark queries (default: 0)")
+    args = parser.parse_args()
+
+    index = PoiIndex(args.table)
+    if args.view:
+        for p in index.in_view(*args.view):
+            print(f"{p.type:<10} {p.row:>5} {p.col:>5}  {p.name}")
+    if args.near:
+        print(index.nearest(*args.near, kind=args.kind))
+    if args.benchmark:
+        r = benchmark(args.table, args.benchmark, args.queries, args.seed)
+        n = r['queries']
+        print(f"{r['pois']} POIs, {n} queries of each kind")
+        print(f"Load          : csv {r['csv_load_s'] * 1000:.2f} ms, "
+              f"poib {r['poib_load_s'] * 1000:.2f} ms")
+        print(f"Viewport      : csv {r['csv_view_s'] * 1e6 / n:.1f} µs, "
+              f"poib {r['poib_view_s'] * 1e6 / n:.1f} µs per query")
+        print(f"Nearest       : csv {r['csv_nearest_s'] * 1e6 / n:.1f} µs, "
+              f"poib {r['poib_nearest_s'] * 1e6 / n:.1f} µs per query")
+
+if __name__ == "__main__":
+    main()
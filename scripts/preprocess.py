@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Single-load preprocessing pipeline: builds any of the map artifacts from
+one read of the worldmap.
+
+    REG2   <stem>_regions.bin      realm / sub-realm / geo-feature grid
+                                   (REG3 when a layer has more than 255 ids)
+    POI    <stem>_pois.csv         realm, sub-realm and feature seeds
+    POIB   <stem>_pois.bin         the same POIs, Morton-sorted with a
+                                   bucket index for spatial queries
+    MDEP   <stem>_mountains.bin    mountain depth
+    TILE   <stem>_tiles.bin        planar terrain / realm / sub / geo / flags
+                                   planes for zero-copy loading (opt-in:
+                                   --outputs ...,tiles)
+    TRVL   <stem>_travel.bin       POI-to-POI travel costs (opt-in: --outputs
+                                   ...,travel; --first-hop adds path steps)
+    HPAG   <stem>_hpa.bin          HPA* abstraction graph for long routes
+                                   (opt-in: --outputs ...,hpa)
+    PROX   <stem>_proximity.bin    mountain / forest depth and distance to
+                                   water, river, road, crossing (opt-in:
+                                   --outputs ...,prox; --metric applies)
+
+The map is loaded and tokenized once; the region layers (water mask, clean
+grid, cost grid, floods) are computed once and shared by REG2 and POI, and
+the mountain stage restores terrain from the same token table.  The
+standalone scripts (map_preprocessing.py, mountain_depth_preprocessing.py)
+produce the same bytes.
+
+With ``--chunk N`` every binary artifact is also wrapped in a CHNK
+container (<stem>_regions.chunks, ...) of N×N compressed tiles, for web
+builds of large maps that only fetch and decode what the viewport shows.
+
+With ``--tiled`` the same bytes are built out of core for maps larger than
+memory (tiled_preprocessing.py): layers live in memory-mapped scratch files
+under --scratch DIR and floods run N×N tiles at a time (--tile N).
+
+Usage: python preprocess.py <input_map> [--outputs reg2,poi,poib,mdep[,tiles,travel,hpa,prox]]
+                            [--out-dir DIR] [--metric M] [--dtype T]
+                            [--chunk N] [--codec zlib|rle|raw]
+                            [--first-hop]
+                            [--tiled [--tile N] [--scratch DIR]]
+                            [--profile REPORT.json] [--cprofile DIR]
+"""
+import argparse, os
+from pathlib import Path
+import numpy as np
+
+from worldmap_io import load_map
+from annotations import tokenize
+from artifact_io import (write_regions, write_tiles, terrain_indices, chunk_artifact,
+                         id_dtype, MDEP_DTYPES, CHNK_CODECS,
+                         TILE_OCEAN, TILE_RIVER, TILE_ROAD, TILE_BRIDGE,
+                         TILE_DEEP_MOUNTAIN)
+from distance_transform import METRICS
+from shortest_paths import flood_pool
+from profiling import stage, enable as enable_profiling
+from map_preprocessing import region_layers, write_poi_csv, write_poi_bin
+from travel_preprocessing import write_travel_file
+from hpa_preprocessing import write_hpa_file
+from mountain_depth_preprocessing import (restore_terrain_under_labels,
+                                          calculate_mountain_depths, write_depth_file,
+                                          calculate_proximity_fields, PROXIMITY_CHANNELS)
+from proximity_preprocessing import write_proximity_file
+
+ARTIFACTS = ('reg2', 'poi', 'poib', 'mdep')
+IN_MEMORY_ARTIFACTS = ('travel', 'hpa', 'prox')         # not built by --tiled
+OPTIONAL_ARTIFACTS = ('tiles',) + IN_MEMORY_ARTIFACTS   # only built when named in --outputs
+DEEP_MOUNTAIN = 4                       # taxicab depth that counts as deep mountain
+
+def default_paths(map_path, out_dir=None):
+    """``{artifact: path}`` using the names the game loads (maps/<stem>_*.bin)."""
+    map_path = Path(map_path)
+    out_dir = Path(out_dir) if out_dir else map_path.parent
+    stem = map_path.stem
+    return {'reg2': out_dir / f"{stem}_regions.bin",
+            'poi': out_dir / f"{stem}_pois.csv",
+            'poib': out_dir / f"{stem}_pois.bin",
+            'mdep': out_dir / f"{stem}_mountains.bin",
+            'tiles': out_dir / f"{stem}_tiles.bin",
+            'travel': out_dir / f"{stem}_travel.bin",
+            'hpa': out_dir / f"{stem}_hpa.bin",
+            'prox': out_dir / f"{stem}_proximity.bin"}
+
+def tile_flags(terrain, water_mask, depth):
+    """TILE flags plane from the restored terrain grid, the ocean mask and
+    (taxicab) mountain depth."""
+    flags = np.zeros(terrain.shape, dtype=np.uint8)
+    flags[water_mask] |= TILE_OCEAN
+    flags[(terrain == ord('-')) | (terrain == ord('|'))] |= TILE_RIVER
+    flags[terrain == ord('.')] |= TILE_ROAD
+    flags[terrain == ord('+')] |= TILE_BRIDGE
+    flags[depth >= DEEP_MOUNTAIN] |= TILE_DEEP_MOUNTAIN
+    return flags
+
+def build_artifacts(map_path, reg2_path=None, poi_path=None, mdep_path=None,
+                    tiles_path=None, metric='taxicab', dtype='u8', jobs=None,
+                    travel_path=None, first_hop=False, hpa_path=None, poib_path=None,
+                    prox_path=None):
+    """
+    Write every artifact whose path is given and return the shared layers
+    (region_layers() plus ``grid``, ``tokens``, ``restored`` if MDEP, TILE
+    or PROX was built and ``depth`` if MDEP or TILE was).  `jobs` > 1 runs
+    the floods on one FloodPool of that many processes.
+    """
+    with stage("1 load"):
+        grid, H, W = load_map(map_path)
+    with stage("tokenize"):
+        tokens = tokenize(grid)
+    layers = {'grid': grid, 'tokens': tokens}
+
+    if reg2_path or poi_path or poib_path or tiles_path or travel_path or hpa_path:
+        with flood_pool(jobs, H * W) as pool:
+            layers.update(region_layers(grid, H, W, tokens, pool=pool))
+        print(f"Processed {W}×{H} map")
+        print(f"Realms        : {len(layers['realm_names'])}")
+        print(f"Sub-realms    : {len(layers['sub_names'])}")
+        print(f"Geo-features  : {len(layers['geo_names'])}")
+    if reg2_path:
+        with stage("10 write_regions"):
+            write_regions(reg2_path, layers['final_realm'], layers['final_sub'],
+                       layers['geo_id_grid'], layers['realm_names'], layers['sub_names'],
+                       layers['geo_names'])
+        print(f"Binary grid   : {reg2_path}")
+    if poi_path:
+        with stage("11 write_poi"):
+            write_poi_csv(poi_path, layers)
+        print(f"POI csv       : {poi_path}")
+    if poib_path:
+        with stage("write_poib"):
+            write_poi_bin(poib_path, layers)
+        print(f"POI table     : {poib_path}")
+    if travel_path:
+        with stage("travel_matrix"):
+            write_travel_file(travel_path, layers, W, H, first_hop=first_hop, jobs=jobs)
+        print(f"Travel matrix : {travel_path}")
+    if hpa_path:
+        with stage("hpa_graph"):
+            write_hpa_file(hpa_path, layers)
+        print(f"HPA* graph    : {hpa_path}")
+
+    if mdep_path or tiles_path or prox_path:
+        with stage("mountain_restore"):
+            restored = restore_terrain_under_labels(grid, H, W, tokens)
+        layers['restored'] = restored
+    if mdep_path or tiles_path:
+        with stage("mountain_depth"):
+            depth = calculate_mountain_depths(restored, H, W, metric=metric)
+        layers['depth'] = depth
+    if mdep_path:
+        with stage("write_mdep"):
+            write_depth_file(mdep_path, depth, W, H, dtype=dtype, metric=metric)
+    if prox_path:
+        with stage("proximity_fields"):
+            fields = calculate_proximity_fields(restored, H, W, tuple(PROXIMITY_CHANNELS), metric)
+        with stage("write_prox"):
+            write_proximity_file(prox_path, fields, tuple(PROXIMITY_CHANNELS), metric=metric)
+
+    wide = tiles_path and any(
+        id_dtype(layers[ids], layers[names]) != np.uint8
+        for ids, names in (('final_realm', 'realm_names'), ('final_sub', 'sub_names'),
+                           ('geo_id_grid', 'geo_names')))
+    layers['wide_ids'] = bool(wide)
+    if wide:
+        print("Tile grid     : skipped, more than 255 ids don't fit the u8 TILE planes")
+    elif tiles_path:
+        with stage("write_tiles"):
+            taxicab = depth if metric == 'taxicab' else calculate_mountain_depths(restored, H, W)
+            write_tiles(tiles_path, terrain_indices(restored),
+                        layers['final_realm'], layers['final_sub'], layers['geo_id_grid'],
+                        tile_flags(restored, layers['water_mask'], taxicab),
+                        layers['realm_names'], layers['sub_names'], layers['geo_names'])
+        print(f"Tile grid     : {tiles_path}")
+    return layers
+
+def build_all(map_path, *outputs):
+    """Build-graph entry point: write each of `outputs`, named as in
+    default_paths(), with default settings.  Raises ValueError rather than
+    skip the tile grid, so a stage listing it never counts as built without it."""
+    artifacts = {path.name: artifact for artifact, path in default_paths(map_path).items()}
+    layers = build_artifacts(map_path, **{f"{artifacts[Path(out).name]}_path": out
+                                          for out in outputs})
+    if layers['wide_ids']:
+        raise ValueError(f"{map_path}: more than 255 ids don't fit the u8 TILE planes; "
+                         f"build without the tile grid")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the map artifacts from one load of the worldmap.")
+    parser.add_argument('input_map')
+    parser.add_argument('--outputs', default=','.join(ARTIFACTS),
+                        help=f"comma-separated subset of {','.join(ARTIFACTS + OPTIONAL_ARTIFACTS)} "
+                             f"(default: {','.join(ARTIFACTS)})")
+    parser.add_argument('--out-dir', default=None,
+                        help="directory for the outputs (default: next to the map)")
+    parser.add_argument('--metric', choices=METRICS, default='taxicab',
+                        help="mountain depth metric (default: taxicab, as in MDEP v1)")
+    parser.add_argument('--dtype', choices=sorted(MDEP_DTYPES), default='u8',
+                        help="stored mountain depth type (default: u8)")
+    parser.add_argument('--chunk', type=int, default=0, metavar='N',
+                        help="also write N×N-chunked .chunks copies of the binary outputs")
+    parser.add_argument('--codec', choices=CHNK_CODECS, default='zlib',
+                        help="chunk compression (default: zlib)")
+    # Undocumented until multi-core scaling has been measured
+    parser.add_argument('-j', '--jobs', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--first-hop', action='store_true',
+                        help="with the travel output, also store each path's first step")
+    parser.add_argument('--tiled', action='store_true',
+                        help="build out of core, for maps larger than memory")
+    parser.add_argument('--tile', type=int, default=None, metavar='N',
+                        help="with --tiled, flood tile size (default: 256)")
+    parser.add_argument('--scratch', default=None, metavar='DIR',
+                        help="with --tiled, where scratch files go (default: system temp)")
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings and flood counters (see profiling.py)")
+    parser.add_argument('--cprofile', default=None, metavar='DIR',
+                        help="with profiling, also dump a cProfile file per stage into DIR")
+    args = parser.parse_args()
+    if args.profile or args.cprofile:
+        enable_profiling(args.profile, args.cprofile)
+
+    wanted = [a.strip() for a in args.outputs.split(',') if a.strip()]
+    unknown = set(wanted) - set(ARTIFACTS + OPTIONAL_ARTIFACTS)
+    if unknown:
+        parser.error(f"unknown output(s): {', '.join(sorted(unknown))}")
+    paths = default_paths(args.input_map, args.out_dir)
+    paths['reg2'].parent.mkdir(parents=True, exist_ok=True)
+    outputs = {f"{a}_path": paths[a] if a in wanted else None for a in ARTIFACTS + ('tiles',)}
+    if args.tiled:
+        for artifact in IN_MEMORY_ARTIFACTS:
+            if artifact in wanted:
+                parser.error(f"the {artifact} output is only built in memory; drop --tiled")
+        from tiled_preprocessing import build_artifacts_tiled, FLOOD_TILE
+        layers = build_artifacts_tiled(args.input_map, **outputs, metric=args.metric,
+                                       dtype=args.dtype, tile=args.tile or FLOOD_TILE,
+                                       scratch_dir=args.scratch)
+    else:
+        jobs = (os.cpu_count() or 1) if args.jobs == 0 else args.jobs
+        layers = build_artifacts(args.input_map, **outputs, metric=args.metric,
+                                 dtype=args.dtype, jobs=jobs,
+                                 travel_path=paths['travel'] if 'travel' in wanted else None,
+                                 first_hop=args.first_hop,
+                                 hpa_path=paths['hpa'] if 'hpa' in wanted else None,
+                                 prox_path=paths['prox'] if 'prox' in wanted else None)
+    if args.chunk > 0:
+        for artifact in ('reg2', 'mdep', 'tiles'):
+            if artifact in wanted and not (artifact == 'tiles' and layers['wide_ids']):
+                dst = paths[artifact].with_suffix('.chunks')
+                chunk_artifact(paths[artifact], dst, args.chunk, args.codec)
+                print(f"Chunked copy  : {dst}")
+
+if __name__ == "__main__":
+    main()
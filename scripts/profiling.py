@@ -0,0 +1,129 @@
+"""
+Opt-in instrumentation for the preprocessing stages.
+
+Off by default: :func:`stage` then hands back a shared no-op context
+manager and the flood engine only does a couple of extra integer adds per
+bucket, so an uninstrumented build pays nothing measurable.  Turn it on
+with ``--profile PATH`` on the preprocessing CLIs or by setting
+
+    PREPROCESS_PROFILE=path.json        write the report here at exit
+    PREPROCESS_CPROFILE=dir             also dump a cProfile file per stage
+
+The report is JSON:
+
+    {"version": 1, "argv": [...], "total_seconds": ..., "peak_rss_mb": ...,
+     "stages": [{"name": "6 realm_floods", "parent": null, "seconds": ...,
+                 "rss_mb": ..., "peak_rss_mb": ...,
+                 "runs": [{"kind": "flood", "cells": ..., "seeds": ...,
+                           "pushes": ..., "pops": ..., "settled": ...,
+                           "stale": ..., "max_dist": ..., "seconds": ...}]}]}
+
+Stages nest (geo features run inside region_layers' numbered steps); each
+flood is recorded under the innermost open stage.  cProfile dumps are taken
+for outermost stages only, since profilers can't nest.  Floods run in
+worker processes (FloodPool.map tasks: geo classes, sub-realm floods)
+are not recorded; a split FloodPool.flood is recorded once, as a whole, by
+the parent.
+"""
+from __future__ import annotations
+import atexit, cProfile, json, os, resource, sys, time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILE_VERSION = 1
+ENV_VAR = 'PREPROCESS_PROFILE'
+CPROFILE_ENV_VAR = 'PREPROCESS_CPROFILE'
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024   # bytes vs KiB
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[Path] = None
+        self.cprofile_dir: Optional[Path] = None
+        self.stages: List[Dict[str, Any]] = []
+        self._open: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    def enable(self, path: str | None = None, cprofile_dir: str | None = None) -> None:
+        """Start recording; the report is written to `path` at exit (if given)."""
+        if not self.enabled:
+            atexit.register(self._write_at_exit)
+        self.enabled = True
+        self.path = Path(path) if path else self.path
+        if cprofile_dir:
+            self.cprofile_dir = Path(cprofile_dir)
+            self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {'name': name, 'parent': self._open[-1]['name'] if self._open else None,
+                  'runs': []}
+        self.stages.append(record)
+        profile = None
+        if self.cprofile_dir is not None and not self._open:
+            profile = cProfile.Profile()
+        self._open.append(record)
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+                safe = name.replace(' ', '_').replace('/', '_')
+                profile.dump_stats(self.cprofile_dir / f"{len(self.stages):02d}_{safe}.prof")
+            record['seconds'] = time.perf_counter() - start
+            record['rss_mb'] = _rss_mb()
+            record['peak_rss_mb'] = _peak_rss_mb()
+            self._open.pop()
+
+    def record_run(self, kind: str, **stats: Any) -> None:
+        """Attach one engine run's counters to the innermost open stage."""
+        run = {'kind': kind, **stats}
+        if self._open:
+            self._open[-1]['runs'].append(run)
+        else:
+            self.stages.append({'name': kind, 'parent': None, 'runs': [run],
+                                'seconds': stats.get('seconds')})
+
+    def report(self) -> Dict[str, Any]:
+        return {'version': PROFILE_VERSION, 'argv': sys.argv,
+                'total_seconds': time.perf_counter() - self._start,
+                'peak_rss_mb': _peak_rss_mb(), 'stages': self.stages}
+
+    def write(self, path: str | None = None) -> None:
+        path = Path(path) if path else self.path
+        if path is None:
+            return
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def _write_at_exit(self) -> None:
+        if self.enabled and self.path is not None:
+            self.write()
+
+PROFILER = Profiler()
+_NO_STAGE = nullcontext()
+
+def stage(name: str):
+    """``with stage("3 annotations"):`` – records the block when profiling is on."""
+    return PROFILER.stage(name) if PROFILER.enabled else _NO_STAGE
+
+def enable(path: str | None = None, cprofile_dir: str | None = None) -> None:
+    PROFILER.enable(path, cprofile_dir)
+
+if os.environ.get(ENV_VAR) or os.environ.get(CPROFILE_ENV_VAR):
+    enable(os.environ.get(ENV_VAR), os.environ.get(CPROFILE_ENV_VAR))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Terrain proximity fields (PROX, see artifact_io.py): for every tile, how
+deep it lies inside a mountain range or forest, and how far it is from
+the nearest water, river, road and river crossing.
+
+The terrain classes are mountain_depth_preprocessing.PROXIMITY_CHANNELS.
+All channels come from one lookup of the restored byte grid (labels
+replaced by the terrain under them, as for MDEP) and one stacked
+distance transform, so adding a channel adds a plane to the same
+vectorised sweeps rather than another pass over the map.  The mountain
+channel is exactly MDEP's depth.
+
+Usage: python proximity_preprocessing.py <input_map> <output_proximity>
+                                         [--channels a,b,...] [--metric M]
+                                         [--dtype T] [--profile REPORT.json]
+"""
+import argparse
+import numpy as np
+
+from worldmap_io import load_map
+from artifact_io import write_proximity, MDEP_DTYPES
+from distance_transform import METRICS
+from profiling import stage, enable as enable_profiling
+from mountain_depth_preprocessing import (restore_terrain_under_labels,
+                                          calculate_proximity_fields, PROXIMITY_CHANNELS)
+
+PROX_DTYPE = 'u16'                      # road / crossing distances pass 255 on the shipped map
+
+def write_proximity_file(output_path, fields, channels, dtype=PROX_DTYPE, metric='taxicab'):
+    """Write the PROX file and report each channel's range."""
+    write_proximity(output_path, fields, channels, dtype=dtype, metric=metric)
+    print(f"Proximity     : {output_path} ({', '.join(channels)})")
+    for name, field in zip(channels, fields):
+        finite = field[np.isfinite(field)]
+        print(f"  {name:<11} max {finite.max() if finite.size else 0:g}")
+
+def build_proximity_file(input_map, output_file, channels=tuple(PROXIMITY_CHANNELS),
+                         metric='taxicab', dtype=PROX_DTYPE):
+    """Load `input_map`, compute the proximity fields and write the PROX file."""
+    with stage("1 load"):
+        grid, H, W = load_map(input_map)
+    with stage("mountain_restore"):
+        restored = restore_terrain_under_labels(grid, H, W)
+    with stage("proximity_fields"):
+        fields = calculate_proximity_fields(restored, H, W, channels, metric)
+    with stage("write_prox"):
+        write_proximity_file(output_file, fields, channels, dtype=dtype, metric=metric)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute terrain proximity fields for every tile.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_proximity')
+    parser.add_argument('--channels', default=','.join(PROXIMITY_CHANNELS),
+                        help=f"comma-separated subset of {','.join(PROXIMITY_CHANNELS)} "
+                             f"(default: all)")
+    parser.add_argument('--metric', choices=METRICS, default='taxicab',
+                        help="distance metric (default: taxicab)")
+    parser.add_argument('--dtype', choices=sorted(MDEP_DTYPES), default=PROX_DTYPE,
+                        help=f"stored value type (default: {PROX_DTYPE})")
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings (see profiling.py)")
+    args = parser.parse_args()
+    channels = [c.strip() for c in args.channels.split(',') if c.strip()]
+    unknown = set(channels) - set(PROXIMITY_CHANNELS)
+    if unknown:
+        parser.error(f"unknown channel(s): {', '.join(sorted(unknown))}")
+    if args.profile:
+        enable_profiling(args.profile)
+    build_proximity_file(args.input_map, args.output_proximity, channels,
+                         metric=args.metric, dtype=args.dtype)
+
+if __name__ == "__main__":
+    main()
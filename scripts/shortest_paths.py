@@ -0,0 +1,593 @@
+"""
+Multi-source shortest-path engine for the region/feature flooding stages.
+
+Every movement cost in the pipeline is a small positive integer (see
+TERRAIN_COST in map_preprocessing.py), so instead of a binary heap of
+``(d, r, c, sid)`` tuples the engine uses Dial's bucket queue: a circular
+array of ``max_cost + 1`` buckets of flat cell indices.  All per-cell state
+(cost, dist, owner) lives in flat lists indexed by ``r * W + c``.
+
+Tie behaviour matches the heap implementation it replaces.  With a heap, a
+cell is settled in ``(dist, row, col)`` order and only a strictly shorter
+path can take it over, so the winner among equally short paths is the one
+through the row-major-first predecessor.  Sorting each bucket before it is
+expanded reproduces that order exactly.  Put differently, every cell is
+owned by the owner of its *tight predecessor* (a neighbour p with
+``dist[p] + cost[cell] == dist[cell]``) of smallest flat index; the repair
+path below (:func:`repair_owner`) relies on that rule to patch a finished
+flood after a local cost edit instead of re-running it.
+"""
+from __future__ import annotations
+import heapq, os, time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Optional, Tuple
+
+from profiling import PROFILER
+
+INF = 1 << 62
+
+def integer_costs(cost: np.ndarray) -> np.ndarray:
+    """Validate that `cost` holds integers >= 1 and return it as int64."""
+    as_int = np.asarray(cost).astype(np.int64)
+    if as_int.size and (not np.array_equal(as_int, cost) or as_int.min() < 1):
+        raise ValueError("Bucket-queue engine needs integer movement costs >= 1")
+    return as_int
+
+def multi_source_owner(cost: np.ndarray,
+                       seeds: Dict[Tuple[int, int], int] | Iterable[Tuple[Tuple[int, int], int]],
+                       restrict: Optional[np.ndarray] = None
+                       ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flood `cost` (H×W, integer >= 1, charged on *entering* a cell) from all
+    `seeds` at once.
+
+    Args:
+        cost:     H×W movement costs
+        seeds:    ``{(row, col): owner_id}`` or an iterable of such pairs
+        restrict: optional H×W bool mask; cells outside it are never entered
+                  (seeds themselves are always placed)
+
+    Returns:
+        ``(owner, dist)`` – int64 H×W arrays; unreached cells hold -1 / INF
+    """
+    H, W = cost.shape
+    N = H * W
+    flat_cost = integer_costs(cost).ravel().tolist()
+    allowed = None if restrict is None else restrict.ravel().tolist()
+    items = seeds.items() if isinstance(seeds, dict) else seeds
+
+    began = time.perf_counter()
+    dist = [INF] * N
+    owner = [-1] * N
+    start = []
+    for (r, c), sid in items:
+        i = r * W + c
+        if dist[i] != 0:
+            start.append(i)
+        dist[i] = 0
+        owner[i] = sid
+
+    pops = _dial(flat_cost, allowed, dist, owner, start, W) if start else 0
+    owner = np.array(owner, dtype=np.int64).reshape(H, W)
+    dist = np.array(dist, dtype=np.int64).reshape(H, W)
+    if PROFILER.enabled:
+        _record_flood('flood', began, dist, len(start), pops)
+    return owner, dist
+
+def _record_flood(kind: str, began: float, dist: np.ndarray, seeds: int,
+                  pops: int) -> None:
+    """Profiling counters of one flood (every pushed entry is popped)."""
+    reached = dist[dist < INF]
+    settled = int(reached.size)
+    PROFILER.record_run(kind, cells=int(dist.size), seeds=seeds, pushes=pops,
+                        pops=pops, settled=settled, stale=pops - settled,
+                        max_dist=int(reached.max()) if settled else None,
+                        seconds=time.perf_counter() - began)
+
+def _dial(cost: list, allowed: Optional[list], dist: list, owner: list,
+          start: list, W: int) -> int:
+    """
+    Expand from the dist-0 cells in `start`, updating dist/owner in place.
+    Returns the number of queue entries popped.
+    """
+    N = len(cost)
+    last_col = W - 1
+    n_buckets = max(cost) + 1
+    buckets = [[] for _ in range(n_buckets)]
+    buckets[0] = list(start)
+    pending = len(start)
+    pops = 0
+    d = 0
+    while pending:
+        slot = d % n_buckets
+        bucket = buckets[slot]
+        if not bucket:
+            d += 1
+            continue
+        buckets[slot] = []
+        pending -= len(bucket)
+        pops += len(bucket)
+        bucket.sort()                                   # heap order: (d, r, c)
+        for i in bucket:
+            if dist[i] != d:                            # stale entry
+                continue
+            o = owner[i]
+            col = i % W
+            for n in ((i - W) if i >= W else -1,
+                      (i - 1) if col else -1,
+                      (i + 1) if col != last_col else -1,
+                      (i + W) if i + W < N else -1):
+                if n < 0 or (allowed is not None and not allowed[n]):
+                    continue
+                nd = d + cost[n]
+                if nd < dist[n]:
+                    dist[n] = nd
+                    owner[n] = o
+                    buckets[nd % n_buckets].append(n)
+                    pending += 1
+        d += 1
+    return pops
+
+################################################################################
+# TILED (OUT-OF-CORE) FLOODS
+################################################################################
+FLOOD_TILE = 256
+
+def tiled_multi_source_owner(cost, seeds, restrict=None, owner=None, dist=None,
+                             tile: int = FLOOD_TILE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :func:`multi_source_owner` for grids that don't fit in memory: `cost`,
+    `restrict` and the outputs may be ``np.memmap`` arrays (or anything that
+    slices like one), and only one tile plus a one-cell halo is held as
+    Python lists at a time.
+
+    Every tile is flooded from its own seeds and its halo (the neighbouring
+    tiles' current distances, fixed for the pass).  A tile whose edge cells
+    change puts the neighbour on that side back on the work list, keyed by
+    the smallest changed distance so the work roughly follows the wave
+    front.  Distances only ever decrease, so this converges to the global
+    shortest paths, and because each pass expands in ``(dist, row, col)``
+    order the owners follow the same tight-predecessor rule as the
+    in-memory engine: the result is identical.
+
+    Args:
+        cost, restrict: as for :func:`multi_source_owner`
+        seeds:  ``{(row, col): owner_id}``, an iterable of such pairs, or an
+                H×W integer grid of owner ids (-1 = no seed)
+        owner, dist: H×W int64 output arrays (allocated if not given)
+
+    Returns:
+        ``(owner, dist)``
+    """
+    H, W = cost.shape
+    owner = np.empty((H, W), dtype=np.int64) if owner is None else owner
+    dist = np.empty((H, W), dtype=np.int64) if dist is None else dist
+    tiles_y, tiles_x = -(-H // tile), -(-W // tile)
+
+    began = time.perf_counter()
+    tile_seeds, seed_grid = _tile_seeds(seeds, H, W, tile)
+    for r0 in range(0, H, tile):
+        owner[r0:r0+tile] = -1
+        dist[r0:r0+tile] = INF
+
+    pending = {t: 0 for t in tile_seeds}
+    heap = [(0, t) for t in sorted(tile_seeds)]
+    visits = pops = 0
+    while heap:
+        key, t = heapq.heappop(heap)
+        if pending.get(t) != key:
+            continue
+        del pending[t]
+        visits += 1
+        ty, tx = divmod(t, tiles_x)
+        r0, c0 = ty * tile, tx * tile
+        r1, c1 = min(r0 + tile, H), min(c0 + tile, W)
+        changes, n_pops = _flood_tile(cost, restrict, owner, dist,
+                                      _placed(tile_seeds, seed_grid, t, r0, r1, c0, c1),
+                                      r0, r1, c0, c1)
+        pops += n_pops
+
+        # Neighbours whose halo (our edge row / column) changed go back on the list
+        for dy, dx, key in changes:
+            ny, nx = ty + dy, tx + dx
+            if not (0 <= ny < tiles_y and 0 <= nx < tiles_x):
+                continue
+            n = ny * tiles_x + nx
+            if key < pending.get(n, INF):
+                pending[n] = key
+                heapq.heappush(heap, (key, n))
+
+    if PROFILER.enabled:
+        PROFILER.record_run('tiled_flood', cells=H * W, tiles=tiles_y * tiles_x,
+                            visits=visits, pushes=pops, pops=pops,
+                            seconds=time.perf_counter() - began)
+    return owner, dist
+
+def _tile_seeds(seeds, H: int, W: int, tile: int):
+    """
+    ``(tile_seeds, seed_grid)``: seeds per tile as ``{(local row, local
+    col): id}`` (last placement winning), or for a seed grid only which
+    tiles hold seeds (read again per visit by :func:`_placed`).
+    """
+    tiles_x = -(-W // tile)
+    tile_seeds: Dict[int, Dict[Tuple[int, int], int]] = {}
+    seed_grid = seeds if hasattr(seeds, 'shape') else None
+    if seed_grid is not None:
+        for r0 in range(0, H, tile):
+            band = np.asarray(seed_grid[r0:r0+tile]) >= 0
+            for tx in range(tiles_x):
+                if band[:, tx*tile:(tx+1)*tile].any():
+                    tile_seeds[(r0 // tile) * tiles_x + tx] = {}
+    else:
+        for (r, c), sid in (seeds.items() if isinstance(seeds, dict) else seeds):
+            t = (r // tile) * tiles_x + c // tile
+            tile_seeds.setdefault(t, {})[(r % tile, c % tile)] = sid
+    return tile_seeds, seed_grid
+
+def _placed(tile_seeds, seed_grid, t: int, r0: int, r1: int, c0: int, c1: int):
+    """Tile `t`'s seeds as tile-local ``((row, col), id)`` pairs."""
+    if seed_grid is None:
+        return list(tile_seeds.get(t, {}).items())
+    local = np.asarray(seed_grid[r0:r1, c0:c1])
+    return [(rc, int(local[rc])) for rc in zip(*np.nonzero(local >= 0))]
+
+# Tile edges as (edge index, tile row step, tile column step)
+_SIDES = (((0, slice(None)), -1, 0), ((-1, slice(None)), 1, 0),
+          ((slice(None), 0), 0, -1), ((slice(None), -1), 0, 1))
+
+def _flood_tile(cost, restrict, owner, dist, placed, r0: int, r1: int, c0: int, c1: int):
+    """
+    One visit of the tiled engine: re-flood ``[r0:r1, c0:c1]`` from its
+    `placed` seeds and the one-cell halo's current distances, keeping what
+    earlier visits settled (distances only decrease), and write it back.
+
+    Returns ``(changes, pops)``; `changes` holds ``(dy, dx, key)`` for each
+    edge with changed cells, `key` being the smallest new distance there.
+    """
+    H, W = dist.shape
+    R0, C0 = max(r0 - 1, 0), max(c0 - 1, 0)
+    R1, C1 = min(r1 + 1, H), min(c1 + 1, W)
+    inner = (slice(r0 - R0, r1 - R0), slice(c0 - C0, c1 - C0))
+    window = (slice(R0, R1), slice(C0, C1))
+    wd = np.array(dist[window])
+    wo = np.array(owner[window])
+    old_d, old_o = wd[inner].copy(), wo[inner].copy()
+    allowed = np.zeros(wd.shape, dtype=bool)
+    allowed[inner] = True if restrict is None else np.asarray(restrict[r0:r1, c0:c1])
+
+    for (r, c), sid in placed:
+        wd[r + r0 - R0, c + c0 - C0] = 0
+        wo[r + r0 - R0, c + c0 - C0] = sid
+    halo = np.ones(wd.shape, dtype=bool)
+    halo[inner] = False
+    start_mask = (wd < INF) & (halo | (wd == 0))
+    wc = integer_costs(cost[window])
+    pred = tight_predecessors(wc, wd).tolist()
+    flat_d, flat_o = wd.ravel().tolist(), wo.ravel().tolist()
+    start = np.flatnonzero(start_mask).tolist()
+    pops = _dial_repair(wc.ravel().tolist(), flat_d, flat_o, pred, start, C1 - C0,
+                        allowed.ravel().tolist())
+    new_d = np.array(flat_d, dtype=np.int64).reshape(wd.shape)[inner]
+    new_o = np.array(flat_o, dtype=np.int64).reshape(wd.shape)[inner]
+    dist[r0:r1, c0:c1] = new_d
+    owner[r0:r1, c0:c1] = new_o
+
+    changed = (new_d != old_d) | (new_o != old_o)
+    changes = [(dy, dx, int(new_d[side][changed[side]].min()))
+               for side, dy, dx in _SIDES if changed[side].any()]
+    return changes, pops
+
+################################################################################
+# PARALLEL (DOMAIN-DECOMPOSED) FLOODS
+################################################################################
+_WORKER: Dict[str, object] = {}                # per-process mapping of the shared arena
+_ARENA = {'cost': np.int64, 'owner': np.int64, 'dist': np.int64, 'restrict': np.bool_}
+
+def _attach_worker(specs, tile: int) -> None:
+    """Pool initializer: map the arena's shared-memory blocks once per worker."""
+    _WORKER.clear()
+    _WORKER['tile'] = tile
+    for name, shm_name in specs.items():
+        _WORKER[name] = shared_memory.SharedMemory(name=shm_name)
+
+def _arena_view(blocks, name: str, shape: Tuple[int, int]) -> np.ndarray:
+    """The first H×W cells of arena block `name` as an array."""
+    return np.ndarray(shape, dtype=_ARENA[name], buffer=blocks[name].buf)
+
+def _parallel_tile(task):
+    """Worker side of :meth:`FloodPool.flood`: one tile visit."""
+    t, placed, shape, restricted = task
+    tile = _WORKER['tile']
+    H, W = shape
+    ty, tx = divmod(t, -(-W // tile))
+    r0, c0 = ty * tile, tx * tile
+    restrict = _arena_view(_WORKER, 'restrict', shape) if restricted else None
+    changes, pops = _flood_tile(_arena_view(_WORKER, 'cost', shape), restrict,
+                                _arena_view(_WORKER, 'owner', shape),
+                                _arena_view(_WORKER, 'dist', shape),
+                                placed, r0, min(r0 + tile, H), c0, min(c0 + tile, W))
+    return t, changes, pops
+
+class FloodPool:
+    """
+    Worker processes and a shared-memory arena (cost, restrict, owner and
+    dist buffers of up to `cells` cells) that every flood of a build reuses,
+    so the processes start and the blocks are mapped once rather than per
+    flood.  :meth:`flood` splits one large flood across the workers;
+    :meth:`map` runs independent tasks (e.g. whole small floods) on them.
+
+        with FloodPool(jobs, H * W) as pool:
+            owner, dist = pool.flood(cost, seeds)
+            owners = pool.map(flood_window, windows)
+    """
+
+    def __init__(self, jobs: Optional[int] = None, cells: int = 0, tile: int = FLOOD_TILE):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.tile = tile
+        self.cells = cells
+        self._blocks = {name: shared_memory.SharedMemory(
+                            create=True, size=max(cells * np.dtype(dtype).itemsize, 1))
+                        for name, dtype in _ARENA.items()}
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=_attach_worker,
+            initargs=({name: shm.name for name, shm in self._blocks.items()}, tile))
+
+    def __enter__(self) -> 'FloodPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+
+    def map(self, fn, tasks) -> list:
+        """``[fn(task) for task in tasks]``, computed on the workers."""
+        tasks = list(tasks)
+        return list(self._pool.map(fn, tasks, chunksize=max(1, len(tasks) // (4 * self.jobs))))
+
+    def flood(self, cost: np.ndarray, seeds, restrict: Optional[np.ndarray] = None
+              ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :func:`multi_source_owner` split across the workers, with the same
+        result.
+
+        The grid is cut into tiles as in :func:`tiled_multi_source_owner`
+        and copied into the arena, which every worker maps.  Work proceeds
+        in rounds: the pending tiles whose key (smallest changed halo
+        distance) is within about one tile crossing of the lowest are
+        flooded in parallel, first those on the "black" squares of a
+        checkerboard, then the "white" ones, so no two tiles running
+        together are 4-neighbours and each reads a halo nobody is writing.
+        Edge changes re-queue the neighbouring tiles, exactly as in the
+        serial tiled engine, until nothing is pending; distances only
+        decrease and every visit keeps the tight-predecessor rule, so the
+        owners are the serial engine's.
+
+        Grids that fit in one tile run serially in this process.
+        """
+        H, W = cost.shape
+        tile = self.tile
+        tiles_y, tiles_x = -(-H // tile), -(-W // tile)
+        if self.jobs <= 1 or tiles_y * tiles_x <= 1:
+            return multi_source_owner(cost, seeds, restrict=restrict)
+        if H * W > self.cells:
+            raise ValueError(f"{W}×{H} flood doesn't fit a {self.cells}-cell FloodPool")
+
+        began = time.perf_counter()
+        cost = integer_costs(cost)
+        # A wave front crosses a tile in roughly `tile` average-cost steps
+        delta = max(int(tile * cost.mean()), 1)
+        tile_seeds, seed_grid = _tile_seeds(seeds, H, W, tile)
+        _arena_view(self._blocks, 'cost', (H, W))[...] = cost
+        _arena_view(self._blocks, 'owner', (H, W))[...] = -1
+        _arena_view(self._blocks, 'dist', (H, W))[...] = INF
+        if restrict is not None:
+            _arena_view(self._blocks, 'restrict', (H, W))[...] = restrict
+
+        pending = {t: 0 for t in tile_seeds}
+        rounds = visits = pops = 0
+        while pending:
+            rounds += 1
+            limit = min(pending.values()) + delta
+            for color in (0, 1):
+                batch = sorted(t for t, key in pending.items()
+                               if key <= limit and sum(divmod(t, tiles_x)) % 2 == color)
+                if not batch:
+                    continue
+                tasks = []
+                for t in batch:
+                    del pending[t]
+                    ty, tx = divmod(t, tiles_x)
+                    r0, c0 = ty * tile, tx * tile
+                    tasks.append((t, _placed(tile_seeds, seed_grid, t, r0, min(r0 + tile, H),
+                                             c0, min(c0 + tile, W)),
+                                  (H, W), restrict is not None))
+                for t, changes, n_pops in self.map(_parallel_tile, tasks):
+                    visits += 1
+                    pops += n_pops
+                    ty, tx = divmod(t, tiles_x)
+                    for dy, dx, key in changes:
+                        ny, nx = ty + dy, tx + dx
+                        if 0 <= ny < tiles_y and 0 <= nx < tiles_x:
+                            n = ny * tiles_x + nx
+                            pending[n] = min(key, pending.get(n, INF))
+        owner = _arena_view(self._blocks, 'owner', (H, W)).copy()
+        dist = _arena_view(self._blocks, 'dist', (H, W)).copy()
+
+        if PROFILER.enabled:
+            PROFILER.record_run('parallel_flood', cells=H * W, tiles=tiles_y * tiles_x,
+                                jobs=self.jobs, rounds=rounds, visits=visits, pushes=pops,
+                                pops=pops, seconds=time.perf_counter() - began)
+        return owner, dist
+
+def flood_pool(jobs: Optional[int], cells: int):
+    """A :class:`FloodPool` when `jobs` > 1, else a context yielding None
+    (callers then flood serially)."""
+    return FloodPool(jobs, cells) if jobs and jobs > 1 else nullcontext()
+
+def parallel_multi_source_owner(cost: np.ndarray, seeds, restrict: Optional[np.ndarray] = None,
+                                jobs: Optional[int] = None, tile: int = FLOOD_TILE
+                                ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One :meth:`FloodPool.flood` on a pool of its own (`jobs` workers,
+    default one per CPU).  Builds that flood more than once should share a
+    FloodPool instead.
+    """
+    H, W = cost.shape
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or H <= tile and W <= tile:
+        return multi_source_owner(cost, seeds, restrict=restrict)
+    with FloodPool(jobs, H * W, tile) as pool:
+        return pool.flood(cost, seeds, restrict)
+
+################################################################################
+# INCREMENTAL REPAIR
+################################################################################
+def tight_predecessors(cost: np.ndarray, dist: np.ndarray) -> np.ndarray:
+    """
+    Flat index of every cell's smallest-index tight predecessor under `cost`
+    (the neighbour a flood with these distances took its owner from);
+    -1 for seeds and unreached cells.
+    """
+    H, W = dist.shape
+    N = H * W
+    d = dist.ravel()
+    c = integer_costs(cost).ravel()
+    idx = np.arange(N)
+    col = idx % W
+    pred = np.full(N, -1, dtype=np.int64)
+    settled = (d > 0) & (d < INF)
+    # Largest offset first so the smallest-index tight neighbour is written last
+    for off, valid in ((W, idx < N - W), (1, col != W - 1),
+                       (-1, col != 0), (-W, idx >= W)):
+        cells = idx[valid & settled]
+        nb = cells + off
+        tight = d[nb] + c[cells] == d[cells]
+        pred[cells[tight]] = nb[tight]
+    return pred
+
+def descendants(pred: np.ndarray, roots: np.ndarray) -> np.ndarray:
+    """
+    Mask of `roots` plus every cell whose predecessor chain passes through
+    one, found by pointer jumping (O(log depth) vectorised rounds).
+    """
+    hit = roots.copy()
+    anc = pred.copy()
+    while True:
+        live = np.flatnonzero((anc >= 0) & ~hit)
+        if not live.size:
+            return hit
+        up = anc[live]
+        hit[live] = hit[up]
+        anc[live] = anc[up]
+
+def repair_owner(old_cost: np.ndarray, new_cost: np.ndarray, owner: np.ndarray,
+                 dist: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Update an unrestricted :func:`multi_source_owner` result after some cell
+    costs changed, returning the ``(owner, dist)`` a fresh run on `new_cost`
+    would produce.
+
+    Only the edited cells and the cells whose shortest path ran through them
+    are reset; they are re-flooded from the surrounding settled cells, and
+    any cell the edit made cheaper to reach (or gave a new, lower-index tight
+    predecessor) is taken over and propagated onwards.  Work is proportional
+    to the region the edit actually influences.
+    """
+    H, W = dist.shape
+    old_c = integer_costs(old_cost)
+    new_c = integer_costs(new_cost)
+    changed = ((old_c != new_c) & (dist > 0)).ravel()   # a seed's own cost is never paid
+    owner = owner.ravel().copy()
+    dist = dist.ravel().copy()
+    if not changed.any():
+        return owner.reshape(H, W), dist.reshape(H, W)
+
+    pred = tight_predecessors(old_c, dist.reshape(H, W))
+    stale = descendants(pred, changed)
+    dist[stale] = INF
+    owner[stale] = -1
+    pred[stale] = -1
+
+    # Settled cells bordering the reset region restart the flood
+    stale2d = stale.reshape(H, W)
+    border = np.zeros((H, W), dtype=bool)
+    border[1:] |= stale2d[:-1]
+    border[:-1] |= stale2d[1:]
+    border[:, 1:] |= stale2d[:, :-1]
+    border[:, :-1] |= stale2d[:, 1:]
+    border = border.ravel() & ~stale & (dist < INF)
+
+    began = time.perf_counter()
+    owner_l, dist_l, pred_l = owner.tolist(), dist.tolist(), pred.tolist()
+    start = np.flatnonzero(border).tolist()
+    pops = _dial_repair(new_c.ravel().tolist(), dist_l, owner_l, pred_l, start, W)
+    owner = np.array(owner_l, dtype=np.int64).reshape(H, W)
+    dist = np.array(dist_l, dtype=np.int64).reshape(H, W)
+    if PROFILER.enabled:
+        PROFILER.record_run('repair', cells=int(dist.size), seeds=len(start),
+                            reset=int(stale.sum()), pushes=pops, pops=pops,
+                            seconds=time.perf_counter() - began)
+    return owner, dist
+
+def _dial_repair(cost: list, dist: list, owner: list, pred: list,
+                 start: list, W: int, allowed: Optional[list] = None) -> int:
+    """
+    Like :func:`_dial`, but starting from settled cells at arbitrary
+    distances and keeping `pred` so that equal-length paths resolve by the
+    tight-predecessor rule: a cell follows a relaxing neighbour with an index
+    no larger than its current predecessor, and is re-expanded whenever that
+    changes its owner.  Cells where `allowed` is false are never entered.
+    Returns the number of queue entries popped.
+    """
+    N = len(cost)
+    last_col = W - 1
+    buckets: Dict[int, list] = {}
+    for i in start:
+        buckets.setdefault(dist[i], []).append(i)
+    levels = list(buckets)
+    heapq.heapify(levels)
+
+    def push(n: int, nd: int) -> None:
+        bucket = buckets.get(nd)
+        if bucket is None:
+            buckets[nd] = bucket = []
+            heapq.heappush(levels, nd)
+        bucket.append(n)
+
+    pops = 0
+    while levels:
+        d = heapq.heappop(levels)
+        bucket = buckets.pop(d)
+        pops += len(bucket)
+        bucket.sort()
+        for i in bucket:
+            if dist[i] != d:                            # stale entry
+                continue
+            o = owner[i]
+            col = i % W
+            for n in ((i - W) if i >= W else -1,
+                      (i - 1) if col else -1,
+                      (i + 1) if col != last_col else -1,
+                      (i + W) if i + W < N else -1):
+                if n < 0 or (allowed is not None and not allowed[n]):
+                    continue
+                nd = d + cost[n]
+                if nd < dist[n]:
+                    dist[n] = nd
+                    owner[n] = o
+                    pred[n] = i
+                    push(n, nd)
+                elif nd == dist[n] and i <= pred[n]:
+                    pred[n] = i
+                    if owner[n] != o:
+                        owner[n] = o
+                        push(n, nd)
+    return pops
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Out-of-core ("tiled") preprocessing, for worldmaps larger than memory.
+
+Builds the same artifacts as preprocess.build_artifacts, byte for byte,
+without ever holding a whole-map array in memory:
+
+    * the worldmap is parsed a line at a time into a memory-mapped code
+      grid (one pass to size it, one to fill it) and tokenized in row bands;
+    * every whole-map layer (blanked / clean / restored grids, owners,
+      distances, ids, depth) is an ``np.memmap`` in a scratch directory;
+    * layers that are cheap to derive from those (cost grid, flood masks,
+      seed grids, TILE planes) are never stored: a LazyGrid computes
+      whatever slice its consumer asks for;
+    * floods run tile by tile (shortest_paths.tiled_multi_source_owner,
+      grid_ops.tiled_components_touching), each tile plus a one-cell halo;
+    * mountain depth is a distance transform per row band, over a halo of
+      rows that doubles until every depth in the band is exact;
+    * artifacts are written a row band at a time (artifact_io.BAND_CELLS).
+
+Memory then holds a few tiles or bands plus the token, label and seed
+tables, which grow with the number of labels rather than the map area.
+Scratch files go to a temporary directory (``--scratch DIR`` to pick where
+it is created) and are removed when the build ends.
+
+Usage: python preprocess.py <input_map> --tiled [--tile N] [--scratch DIR] ...
+"""
+from __future__ import annotations
+import tempfile
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from worldmap_io import grid_rows, char_class_mask, SPACE
+from annotations import tokenize_rows, Token
+from artifact_io import (write_regions, write_tiles, terrain_indices, id_dtype, row_bands,
+                         MDEP_DTYPES)
+from distance_transform import distance_transform
+from grid_ops import tiled_components_touching, label_bounding_boxes
+from shortest_paths import tiled_multi_source_owner, FLOOD_TILE
+from profiling import stage
+from map_preprocessing import (parse_annotations, build_cost_grid, merge_realms,
+                               write_poi_csv, write_poi_bin, is_water_char)
+from geo_features_preprocessing import detect_labels, feature_seeds, _restore_terrain, _expandable
+from mountain_depth_preprocessing import restore_terrain_under_labels, write_depth_file
+from preprocess import tile_flags, DEEP_MOUNTAIN
+
+DEPTH_HALO = 32                         # first row halo tried per mountain depth band
+
+################################################################################
+# SCRATCH STORAGE
+################################################################################
+class Scratch:
+    """Memory-mapped scratch arrays in a temporary directory (removed on close)."""
+
+    def __init__(self, directory: str | None = None):
+        self._dir = tempfile.TemporaryDirectory(prefix='preprocess-', dir=directory)
+        self._count = 0
+
+    def array(self, shape: Tuple[int, int], dtype, fill=None) -> np.ndarray:
+        """A new H×W array on disk, optionally filled band by band."""
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)         # mmap can't map empty files
+        self._count += 1
+        path = Path(self._dir.name) / f"{self._count:03d}.bin"
+        a = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        if fill is not None:
+            for r0, r1 in row_bands(*shape):
+                a[r0:r1] = fill
+        return a
+
+    def copy(self, src) -> np.ndarray:
+        out = self.array(src.shape, src.dtype)
+        for r0, r1 in row_bands(*src.shape):
+            out[r0:r1] = src[r0:r1]
+        return out
+
+    def close(self) -> None:
+        self._dir.cleanup()
+
+    def __enter__(self) -> 'Scratch':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class LazyGrid:
+    """
+    Read-only H×W grid whose slices are computed on demand by
+    ``fn(rows, cols)`` (two step-1 slices), for layers derived cell by cell
+    from memory-mapped ones.  Supports ``g[rows]`` and ``g[rows, cols]``.
+    """
+
+    def __init__(self, shape: Tuple[int, int], fn: Callable[[slice, slice], np.ndarray]):
+        self.shape = tuple(shape)
+        self._fn = fn
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        rows = slice(*rows.indices(self.shape[0])[:2])
+        cols = slice(*cols.indices(self.shape[1])[:2])
+        return self._fn(rows, cols)
+
+    def crop(self, r0: int, r1: int, c0: int, c1: int) -> 'LazyGrid':
+        """The window ``[r0:r1, c0:c1]`` as a LazyGrid of its own."""
+        return LazyGrid((r1 - r0, c1 - c0), lambda rows, cols: self._fn(
+            slice(r0 + rows.start, r0 + rows.stop), slice(c0 + cols.start, c0 + cols.stop)))
+
+################################################################################
+# LOADING
+################################################################################
+def _map_lines(path: str) -> Iterator[bytes]:
+    """The worldmap's lines, split like worldmap_io.parse_map (\\r\\n, \\r, \\n)."""
+    with open(path, 'rb') as f:
+        for raw in f:
+            ended = raw.endswith(b'\n')
+            body = raw[:-1] if ended else raw
+            if ended and body.endswith(b'\r'):
+                body = body[:-1]
+            pieces = body.split(b'\r')
+            if not ended and len(pieces) > 1 and not pieces[-1]:
+                pieces.pop()                # a trailing lone \r ends the last line
+            yield from pieces
+
+def load_map_tiled(path: str, scratch: Scratch) -> Tuple[np.ndarray, int, int]:
+    """
+    worldmap_io.load_map into a memory-mapped grid: one pass sizes the map
+    (and checks whether it is all ASCII), a second fills it band by band.
+    """
+    H = W = 0
+    ascii = True
+    for line in _map_lines(path):
+        if not line.isascii():
+            ascii = False
+        H += 1
+        W = max(W, len(line) if line.isascii() else len(line.decode('utf-8')))
+    dtype = np.uint8 if ascii else np.uint32
+    grid = scratch.array((H, W), dtype)
+    lines = _map_lines(path)
+    for r0, r1 in row_bands(H, W):
+        band = np.full((r1 - r0, W), SPACE, dtype=dtype)
+        for row in band:
+            line = next(lines)
+            cells = (np.frombuffer(line, dtype=np.uint8) if ascii else
+                     np.frombuffer(line.decode('utf-8').encode('utf-32-le'), dtype='<u4'))
+            row[:cells.size] = cells
+        grid[r0:r1] = band
+    return grid, H, W
+
+def tokenize_tiled(grid: np.ndarray) -> List[Token]:
+    """annotations.tokenize, a band of rows at a time (tokens never span rows)."""
+    tokens = []
+    for r0, r1 in row_bands(*grid.shape):
+        tokens += tokenize_rows(grid_rows(np.asarray(grid[r0:r1])), first_row=r0)
+    return tokens
+
+################################################################################
+# REGION LAYERS
+################################################################################
+def _class_flood(clean: np.ndarray, geo_id: np.ndarray, terrain_char: str,
+                 seeds: List[Tuple[int, int, int]], owner: np.ndarray, dist: np.ndarray,
+                 tile: int) -> None:
+    """geo_features_preprocessing._multi_source_dijkstra for one class, into `geo_id`."""
+    t = ord(terrain_char)
+    shape = clean.shape
+    cost = LazyGrid(shape, lambda rows, cols: np.where(clean[rows, cols] == t, 1, 2))
+    expandable = LazyGrid(shape, lambda rows, cols:
+                          _expandable(np.asarray(clean[rows, cols]), terrain_char)[1])
+    # Reversed so a tile holding several seeds floods with the first feature id
+    local = [((r, c), fid) for r, c, fid in reversed(seeds)]
+    tiled_multi_source_owner(cost, local, restrict=expandable, owner=owner, dist=dist,
+                             tile=tile)
+    for r, c, fid in seeds:
+        owner[r, c] = fid
+    for r0, r1 in row_bands(*shape):
+        o = np.asarray(owner[r0:r1])
+        assigned = (clean[r0:r1] == t) & (o >= 0)
+        band = np.array(geo_id[r0:r1])
+        band[assigned] = o[assigned]
+        geo_id[r0:r1] = band
+
+def region_layers_tiled(grid: np.ndarray, H: int, W: int, tokens: List[Token],
+                        scratch: Scratch, tile: int = FLOOD_TILE) -> dict:
+    """
+    map_preprocessing.region_layers over a memory-mapped grid.  Returns the
+    layers write_regions / write_poi_csv / write_tiles need; whole-map
+    entries are scratch memmaps, valid until `scratch` is closed.
+    """
+    shape = (H, W)
+    owner = scratch.array(shape, np.int64)          # flood outputs, reused per flood
+    dist = scratch.array(shape, np.int64)
+
+    # 2) Water mask **before** we mutate anything
+    with stage("2 water_mask"):
+        water_mask = scratch.array(shape, bool)
+        tiled_components_touching(
+            LazyGrid(shape, lambda rows, cols:
+                     char_class_mask(np.asarray(grid[rows, cols]), is_water_char)),
+            LazyGrid(shape, lambda rows, cols: grid[rows, cols] == ord('=')),
+            water_mask, tile=tile)
+
+    # 3) Realm / sub-realm parsing  (this blanks annotations in `blanked`)
+    with stage("3 annotations"):
+        blanked = scratch.copy(grid)
+        _, _, realm_seeds, sub_seeds, realm_names, sub_names = \
+            parse_annotations(blanked, H, W, tokens)
+
+    # 4) Geographic features, one tiled flood per terrain class
+    with stage("4 geo_features"):
+        geo_labels = detect_labels(blanked, tokens, windowed=True)
+        clean_grid = scratch.copy(blanked)
+        _restore_terrain(clean_grid, geo_labels)
+        geo_names, geo_seed_rows, geo_seed_cols, class_seeds = feature_seeds(geo_labels)
+        geo_id_grid = scratch.array(shape, np.int16, fill=-1)
+        for terrain_char, seeds in class_seeds:
+            _class_flood(clean_grid, geo_id_grid, terrain_char, seeds, owner, dist, tile)
+
+    # 5) Movement cost, computed per tile as the floods read it
+    cost = LazyGrid(shape, lambda rows, cols: build_cost_grid(
+        np.asarray(clean_grid[rows, cols]), np.asarray(water_mask[rows, cols]), None, None))
+
+    # 6) Dijkstra passes for region ownership
+    num_realms = len(realm_names)
+    with stage("6 realm_floods"):
+        combined = {**realm_seeds, **{pos: num_realms+sid for pos, sid in sub_seeds.items()}}
+        owner_all = scratch.array(shape, np.int64)
+        tiled_multi_source_owner(cost, combined, owner=owner_all, dist=dist, tile=tile)
+        owner_realm = scratch.array(shape, np.int64)
+        tiled_multi_source_owner(cost, realm_seeds, owner=owner_realm, dist=dist, tile=tile)
+
+    # 7) Determine which realm each sub-realm lives in
+    with stage("7 sub_parents"):
+        sub_parent = {sid: owner_realm[r, c] for (r, c), sid in sub_seeds.items()}
+
+    # 8) Final realm grid, band by band
+    with stage("8 merge_realms"):
+        final_realm = scratch.array(shape, np.int64)
+        for r0, r1 in row_bands(H, W):
+            final_realm[r0:r1] = merge_realms(np.asarray(owner_all[r0:r1]),
+                                              np.asarray(owner_realm[r0:r1]),
+                                              sub_parent, num_realms)
+
+    # 9) Sub-realm assignment within realms, each flood cropped to its realm
+    with stage("9 sub_realms"):
+        final_sub = scratch.array(shape, np.int64, fill=-1)
+        boxes = np.tile(np.array([H, 0, W, 0]), (num_realms, 1))
+        for r0, r1 in row_bands(H, W):
+            band = label_bounding_boxes(np.asarray(final_realm[r0:r1]), num_realms)
+            present = band[:, 1] > 0
+            band[:, :2] += r0
+            boxes[present, 0::2] = np.minimum(boxes[present, 0::2], band[present, 0::2])
+            boxes[present, 1::2] = np.maximum(boxes[present, 1::2], band[present, 1::2])
+        for rid in range(num_realms):
+            seeds = {pos: sid for pos, sid in sub_seeds.items() if sub_parent[sid] == rid}
+            if not seeds:
+                continue
+            r0, r1, c0, c1 = (int(v) for v in boxes[rid])
+            for r, c in seeds:
+                r0, r1, c0, c1 = min(r0, r), max(r1, r+1), min(c0, c), max(c1, c+1)
+            local = {(r-r0, c-c0): sid for (r, c), sid in seeds.items()}
+            in_realm = LazyGrid((r1-r0, c1-c0), lambda rows, cols, r0=r0, c0=c0, rid=rid:
+                                final_realm[r0+rows.start:r0+rows.stop,
+                                            c0+cols.start:c0+cols.stop] == rid)
+            sub_owner, _ = tiled_multi_source_owner(
+                cost.crop(r0, r1, c0, c1), local, restrict=in_realm,
+                owner=owner[:r1-r0, :c1-c0], dist=dist[:r1-r0, :c1-c0], tile=tile)
+            for b0, b1 in row_bands(r1 - r0, c1 - c0):
+                mask = final_realm[r0+b0:r0+b1, c0:c1] == rid
+                band = np.array(final_sub[r0+b0:r0+b1, c0:c1])
+                band[mask] = np.asarray(sub_owner[b0:b1])[mask]
+                final_sub[r0+b0:r0+b1, c0:c1] = band
+
+    return dict(tokens=tokens, water_mask=water_mask, realm_seeds=realm_seeds,
+                sub_seeds=sub_seeds, realm_names=realm_names, sub_names=sub_names,
+                geo_labels=geo_labels, clean_grid=clean_grid, geo_id_grid=geo_id_grid,
+                geo_names=geo_names, geo_seed_rows=geo_seed_rows,
+                geo_seed_cols=geo_seed_cols, sub_parent=sub_parent,
+                final_realm=final_realm, final_sub=final_sub)
+
+################################################################################
+# MOUNTAIN DEPTH
+################################################################################
+def mountain_depths_tiled(grid: np.ndarray, out: np.ndarray, metric: str = 'taxicab',
+                          cap: float = np.inf, halo: int = DEPTH_HALO) -> np.ndarray:
+    """
+    mountain_depth_preprocessing.calculate_mountain_depths into `out`, a
+    band of rows at a time.  Each band is transformed together with `halo`
+    rows either side; a depth d is exact once d <= halo (the nearest open
+    ground is at most d rows away), so the halo doubles until every
+    mountain cell in the band qualifies.  Depths are only ever stored up to
+    `cap` (the artifact's largest value), so cells still deeper than the
+    halo once it reaches `cap` are simply set to `cap`.
+    """
+    H, W = grid.shape
+    for r0, r1 in row_bands(H, W):
+        h = halo
+        while True:
+            w0, w1 = max(r0 - h, 0), min(r1 + h, H)
+            is_mountain = np.asarray(grid[w0:w1]) == ord('^')
+            depth = distance_transform(~is_mountain, metric)[r0-w0:r1-w0]
+            is_mountain = is_mountain[r0-w0:r1-w0]
+            unsure = is_mountain & (depth > h)
+            if not unsure.any() or (w0, w1) == (0, H):
+                break
+            if h >= cap:
+                depth[unsure] = cap
+                break
+            h *= 2
+        depth[~is_mountain | np.isinf(depth)] = 0
+        out[r0:r1] = depth
+    return out
+
+################################################################################
+# DRIVER
+################################################################################
+def build_artifacts_tiled(map_path, reg2_path=None, poi_path=None, mdep_path=None,
+                          tiles_path=None, metric='taxicab', dtype='u8',
+                          tile: int = FLOOD_TILE, scratch_dir: Optional[str] = None,
+                          poib_path=None) -> dict:
+    """
+    preprocess.build_artifacts with bounded memory.  The layers live in
+    scratch files that are gone on return, so only ``{'wide_ids': bool}``
+    (whether TILE was skipped for ids wider than a byte) is returned.
+    """
+    with Scratch(scratch_dir) as scratch:
+        with stage("1 load"):
+            grid, H, W = load_map_tiled(map_path, scratch)
+        with stage("tokenize"):
+            tokens = tokenize_tiled(grid)
+        layers = {}
+
+        if reg2_path or poi_path or poib_path or tiles_path:
+            layers = region_layers_tiled(grid, H, W, tokens, scratch, tile)
+            print(f"Processed {W}×{H} map")
+            print(f"Realms        : {len(layers['realm_names'])}")
+            print(f"Sub-realms    : {len(layers['sub_names'])}")
+            print(f"Geo-features  : {len(layers['geo_names'])}")
+        if reg2_path:
+            with stage("10 write_regions"):
+                write_regions(reg2_path, layers['final_realm'], layers['final_sub'],
+                              layers['geo_id_grid'], layers['realm_names'],
+                              layers['sub_names'], layers['geo_names'])
+            print(f"Binary grid   : {reg2_path}")
+        if poi_path:
+            with stage("11 write_poi"):
+                write_poi_csv(poi_path, layers)
+            print(f"POI csv       : {poi_path}")
+        if poib_path:
+            with stage("write_poib"):
+                write_poi_bin(poib_path, layers)
+            print(f"POI table     : {poib_path}")
+
+        if mdep_path or tiles_path:
+            with stage("mountain_restore"):
+                restored = scratch.copy(grid)
+                restore_terrain_under_labels(grid, H, W, tokens, out=restored)
+            with stage("mountain_depth"):
+                # Only MDEP's range matters, and TILE only asks "deep or not"
+                disk_dtype = MDEP_DTYPES[dtype][1] if mdep_path else None
+                cap = (DEEP_MOUNTAIN if disk_dtype is None else
+                       np.iinfo(disk_dtype).max if disk_dtype.kind == 'u' else np.inf)
+                depth = mountain_depths_tiled(restored, scratch.array((H, W), np.float64),
+                                              metric, cap)
+        if mdep_path:
+            with stage("write_mdep"):
+                write_depth_file(mdep_path, depth, W, H, dtype=dtype, metric=metric)
+
+        wide = tiles_path and any(
+            id_dtype(layers[ids], layers[names]) != np.uint8
+            for ids, names in (('final_realm', 'realm_names'), ('final_sub', 'sub_names'),
+                               ('geo_id_grid', 'geo_names')))
+        if wide:
+            print("Tile grid     : skipped, more than 255 ids don't fit the u8 TILE planes")
+        elif tiles_path:
+            with stage("write_tiles"):
+                taxicab = depth
+                if metric != 'taxicab':
+                    taxicab = mountain_depths_tiled(restored, scratch.array((H, W), np.float64),
+                                                    cap=DEEP_MOUNTAIN)
+                water_mask = layers['water_mask']
+                terrain = LazyGrid((H, W), lambda rows, cols:
+                                   terrain_indices(np.asarray(restored[rows, cols])))
+                flags = LazyGrid((H, W), lambda rows, cols: tile_flags(
+                    np.asarray(restored[rows, cols]), np.asarray(water_mask[rows, cols]),
+                    np.asarray(taxicab[rows, cols])))
+                write_tiles(tiles_path, terrain, layers['final_realm'], layers['final_sub'],
+                            layers['geo_id_grid'], flags, layers['realm_names'],
+                            layers['sub_names'], layers['geo_names'])
+            print(f"Tile grid     : {tiles_path}")
+        return {'wide_ids': bool(wide)}
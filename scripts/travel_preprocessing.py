@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+POI-to-POI travel costs (TRVL, see artifact_io.py).
+
+One shortest-path tree is grown from every POI (realm, sub-realm and geo
+feature seeds, in POI CSV order) over the region stage's terrain cost
+grid, and the cost of reaching every other POI is kept, so the game can
+answer "how far is X from Y" with a table lookup.  Trees run on the
+bucket-queue engine (shortest_paths.py), one per task in a process pool.
+
+With ``--first-hop`` the matrix also records which way to step out of POI
+i to follow the cheapest path to POI j: the tree's tight predecessors
+(the same tie rule the floods use) are followed back to the root by
+pointer jumping, so every cell learns the root's child it descends from.
+
+Usage: python travel_preprocessing.py <input_map> <output_travel> [--first-hop]
+                                      [--jobs N] [--profile REPORT.json]
+"""
+from __future__ import annotations
+import argparse, os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from worldmap_io import load_map
+from artifact_io import write_travel, TRAVEL_STEPS
+from shortest_paths import multi_source_owner, tight_predecessors, integer_costs, INF
+from profiling import stage, enable as enable_profiling
+from map_preprocessing import region_layers, poi_rows
+
+NO_HOP = 255
+_TREES: Dict[str, object] = {}                 # per-process cost grid and POI cells
+
+def poi_cells(layers: dict) -> Tuple[List[int], List[int]]:
+    """Rows and columns of every POI, in the order write_poi_csv writes them."""
+    rows = list(poi_rows(layers['realm_seeds'], layers['sub_seeds'], layers['sub_parent'],
+                         layers['realm_names'], layers['sub_names'], layers['geo_names'],
+                         layers['geo_seed_rows'], layers['geo_seed_cols']))[1:]
+    return [int(row[1]) for row in rows], [int(row[2]) for row in rows]
+
+def _init_trees(cost: np.ndarray, targets: np.ndarray, first_hop: bool) -> None:
+    _TREES.update(cost=cost, targets=targets, first_hop=first_hop)
+
+def first_hops(pred: np.ndarray, root: int, W: int) -> np.ndarray:
+    """
+    TRAVEL_STEPS code of the root's child each cell descends from in the
+    tree `pred` (flat tight-predecessor indices), NO_HOP for the root and
+    for cells off the tree.
+    """
+    hop = np.full(pred.shape, -1, dtype=np.int16)
+    for code, (dr, dc) in enumerate(TRAVEL_STEPS):
+        child = root + dr * W + dc
+        if 0 <= child < pred.size and pred[child] == root:
+            hop[child] = code
+    anc = pred.copy()
+    while True:
+        live = np.flatnonzero((hop < 0) & (anc >= 0))
+        if not live.size:
+            break
+        up = anc[live]
+        hop[live] = hop[up]
+        anc[live] = anc[up]
+    return np.where(hop >= 0, hop, NO_HOP).astype(np.uint8)
+
+def _tree(source: Tuple[int, int]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Costs (and first hops) from one POI to every POI."""
+    cost, targets = _TREES['cost'], _TREES['targets']
+    r, c = source
+    _, dist = multi_source_owner(cost, {(r, c): 0})
+    flat = dist.ravel()
+    reach = flat[targets]
+    hops = None
+    if _TREES['first_hop']:
+        W = cost.shape[1]
+        hops = first_hops(tight_predecessors(cost, dist), r * W + c, W)[targets]
+    return np.where(reach < INF, reach, -1), hops
+
+def travel_matrix(cost: np.ndarray, rows: Sequence[int], cols: Sequence[int],
+                  first_hop: bool = False, jobs: Optional[int] = None
+                  ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    ``(cost, first_hop)``: count×count int64 travel costs from POI i (row)
+    to POI j (column), -1 where unreachable, and the uint8 first-hop codes
+    if asked for.  Trees run on `jobs` processes (default: one per CPU).
+    """
+    cost = integer_costs(cost)
+    W = cost.shape[1]
+    targets = np.asarray(rows, dtype=np.int64) * W + np.asarray(cols, dtype=np.int64)
+    sources = list(zip(rows, cols))
+    jobs = min(jobs or os.cpu_count() or 1, max(len(sources), 1))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_trees,
+                                 initargs=(cost, targets, first_hop)) as pool:
+            trees = list(pool.map(_tree, sources))
+    else:
+        _init_trees(cost, targets, first_hop)
+        trees = [_tree(s) for s in sources]
+    n = len(sources)
+    matrix = np.array([t[0] for t in trees], dtype=np.int64).reshape(n, n)
+    hops = np.array([t[1] for t in trees], dtype=np.uint8).reshape(n, n) if first_hop else None
+    return matrix, hops
+
+def write_travel_file(path, layers: dict, W: int, H: int, first_hop: bool = False,
+                      jobs: Optional[int] = None) -> None:
+    """Write the TRVL matrix for a region_layers() result."""
+    rows, cols = poi_cells(layers)
+    matrix, hops = travel_matrix(layers['cost'], rows, cols, first_hop, jobs)
+    write_travel(path, W, H, rows, cols, matrix, hops)
+
+def build_travel_file(input_map, output_file, first_hop=False, jobs=None):
+    """Load `input_map`, build the region layers and write the TRVL file."""
+    with stage("1 load"):
+        grid, H, W = load_map(input_map)
+    layers = region_layers(grid, H, W)
+    with stage("travel_matrix"):
+        write_travel_file(output_file, layers, W, H, first_hop=first_hop, jobs=jobs)
+    print(f"Travel matrix : {output_file} ({len(poi_cells(layers)[0])} POIs)")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute POI-to-POI travel costs over the terrain cost grid.")
+    parser.add_argument('input_map')
+    parser.add_argument('output_travel')
+    parser.add_argument('--first-hop', action='store_true',
+                        help="also store the first step of every POI-to-POI path")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--profile', default=None, metavar='REPORT.json',
+                        help="record per-stage timings (see profiling.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile)
+    build_travel_file(args.input_map, args.output_travel, first_hop=args.first_hop,
+                      jobs=args.jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Shared worldmap loader for the preprocessing scripts.
+
+The worldmap is read with a single bulk read into a padded H×W NumPy array of
+character codes:
+
+    * ``uint8``  when the file is pure ASCII (the common case)
+    * ``uint32`` Unicode codepoints when it contains names such as `Anórien`
+
+Short lines are padded with spaces, exactly like the old
+``list(ln.ljust(W))`` grids.  Every stage works on this array directly;
+comparisons are done against ``ord(ch)`` codes or boolean masks built with
+:func:`char_mask` / :func:`char_class_mask`.
+"""
+from __future__ import annotations
+import os
+import numpy as np
+from typing import Callable, Iterable, List, Tuple
+
+SPACE = ord(' ')
+NEWLINE = ord('\n')
+
+# ---------------- Load map -------------------------------------------------- #
+def load_map(map_path: str) -> Tuple[np.ndarray, int, int]:
+    """Read `map_path` and return ``(grid, H, W)``."""
+    if not os.path.exists(map_path):
+        raise FileNotFoundError(f"Map file not found: {map_path}")
+    with open(map_path, 'rb') as f:
+        data = f.read()
+    return parse_map(data)
+
+def parse_map(data: bytes) -> Tuple[np.ndarray, int, int]:
+    """Turn raw worldmap bytes into a padded ``(grid, H, W)`` code grid."""
+    # Same line splitting as text-mode open(): \r\n and lone \r become \n
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if data.isascii():
+        cells = np.frombuffer(data, dtype=np.uint8)
+    else:
+        text = data.decode('utf-8')
+        cells = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.uint32)
+    if cells.size and cells[-1] != NEWLINE:
+        cells = np.append(cells, cells.dtype.type(NEWLINE))
+
+    is_nl = cells == NEWLINE
+    line_ends = np.flatnonzero(is_nl)
+    H = len(line_ends)
+    starts = np.concatenate(([0], line_ends[:-1] + 1)) if H else line_ends
+    lengths = line_ends - starts
+    W = int(lengths.max()) if H else 0
+
+    grid = np.full((H, W), SPACE, dtype=cells.dtype)
+    if H:
+        row = np.cumsum(is_nl) - is_nl
+        keep = ~is_nl
+        col = np.arange(cells.size) - starts[row]
+        grid[row[keep], col[keep]] = cells[keep]
+    return grid, H, W
+
+# ---------------- Character helpers ---------------------------------------- #
+def decode_cells(cells: np.ndarray) -> str:
+    """Decode a run of cells (any shape, row-major) back into a str."""
+    return np.ascontiguousarray(cells, dtype='<u4').tobytes().decode('utf-32-le')
+
+def grid_rows(grid: np.ndarray) -> List[str]:
+    """One str per row; column indices map 1:1 onto string indices."""
+    return [decode_cells(row) for row in grid]
+
+def char_class_mask(grid: np.ndarray, predicate: Callable[[str], bool]) -> np.ndarray:
+    """Boolean mask of cells whose character satisfies `predicate`."""
+    if grid.dtype == np.uint8:
+        lut = np.array([predicate(chr(i)) for i in range(256)], dtype=bool)
+        return lut[grid]
+    codes, inverse = np.unique(grid, return_inverse=True)
+    lut = np.array([predicate(chr(cp)) for cp in codes], dtype=bool)
+    return lut[inverse].reshape(grid.shape)
+
+def char_mask(grid: np.ndarray, chars: Iterable[str]) -> np.ndarray:
+    """Boolean mask of cells whose character is one of `chars`."""
+    chars = frozenset(chars)
+    return char_class_mask(grid, chars.__contains__)
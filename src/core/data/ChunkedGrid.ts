@@ -0,0 +1,157 @@
+const CODEC_RAW = 0;
+const CODEC_ZLIB = 1;
+const CODEC_RLE = 2;
+const HEADER_SIZE = 28;
+
+/**
+ * Reader for CHNK containers (scripts/artifact_io.py): the map is split into
+ * fixed-size chunks compressed one by one, so a viewport only decodes the
+ * chunks it overlaps.  Only u8 planes (REG2, MDEP v1, TILE) are supported.
+ * The .chunks files are only written by `preprocess.py --chunk N` and are
+ * not deployed.
+ */
+export class ChunkedGrid {
+  width: number = 0;
+  height: number = 0;
+  source: string = '';
+  meta: Uint8Array = new Uint8Array(0);
+  private chunkWidth: number = 0;
+  private chunkHeight: number = 0;
+  private chunksX: number = 0;
+  private codec: number = CODEC_RAW;
+  private planeCount: number = 0;
+  private offsets: Uint32Array = new Uint32Array(0);
+  private bytes: Uint8Array = new Uint8Array(0);
+  private cache = new Map<number, Promise<Uint8Array[]>>();
+
+  constructor(buffer: ArrayBuffer) {
+    try {
+      this.parseHeader(buffer);
+    } catch (error) {
+      throw new Error(`ChunkedGrid constructor failed: ${error}\n  at src/core/data/ChunkedGrid.ts:25`);
+    }
+  }
+
+  private parseHeader(buffer: ArrayBuffer): void {
+    this.bytes = new Uint8Array(buffer);
+    const magic = String.fromCharCode(...this.bytes.subarray(0, 4));
+    if (magic !== 'CHNK') {
+      throw new Error(`Invalid chunked grid file format. Expected 'CHNK', got '${magic}'\n  at src/core/data/ChunkedGrid.ts:36`);
+    }
+
+    // Header: u16 version, W, H, chunk_w, chunk_h; u8 codec, plane_count; 4s source; u32 meta_offset, meta_size
+    const view = new DataView(buffer);
+    const version = view.getUint16(4, true);
+    if (version !== 1) {
+      throw new Error(`Unsupported chunked grid version: ${version}\n  at src/core/data/ChunkedGrid.ts:43`);
+    }
+    this.width = view.getUint16(6, true);
+    this.height = view.getUint16(8, true);
+    this.chunkWidth = view.getUint16(10, true);
+    this.chunkHeight = view.getUint16(12, true);
+    this.codec = this.bytes[14];
+    this.planeCount = this.bytes[15];
+    this.source = String.fromCharCode(...this.bytes.subarray(16, 20));
+    const metaOffset = view.getUint32(20, true);
+    const metaSize = view.getUint32(24, true);
+
+    for (let i = 0; i < this.planeCount; i++) {
+      if (this.bytes[HEADER_SIZE + i] !== 1) {
+        throw new Error(`Unsupported chunk plane type: ${this.bytes[HEADER_SIZE + i]}\n  at src/core/data/ChunkedGrid.ts:57`);
+      }
+    }
+
+    // Chunk offsets (one extra entry marks the end of the last chunk)
+    this.chunksX = Math.ceil(this.width / this.chunkWidth);
+    const chunkCount = this.chunksX * Math.ceil(this.height / this.chunkHeight);
+    const indexOffset = HEADER_SIZE + this.planeCount;
+    this.offsets = new Uint32Array(chunkCount + 1);
+    for (let i = 0; i <= chunkCount; i++) {
+      this.offsets[i] = view.getUint32(indexOffset + 4 * i, true);
+    }
+    this.meta = this.bytes.subarray(metaOffset, metaOffset + metaSize);
+  }
+
+  /** Decoded planes of chunk (cx, cy), each chunk-width × chunk-height or smaller at the edges. */
+  getChunk(cx: number, cy: number): Promise<Uint8Array[]> {
+    const key = cy * this.chunksX + cx;
+    let planes = this.cache.get(key);
+    if (!planes) {
+      planes = this.decodeChunk(key, cx, cy);
+      this.cache.set(key, planes);
+    }
+    return planes;
+  }
+
+  private async decodeChunk(key: number, cx: number, cy: number): Promise<Uint8Array[]> {
+    const blob = this.bytes.subarray(this.offsets[key], this.offsets[key + 1]);
+    let raw: Uint8Array;
+    if (this.codec === CODEC_ZLIB) {
+      const stream = new Blob([blob]).stream().pipeThrough(new DecompressionStream('deflate'));
+      raw = new Uint8Array(await new Response(stream).arrayBuffer());
+    } else if (this.codec === CODEC_RLE) {
+      raw = decodeRle(blob);
+    } else {
+      raw = blob;
+    }
+
+    const w = Math.min(this.chunkWidth, this.width - cx * this.chunkWidth);
+    const h = Math.min(this.chunkHeight, this.height - cy * this.chunkHeight);
+    const planes: Uint8Array[] = [];
+    for (let i = 0; i < this.planeCount; i++) {
+      planes.push(raw.subarray(i * w * h, (i + 1) * w * h));
+    }
+    return planes;
+  }
+
+  /** Every plane over columns [x0, x1) × rows [y0, y1), row-major; only overlapping chunks are decoded. */
+  async getWindow(x0: number, y0: number, x1: number, y1: number): Promise<Uint8Array[]> {
+    x0 = Math.max(x0, 0);
+    y0 = Math.max(y0, 0);
+    x1 = Math.min(x1, this.width);
+    y1 = Math.min(y1, this.height);
+    const w = Math.max(x1 - x0, 0);
+    const h = Math.max(y1 - y0, 0);
+    const out: Uint8Array[] = [];
+    for (let i = 0; i < this.planeCount; i++) {
+      out.push(new Uint8Array(w * h));
+    }
+    if (w === 0 || h === 0) {
+      return out;
+    }
+
+    for (let cy = Math.floor(y0 / this.chunkHeight); cy * this.chunkHeight < y1; cy++) {
+      for (let cx = Math.floor(x0 / this.chunkWidth); cx * this.chunkWidth < x1; cx++) {
+        const planes = await this.getChunk(cx, cy);
+        const chunkX = cx * this.chunkWidth;
+        const chunkY = cy * this.chunkHeight;
+        const chunkW = Math.min(this.chunkWidth, this.width - chunkX);
+        const fromX = Math.max(x0, chunkX);
+        const toX = Math.min(x1, chunkX + chunkW);
+        const toY = Math.min(y1, chunkY + this.chunkHeight);
+        for (let y = Math.max(y0, chunkY); y < toY; y++) {
+          const src = (y - chunkY) * chunkW + (fromX - chunkX);
+          const dst = (y - y0) * w + (fromX - x0);
+          for (let i = 0; i < this.planeCount; i++) {
+            out[i].set(planes[i].subarray(src, src + toX - fromX), dst);
+          }
+        }
+      }
+    }
+    return out;
+  }
+}
+
+function decodeRle(blob: Uint8Array): Uint8Array {
+  let size = 0;
+  for (let i = 0; i < blob.length; i += 2) {
+    size += blob[i];
+  }
+  const out = new Uint8Array(size);
+  let offset = 0;
+  for (let i = 0; i < blob.length; i += 2) {
+    out.fill(blob[i + 1], offset, offset + blob[i]);
+    offset += blob[i];
+  }
+  return out;
+}
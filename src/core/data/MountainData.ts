@@ -3,7 +3,7 @@ import type { DataLoader } from '../../shared/DataLoader.js';
 export class MountainData {
   private width: number = 0;
   private height: number = 0;
-  private depthGrid: Uint8Array | null = null;
+  private depthGrid: Uint8Array | Uint16Array | Float32Array | null = null;
   
   constructor(private loader: DataLoader) {}
   
@@ -36,17 +36,33 @@ export class MountainData {
     this.height = view.getUint16(offset, true);
     offset += 2;
     
-    if (version !== 1) {
+    if (version !== 1 && version !== 2) {
       throw new Error(`Unsupported mountain depth version: ${version}\n  at src/core/data/MountainData.ts:38`);
     }
     
+    // MDEP2: payload type (1 = u8, 2 = u16, 3 = float16) and metric bytes
+    let dtype = 1;
+    if (version === 2) {
+      dtype = buffer[offset];
+      offset += 2;
+    }
+    
     // Read depth data
     const gridSize = this.width * this.height;
-    this.depthGrid = new Uint8Array(gridSize);
-    
-    for (let i = 0; i < gridSize; i++) {
-      this.depthGrid[i] = buffer[offset];
-      offset += 1;
+    if (dtype === 1) {
+      this.depthGrid = buffer.slice(offset, offset + gridSize);
+    } else if (dtype === 2) {
+      this.depthGrid = new Uint16Array(gridSize);
+      for (let i = 0; i < gridSize; i++) {
+        this.depthGrid[i] = view.getUint16(offset + 2 * i, true);
+      }
+    } else if (dtype === 3) {
+      this.depthGrid = new Float32Array(gridSize);
+      for (let i = 0; i < gridSize; i++) {
+        this.depthGrid[i] = halfToFloat(view.getUint16(offset + 2 * i, true));
+      }
+    } else {
+      throw new Error(`Unsupported mountain depth type: ${dtype}\n  at src/core/data/MountainData.ts:50`);
     }
     } catch (error) {
       throw new Error(`MountainData.parseBinaryGrid failed: ${error}\n  at src/core/data/MountainData.ts:21`);
@@ -74,4 +90,17 @@ export class MountainData {
     const depth = this.getDepth(x, y);
     return depth > 0 && depth < 4;
   }
+}
+
+export function halfToFloat(bits: number): number {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x3ff;
+  if (exponent === 0) {
+    return sign * Math.pow(2, -14) * (fraction / 1024);
+  }
+  if (exponent === 0x1f) {
+    return fraction ? NaN : sign * Infinity;
+  }
+  return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
 }
\ No newline at end of file
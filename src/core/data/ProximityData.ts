@@ -0,0 +1,97 @@
+import type { DataLoader } from '../../shared/DataLoader.js';
+import { halfToFloat } from './MountainData.js';
+
+/**
+ * Terrain proximity fields (PROX, scripts/proximity_preprocessing.py): one
+ * plane per channel, e.g. 'mountain' / 'forest' depth and distance to
+ * 'water', 'river', 'road' and 'crossing'.  Integer planes saturate at the
+ * type's maximum (also used when the map has no tile of that class).
+ * Not built by check-map or deployed; `npm run preprocess-extras` writes
+ * maps/middle_earth_proximity.bin.
+ */
+export class ProximityData {
+  private width: number = 0;
+  private height: number = 0;
+  private fields = new Map<string, Uint8Array | Uint16Array | Float32Array>();
+
+  constructor(private loader: DataLoader) {}
+
+  async loadFromFile(proximityFile: string): Promise<void> {
+    try {
+      const buffer = await this.loader.loadBinaryFile(proximityFile);
+      this.parseFields(buffer);
+    } catch (error) {
+      throw new Error(`ProximityData.loadFromFile failed: ${error}\n  at src/core/data/ProximityData.ts:17`);
+    }
+  }
+
+  private parseFields(buffer: ArrayBuffer): void {
+    try {
+      const bytes = new Uint8Array(buffer);
+      const magic = String.fromCharCode(...bytes.subarray(0, 4));
+      if (magic !== 'PROX') {
+        throw new Error(`Invalid proximity file format. Expected 'PROX', got '${magic}'\n  at src/core/data/ProximityData.ts:31`);
+      }
+
+      // Header: u16 version, W, H; u8 channels, dtype, metric, pad; u32 plane offset, stride
+      const view = new DataView(buffer);
+      const version = view.getUint16(4, true);
+      if (version !== 1) {
+        throw new Error(`Unsupported proximity version: ${version}\n  at src/core/data/ProximityData.ts:38`);
+      }
+      this.width = view.getUint16(6, true);
+      this.height = view.getUint16(8, true);
+      const channels = bytes[10];
+      const dtype = bytes[11];
+      const planeOffset = view.getUint32(14, true);
+      const stride = view.getUint32(18, true);
+
+      // Channel names, as a REG2 name table right after the header
+      const names: string[] = [];
+      const decoder = new TextDecoder();
+      let offset = 23;
+      for (let i = 0; i < bytes[22]; i++) {
+        const nameLen = bytes[offset];
+        offset += 1;
+        names.push(decoder.decode(bytes.subarray(offset, offset + nameLen)));
+        offset += nameLen;
+      }
+
+      // Planes start 64-byte aligned, so u8 / u16 planes map directly
+      const gridSize = this.width * this.height;
+      this.fields.clear();
+      for (let c = 0; c < channels; c++) {
+        const start = planeOffset + c * stride;
+        if (dtype === 1) {
+          this.fields.set(names[c], new Uint8Array(buffer, start, gridSize));
+        } else if (dtype === 2) {
+          this.fields.set(names[c], new Uint16Array(buffer, start, gridSize));
+        } else if (dtype === 3) {
+          const plane = new Float32Array(gridSize);
+          for (let i = 0; i < gridSize; i++) {
+            plane[i] = halfToFloat(view.getUint16(start + 2 * i, true));
+          }
+          this.fields.set(names[c], plane);
+        } else {
+          throw new Error(`Unsupported proximity value type: ${dtype}\n  at src/core/data/ProximityData.ts:74`);
+        }
+      }
+    } catch (error) {
+      throw new Error(`ProximityData.parseFields failed: ${error}\n  at src/core/data/ProximityData.ts:26`);
+    }
+  }
+
+  /** Channel names stored in the file. */
+  getChannels(): string[] {
+    return [...this.fields.keys()];
+  }
+
+  /** Value of `channel` at tile (x, y); Infinity off the map or for a missing channel. */
+  getValue(channel: string, x: number, y: number): number {
+    const field = this.fields.get(channel);
+    if (!field || x < 0 || x >= this.width || y < 0 || y >= this.height) {
+      return Infinity;
+    }
+    return field[y * this.width + x];
+  }
+}
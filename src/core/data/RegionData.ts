@@ -15,19 +15,35 @@ export interface POI {
   col: number;
   realmId: number;
   subId: number;
+  geoId: number;
   type: string;
 }
 
+const POI_TYPES = ['Realm', 'SubRealm', 'GeoFeature'];
+const POIB_HEADER_SIZE = 20;
+const POIB_RECORD_SIZE = 16;
+
 export class RegionData {
   private width: number = 0;
   private height: number = 0;
-  private realmGrid: Uint8Array | null = null;
-  private subRegionGrid: Uint8Array | null = null;
-  private geoFeatureGrid: Uint8Array | null = null;
+  private realmGrid: Uint8Array | Uint16Array | null = null;
+  private subRegionGrid: Uint8Array | Uint16Array | null = null;
+  private geoFeatureGrid: Uint8Array | Uint16Array | null = null;
+  // "No id" value of each grid: 255 for u8 planes, 65535 for REG3 u16 planes
+  private realmNone: number = 255;
+  private subRegionNone: number = 255;
+  private geoFeatureNone: number = 255;
   private realmNames: string[] = [];
   private subRegionNames: string[] = [];
   private geoFeatureNames: string[] = [];
   private pois: POI[] = [];
+  // POIB bucket index: records in Morton order, (first, count) per bucket row-major
+  private poiRecords: POI[] = [];
+  private poiOrder: Uint16Array = new Uint16Array(0);
+  private poiBuckets: Uint16Array | null = null;
+  private poiBucket: number = 0;
+  private poiBucketsX: number = 0;
+  private poiBucketsY: number = 0;
   
   constructor(private loader: DataLoader) {}
   
@@ -37,9 +53,13 @@ export class RegionData {
       const buffer = await this.loader.loadBinaryFile(gridFile);
       this.parseBinaryGrid(new Uint8Array(buffer));
       
-      // Load POI CSV
-      const poiContent = await this.loader.loadTextFile(poiFile);
-      this.parsePOIs(poiContent);
+      // Load the POI CSV or, for maps with enough POIs to need the buckets, the POIB table
+      if (poiFile.endsWith('.bin')) {
+        this.parsePOITable(await this.loader.loadBinaryFile(poiFile));
+      } else {
+        const poiContent = await this.loader.loadTextFile(poiFile);
+        this.parsePOIs(poiContent);
+      }
     } catch (error) {
       throw new Error(`RegionData.loadFromFile failed: ${error}\n  at src/core/data/RegionData.ts:34`);
     }
@@ -51,8 +71,12 @@ export class RegionData {
       
       // Check magic number
       const magic = String.fromCharCode(...buffer.slice(0, 4));
+      if (magic === 'REG3') {
+        this.parseWideGrid(buffer);
+        return;
+      }
       if (magic !== 'REG2' && magic !== 'REG1') {
-        throw new Error(`Invalid region grid file format. Expected 'REG1' or 'REG2', got '${magic}'\n  at src/core/data/RegionData.ts:50`);
+        throw new Error(`Invalid region grid file format. Expected 'REG1', 'REG2' or 'REG3', got '${magic}'\n  at src/core/data/RegionData.ts:50`);
       }
     offset += 4;
     
@@ -71,6 +95,7 @@ export class RegionData {
     
     // Read grid data
     const gridSize = this.width * this.height;
+    this.realmNone = this.subRegionNone = this.geoFeatureNone = 255;
     this.realmGrid = new Uint8Array(gridSize);
     this.subRegionGrid = new Uint8Array(gridSize);
     this.geoFeatureGrid = new Uint8Array(gridSize);
@@ -138,26 +163,145 @@ export class RegionData {
     }
   }
   
+  /**
+   * REG3 (scripts/artifact_io.py): header 'REG3' u16 version, W, H; u8 id width
+   * (1 or 2) per layer and 3 pad bytes; then realm, sub and geo planes, each
+   * padded to 4 bytes; then name tables with u16 counts.
+   */
+  private parseWideGrid(buffer: Uint8Array): void {
+    const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+    const version = view.getUint16(4, true);
+    if (version !== 3) {
+      throw new Error(`Unsupported region grid version: ${version}\n  at src/core/data/RegionData.ts:159`);
+    }
+    this.width = view.getUint16(6, true);
+    this.height = view.getUint16(8, true);
+    const gridSize = this.width * this.height;
+
+    let offset = 16;
+    const planes: (Uint8Array | Uint16Array)[] = [];
+    for (let layer = 0; layer < 3; layer++) {
+      const idWidth = buffer[10 + layer];
+      if (idWidth === 1) {
+        planes.push(buffer.slice(offset, offset + gridSize));
+      } else if (idWidth === 2) {
+        const plane = new Uint16Array(gridSize);
+        for (let i = 0; i < gridSize; i++) {
+          plane[i] = view.getUint16(offset + 2 * i, true);
+        }
+        planes.push(plane);
+      } else {
+        throw new Error(`Unsupported region id width: ${idWidth}\n  at src/core/data/RegionData.ts:178`);
+      }
+      offset += Math.ceil(gridSize * idWidth / 4) * 4;
+    }
+    [this.realmGrid, this.subRegionGrid, this.geoFeatureGrid] = planes;
+    [this.realmNone, this.subRegionNone, this.geoFeatureNone] =
+      planes.map(plane => (plane instanceof Uint16Array ? 65535 : 255));
+
+    const tables: string[][] = [];
+    const decoder = new TextDecoder();
+    for (let table = 0; table < 3; table++) {
+      const names: string[] = [];
+      const count = offset < buffer.length ? view.getUint16(offset, true) : 0;
+      offset += 2;
+      for (let i = 0; i < count; i++) {
+        const nameLen = buffer[offset];
+        offset += 1;
+        names.push(decoder.decode(buffer.subarray(offset, offset + nameLen)));
+        offset += nameLen;
+      }
+      tables.push(names);
+    }
+    [this.realmNames, this.subRegionNames, this.geoFeatureNames] = tables;
+  }
+
   private parsePOIs(content: string): void {
     const lines = content.split('\n');
     this.pois = [];
+    this.poiBuckets = null;
     
     // Skip header
     for (let i = 1; i < lines.length; i++) {
       const line = lines[i].trim();
       if (line) {
-        const [name, row, col, realmId, subId, type] = line.split(',');
+        const [name, row, col, realmId, subId, geoId, type] = line.split(',');
         this.pois.push({
           name,
           row: parseInt(row),
           col: parseInt(col),
           realmId: parseInt(realmId),
           subId: parseInt(subId),
+          geoId: parseInt(geoId),
           type
         });
       }
     }
   }
+
+  /**
+   * POIB (scripts/artifact_io.py): header 'POIB' u16 version, W, H, count,
+   * bucket, buckets_x, buckets_y, 2 pad bytes; 16-byte records sorted by
+   * Morton code; (u16 first, u16 count) per bucket; u16-counted string pool.
+   */
+  private parsePOITable(buffer: ArrayBuffer): void {
+    try {
+      const bytes = new Uint8Array(buffer);
+      const magic = String.fromCharCode(...bytes.subarray(0, 4));
+      if (magic !== 'POIB') {
+        throw new Error(`Invalid POI table file format. Expected 'POIB', got '${magic}'\n  at src/core/data/RegionData.ts:252`);
+      }
+      const view = new DataView(buffer);
+      const version = view.getUint16(4, true);
+      if (version !== 1) {
+        throw new Error(`Unsupported POI table version: ${version}\n  at src/core/data/RegionData.ts:257`);
+      }
+      const count = view.getUint16(10, true);
+      this.poiBucket = view.getUint16(12, true);
+      this.poiBucketsX = view.getUint16(14, true);
+      this.poiBucketsY = view.getUint16(16, true);
+
+      let offset = POIB_HEADER_SIZE + count * POIB_RECORD_SIZE;
+      const bucketCount = this.poiBucketsX * this.poiBucketsY;
+      this.poiBuckets = new Uint16Array(2 * bucketCount);
+      for (let i = 0; i < 2 * bucketCount; i++) {
+        this.poiBuckets[i] = view.getUint16(offset + 2 * i, true);
+      }
+      offset += 4 * bucketCount;
+
+      const names: string[] = [];
+      const decoder = new TextDecoder();
+      const nameCount = view.getUint16(offset, true);
+      offset += 2;
+      for (let i = 0; i < nameCount; i++) {
+        const nameLen = bytes[offset];
+        offset += 1;
+        names.push(decoder.decode(bytes.subarray(offset, offset + nameLen)));
+        offset += nameLen;
+      }
+
+      this.poiRecords = [];
+      this.poiOrder = new Uint16Array(count);
+      this.pois = new Array(count);
+      for (let i = 0; i < count; i++) {
+        const at = POIB_HEADER_SIZE + i * POIB_RECORD_SIZE;
+        const poi: POI = {
+          name: names[view.getUint16(at + 12, true)],
+          row: view.getUint16(at, true),
+          col: view.getUint16(at + 2, true),
+          realmId: view.getInt16(at + 4, true),
+          subId: view.getInt16(at + 6, true),
+          geoId: view.getInt16(at + 8, true),
+          type: POI_TYPES[bytes[at + 10]]
+        };
+        this.poiOrder[i] = view.getUint16(at + 14, true);
+        this.poiRecords.push(poi);
+        this.pois[this.poiOrder[i]] = poi;
+      }
+    } catch (error) {
+      throw new Error(`RegionData.parsePOITable failed: ${error}\n  at src/core/data/RegionData.ts:247`);
+    }
+  }
   
   getRegionInfo(x: number, y: number): RegionInfo | null {
     if (!this.realmGrid || !this.subRegionGrid || !this.geoFeatureGrid) {
@@ -173,17 +317,19 @@ export class RegionData {
     const subRegionId = this.subRegionGrid[index];
     const geoFeatureId = this.geoFeatureGrid[index];
     
-    if (realmId === 255) {
+    if (realmId === this.realmNone) {
       return null; // No realm
     }
     
+    const noSubRegion = subRegionId === this.subRegionNone;
+    const noGeoFeature = geoFeatureId === this.geoFeatureNone;
     return {
       realmId,
       realmName: this.realmNames[realmId] || 'Unknown',
-      subRegionId: subRegionId === 255 ? -1 : subRegionId,
-      subRegionName: subRegionId === 255 ? '' : (this.subRegionNames[subRegionId] || ''),
-      geoFeatureId: geoFeatureId === 255 ? -1 : geoFeatureId,
-      geoFeatureName: geoFeatureId === 255 ? '' : (this.geoFeatureNames[geoFeatureId] || '')
+      subRegionId: noSubRegion ? -1 : subRegionId,
+      subRegionName: noSubRegion ? '' : (this.subRegionNames[subRegionId] || ''),
+      geoFeatureId: noGeoFeature ? -1 : geoFeatureId,
+      geoFeatureName: noGeoFeature ? '' : (this.geoFeatureNames[geoFeatureId] || '')
     };
   }
   
@@ -192,10 +338,35 @@ export class RegionData {
   }
   
   getNearbyPOIs(x: number, y: number, radius: number): POI[] {
-    return this.pois.filter(poi => {
+    const near = (poi: POI) => {
       const dx = poi.col - x;
       const dy = poi.row - y;
       return Math.sqrt(dx * dx + dy * dy) <= radius;
-    });
+    };
+    if (!this.poiBuckets) {
+      return this.pois.filter(near);
+    }
+
+    // Only the buckets overlapping the radius' bounding box; POI order as in the CSV
+    const size = this.poiBucket;
+    const hits: number[] = [];
+    const bx0 = Math.max(0, Math.floor((x - radius) / size));
+    const bx1 = Math.min(this.poiBucketsX - 1, Math.floor((x + radius) / size));
+    const by0 = Math.max(0, Math.floor((y - radius) / size));
+    const by1 = Math.min(this.poiBucketsY - 1, Math.floor((y + radius) / size));
+    for (let by = by0; by <= by1; by++) {
+      for (let bx = bx0; bx <= bx1; bx++) {
+        const bucket = 2 * (by * this.poiBucketsX + bx);
+        const first = this.poiBuckets[bucket];
+        const end = first + this.poiBuckets[bucket + 1];
+        for (let i = first; i < end; i++) {
+          if (near(this.poiRecords[i])) {
+            hits.push(i);
+          }
+        }
+      }
+    }
+    hits.sort((a, b) => this.poiOrder[a] - this.poiOrder[b]);
+    return hits.map(i => this.poiRecords[i]);
   }
 }
\ No newline at end of file
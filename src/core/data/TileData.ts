@@ -0,0 +1,153 @@
+import type { DataLoader } from '../../shared/DataLoader.js';
+
+export const TILE_OCEAN = 1;
+export const TILE_RIVER = 2;
+export const TILE_ROAD = 4;
+export const TILE_BRIDGE = 8;
+export const TILE_DEEP_MOUNTAIN = 16;
+
+const PLANE_COUNT = 5;
+
+/**
+ * Planar tile grid (TILE, scripts/preprocess.py): terrain, realm, sub-realm,
+ * geo-feature and flag planes viewed straight out of the loaded buffer.
+ * Not built by check-map or deployed; `npm run preprocess-extras` writes
+ * maps/middle_earth_tiles.bin.
+ */
+export class TileData {
+  private width: number = 0;
+  private height: number = 0;
+  // Planes are views into the loaded buffer; nothing is copied
+  private terrainGrid: Uint8Array | null = null;
+  private realmGrid: Uint8Array | null = null;
+  private subRegionGrid: Uint8Array | null = null;
+  private geoFeatureGrid: Uint8Array | null = null;
+  private flagGrid: Uint8Array | null = null;
+  private glyphs: string[] = [];
+  private realmNames: string[] = [];
+  private subRegionNames: string[] = [];
+  private geoFeatureNames: string[] = [];
+
+  constructor(private loader: DataLoader) {}
+
+  async loadFromFile(tileFile: string): Promise<void> {
+    try {
+      const buffer = await this.loader.loadBinaryFile(tileFile);
+      this.parseTiles(buffer);
+    } catch (error) {
+      throw new Error(`TileData.loadFromFile failed: ${error}\n  at src/core/data/TileData.ts:27`);
+    }
+  }
+
+  private parseTiles(buffer: ArrayBuffer): void {
+    try {
+      const bytes = new Uint8Array(buffer);
+      const magic = String.fromCharCode(...bytes.subarray(0, 4));
+      if (magic !== 'TILE') {
+        throw new Error(`Invalid tile grid file format. Expected 'TILE', got '${magic}'\n  at src/core/data/TileData.ts:41`);
+      }
+
+      // Header: u16 version, W, H, plane_count; u32 plane_offset, plane_stride, names_offset, names_size
+      const view = new DataView(buffer);
+      const version = view.getUint16(4, true);
+      this.width = view.getUint16(6, true);
+      this.height = view.getUint16(8, true);
+      const planeCount = view.getUint16(10, true);
+      const planeOffset = view.getUint32(12, true);
+      const planeStride = view.getUint32(16, true);
+      const namesOffset = view.getUint32(20, true);
+      const namesSize = view.getUint32(24, true);
+
+      if (version !== 1 || planeCount !== PLANE_COUNT) {
+        throw new Error(`Unsupported tile grid version: ${version} with ${planeCount} planes\n  at src/core/data/TileData.ts:56`);
+      }
+
+      const gridSize = this.width * this.height;
+      const plane = (i: number) => new Uint8Array(buffer, planeOffset + i * planeStride, gridSize);
+      this.terrainGrid = plane(0);
+      this.realmGrid = plane(1);
+      this.subRegionGrid = plane(2);
+      this.geoFeatureGrid = plane(3);
+      this.flagGrid = plane(4);
+
+      // Name tables: glyphs, realms, sub-regions, geo features
+      const names = new Uint8Array(buffer, namesOffset, namesSize);
+      const decoder = new TextDecoder();
+      let offset = 0;
+      const readTable = (): string[] => {
+        const count = names[offset];
+        offset += 1;
+        const table: string[] = [];
+        for (let i = 0; i < count; i++) {
+          const nameLen = names[offset];
+          offset += 1;
+          table.push(decoder.decode(names.subarray(offset, offset + nameLen)));
+          offset += nameLen;
+        }
+        return table;
+      };
+      this.glyphs = readTable();
+      this.realmNames = readTable();
+      this.subRegionNames = readTable();
+      this.geoFeatureNames = readTable();
+    } catch (error) {
+      throw new Error(`TileData.parseTiles failed: ${error}\n  at src/core/data/TileData.ts:36`);
+    }
+  }
+
+  private index(x: number, y: number): number {
+    if (x < 0 || x >= this.width || y < 0 || y >= this.height) {
+      return -1;
+    }
+    return y * this.width + x;
+  }
+
+  getTerrain(x: number, y: number): string {
+    const i = this.index(x, y);
+    if (!this.terrainGrid || i < 0) {
+      return ' ';
+    }
+    return this.glyphs[this.terrainGrid[i]] ?? ' ';
+  }
+
+  getFlags(x: number, y: number): number {
+    const i = this.index(x, y);
+    return this.flagGrid && i >= 0 ? this.flagGrid[i] : 0;
+  }
+
+  hasFlag(x: number, y: number, flag: number): boolean {
+    return (this.getFlags(x, y) & flag) !== 0;
+  }
+
+  isDeepMountain(x: number, y: number): boolean {
+    return this.hasFlag(x, y, TILE_DEEP_MOUNTAIN);
+  }
+
+  getRealmName(x: number, y: number): string {
+    const i = this.index(x, y);
+    if (!this.realmGrid || i < 0 || this.realmGrid[i] === 255) {
+      return '';
+    }
+    return this.realmNames[this.realmGrid[i]] || '';
+  }
+
+  getSubRegionName(x: number, y: number): string {
+    const i = this.index(x, y);
+    if (!this.subRegionGrid || i < 0 || this.subRegionGrid[i] === 255) {
+      return '';
+    }
+    return this.subRegionNames[this.subRegionGrid[i]] || '';
+  }
+
+  getGeoFeatureName(x: number, y: number): string {
+    const i = this.index(x, y);
+    if (!this.geoFeatureGrid || i < 0 || this.geoFeatureGrid[i] === 255) {
+      return '';
+    }
+    return this.geoFeatureNames[this.geoFeatureGrid[i]] || '';
+  }
+
+  getDimensions(): { width: number; height: number } {
+    return { width: this.width, height: this.height };
+  }
+}
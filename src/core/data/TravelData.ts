@@ -0,0 +1,106 @@
+import type { DataLoader } from '../../shared/DataLoader.js';
+
+export const TRAVEL_UNREACHABLE = 0xffffffff;
+const HEADER_SIZE = 16;
+const FLAG_FIRST_HOP = 1;
+const NO_HOP = 255;
+// First-hop codes, as (dx, dy): up, left, right, down
+const STEPS: ReadonlyArray<{ dx: number; dy: number }> = [
+  { dx: 0, dy: -1 }, { dx: -1, dy: 0 }, { dx: 1, dy: 0 }, { dx: 0, dy: 1 },
+];
+
+/**
+ * POI-to-POI travel costs (TRVL, scripts/travel_preprocessing.py).  POIs are
+ * indexed in middle_earth_pois.csv row order; costs sum the terrain cost of
+ * every tile entered on the cheapest path.  Not built by check-map or
+ * deployed; `npm run preprocess-extras` writes maps/middle_earth_travel.bin.
+ */
+export class TravelData {
+  private width: number = 0;
+  private height: number = 0;
+  private count: number = 0;
+  private rows: Uint16Array = new Uint16Array(0);
+  private cols: Uint16Array = new Uint16Array(0);
+  private costs: Uint32Array = new Uint32Array(0);
+  private hops: Uint8Array | null = null;
+  private indexByTile = new Map<number, number>();
+
+  constructor(private loader: DataLoader) {}
+
+  async loadFromFile(travelFile: string): Promise<void> {
+    try {
+      const buffer = await this.loader.loadBinaryFile(travelFile);
+      this.parseMatrix(buffer);
+    } catch (error) {
+      throw new Error(`TravelData.loadFromFile failed: ${error}\n  at src/core/data/TravelData.ts:29`);
+    }
+  }
+
+  private parseMatrix(buffer: ArrayBuffer): void {
+    try {
+      const bytes = new Uint8Array(buffer);
+      const magic = String.fromCharCode(...bytes.subarray(0, 4));
+      if (magic !== 'TRVL') {
+        throw new Error(`Invalid travel matrix file format. Expected 'TRVL', got '${magic}'\n  at src/core/data/TravelData.ts:42`);
+      }
+
+      // Header: u16 version, W, H, count; u8 flags, 3 padding bytes
+      const view = new DataView(buffer);
+      const version = view.getUint16(4, true);
+      if (version !== 1) {
+        throw new Error(`Unsupported travel matrix version: ${version}\n  at src/core/data/TravelData.ts:49`);
+      }
+      this.width = view.getUint16(6, true);
+      this.height = view.getUint16(8, true);
+      this.count = view.getUint16(10, true);
+      const flags = bytes[12];
+
+      const n = this.count;
+      let offset = HEADER_SIZE;
+      this.rows = new Uint16Array(n);
+      this.cols = new Uint16Array(n);
+      this.indexByTile.clear();
+      for (let i = 0; i < n; i++) {
+        this.rows[i] = view.getUint16(offset + 4 * i, true);
+        this.cols[i] = view.getUint16(offset + 4 * i + 2, true);
+        const key = this.rows[i] * this.width + this.cols[i];
+        if (!this.indexByTile.has(key)) {
+          this.indexByTile.set(key, i);
+        }
+      }
+      offset += 4 * n;
+      // The cost table starts 4-byte aligned (16 + 4n), so it maps directly
+      this.costs = new Uint32Array(buffer, offset, n * n);
+      offset += 4 * n * n;
+      this.hops = flags & FLAG_FIRST_HOP ? new Uint8Array(buffer, offset, n * n) : null;
+    } catch (error) {
+      throw new Error(`TravelData.parseMatrix failed: ${error}\n  at src/core/data/TravelData.ts:38`);
+    }
+  }
+
+  /** Index of the POI at tile (x, y), or -1. */
+  poiAt(x: number, y: number): number {
+    if (x < 0 || x >= this.width || y < 0 || y >= this.height) {
+      return -1;
+    }
+    return this.indexByTile.get(y * this.width + x) ?? -1;
+  }
+
+  /** Travel cost from POI `from` to POI `to`; Infinity if there is no path. */
+  getCost(from: number, to: number): number {
+    if (from < 0 || from >= this.count || to < 0 || to >= this.count) {
+      return Infinity;
+    }
+    const cost = this.costs[from * this.count + to];
+    return cost === TRAVEL_UNREACHABLE ? Infinity : cost;
+  }
+
+  /** First step out of POI `from` towards POI `to`, or null (same tile, no path, or not stored). */
+  getFirstHop(from: number, to: number): { dx: number; dy: number } | null {
+    if (!this.hops || from < 0 || from >= this.count || to < 0 || to >= this.count) {
+      return null;
+    }
+    const code = this.hops[from * this.count + to];
+    return code === NO_HOP ? null : STEPS[code];
+  }
+}